@@ -166,6 +166,7 @@ def process_buildings(island_label: str, output_dir: str, dry_run: bool = False)
                     
                     if success:
                         inserted_buildings.append(f"{base_identifier} - {building_data['name']}")
+                        sparql.record_building(building_data)
                         logger.info(f"Successfully inserted building '{base_identifier}'")
                     else:
                         error_buildings.append(f"{base_identifier} - {building_data['name']} - Insert failed")
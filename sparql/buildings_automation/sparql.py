@@ -7,11 +7,29 @@ from requests.auth import HTTPBasicAuth
 import uuid
 import logging
 import re
+import sys
+from pathlib import Path
 from typing import Optional, Dict, List
 from config import SPARQL_CONFIG, NAMESPACES, URI_TEMPLATES
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sparql_cache import SparqlCache
+from sparql_results import SELECT_ACCEPT, iter_bindings
+from sparql_templates import literal, prefixes
+import sparql_templates
+from triplestore_mirror import TriplestoreMirror
+
 logger = logging.getLogger(__name__)
 
+# Island URIs are looked up for every building; see sparql_cache.py for the settings
+cache = SparqlCache.from_env()
+# Local copy of identifiers and island URIs, used once synced (see triplestore_mirror.py)
+mirror = TriplestoreMirror.open_if_present()
+
+# Query templates, read once (sparql/templates)
+ISLAND_URI = sparql_templates.load('island_uri')
+BUILDING_EXISTS = sparql_templates.load('building_exists')
+
 
 def sanitize_label(label: str) -> str:
     """
@@ -48,31 +66,33 @@ def get_island_uri(island_label: str, dry_run: bool = False) -> Optional[str]:
     Returns:
         URI of the island or None if not found
     """
-    query = f"""
-PREFIX rdfs: <{NAMESPACES['rdfs']}>
-PREFIX veniss: <{NAMESPACES['veniss']}>
-
-SELECT ?island WHERE {{
-  ?island a veniss:Island ;
-          rdfs:label "{island_label}" .
-}}
-LIMIT 1
-"""
+    query = ISLAND_URI.render(label=island_label)
+    
+    if mirror is not None and mirror.is_fresh('islands'):
+        island_uri = mirror.island_uri(island_label)
+        if island_uri:
+            logger.info(f"Found island URI for '{island_label}' in the mirror: {island_uri}")
+            return island_uri
     
     try:
-        response = requests.post(
-            SPARQL_CONFIG['endpoint'],
-            auth=HTTPBasicAuth(SPARQL_CONFIG['username'], SPARQL_CONFIG['password']),
-            headers={'Accept': 'application/sparql-results+json'},
-            data={'query': query}
-        )
-        response.raise_for_status()
+        binding = cache.get(SPARQL_CONFIG['endpoint'], query)
+        if binding is None:
+            with requests.post(
+                SPARQL_CONFIG['endpoint'],
+                auth=HTTPBasicAuth(SPARQL_CONFIG['username'], SPARQL_CONFIG['password']),
+                headers={'Accept': SELECT_ACCEPT},
+                data={'query': query},
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # Only the first binding is needed
+                binding = next(iter_bindings(response), None)
+            # Misses are not cached, so a newly added island is found on the next lookup
+            if binding:
+                cache.put(SPARQL_CONFIG['endpoint'], query, binding)
         
-        results = response.json()
-        bindings = results.get('results', {}).get('bindings', [])
-        
-        if bindings:
-            island_uri = bindings[0]['island']['value']
+        if binding and 'island' in binding:
+            island_uri = binding['island']['value']
             logger.info(f"Found island URI for '{island_label}': {island_uri}")
             return island_uri
         else:
@@ -94,20 +114,17 @@ def check_building_exists(base_identifier: str, dry_run: bool = False) -> bool:
     Returns:
         True if building exists, False otherwise
     """
-    query = f"""
-PREFIX crm: <{NAMESPACES['crm']}>
-PREFIX rdfs: <{NAMESPACES['rdfs']}>
-
-ASK {{
-  ?building crm:P1_is_identified_by ?identifier .
-  ?identifier rdfs:value "{base_identifier}" .
-}}
-"""
+    query = BUILDING_EXISTS.render(identifier=base_identifier)
     
     if dry_run:
         logger.info(f"[DRY RUN] Would check if building '{base_identifier}' exists")
         return False  # In dry run, assume it doesn't exist
     
+    # The mirror can lag behind the triplestore, so only its positive answers are trusted
+    if mirror is not None and mirror.is_fresh('building_identifiers') and mirror.has_identifier(base_identifier):
+        logger.info(f"Building '{base_identifier}' already exists (mirror)")
+        return True
+    
     try:
         response = requests.post(
             SPARQL_CONFIG['endpoint'],
@@ -131,6 +148,22 @@ ASK {{
         raise
 
 
+def record_building(building_data: Dict):
+    """
+    Write an inserted building through to the triplestore mirror, if one is configured.
+    
+    Args:
+        building_data: Dictionary containing building and phase information
+    """
+    if mirror is None:
+        return
+    mirror.record_building(
+        building_data['base_identifier'],
+        sanitize_label(building_data['name']),
+        [phase['identifier'] for phase in building_data['phases']]
+    )
+
+
 def generate_insert_query(building_data: Dict, island_uri: str) -> str:
     """
     Generate a SPARQL INSERT query for a building with all its phases.
@@ -158,23 +191,19 @@ def generate_insert_query(building_data: Dict, island_uri: str) -> str:
     
     # Start building the query
     query_parts = [
-        f"PREFIX crm: <{NAMESPACES['crm']}>",
-        f"PREFIX rdfs: <{NAMESPACES['rdfs']}>",
-        f"PREFIX xsd: <{NAMESPACES['xsd']}>",
-        f"PREFIX veniss: <{NAMESPACES['veniss']}>",
-        "",
+        prefixes(NAMESPACES, 'crm', 'rdfs', 'xsd', 'veniss'),
         "INSERT DATA {",
         f"  GRAPH <{SPARQL_CONFIG['graph']}> {{",
         "",
         "    # Building node",
         f"    <{building_uri}> a veniss:Building ;",
-        f"      rdfs:label \"{sanitized_label}\" ;",
+        f"      rdfs:label {literal(sanitized_label)} ;",
         f"      crm:P53_has_former_or_current_location <{island_uri}> ;",
         f"      crm:P196i_is_defined_by <{physical_changes_uri}> .",
         "",
         "    # Identifier",
         f"    <{identifier_uri}> a crm:E42_Identifier ;",
-        f"      rdfs:value \"{base_identifier}\" .",
+        f"      rdfs:value {literal(base_identifier)} .",
         "",
         f"    <{building_uri}> crm:P1_is_identified_by <{identifier_uri}> .",
         "",
@@ -229,7 +258,7 @@ def generate_insert_query(building_data: Dict, island_uri: str) -> str:
         
         # 2D Representation with proper type
         query_parts.append(f"    <{rep_2d_uri}> crm:P2_has_type <https://veniss.net/ontology#2d_representation> ;")
-        query_parts.append(f"      rdfs:label \"{phase['identifier']}\" .")
+        query_parts.append(f"      rdfs:label {literal(phase['identifier'])} .")
         query_parts.append("")
     
     query_parts.append("  }")
@@ -268,3 +297,5 @@ def execute_insert_query(query: str, dry_run: bool = False) -> bool:
         if hasattr(e, 'response') and e.response:
             logger.error(f"Response: {e.response.text}")
         return False
+    finally:
+        cache.invalidate_update(query)
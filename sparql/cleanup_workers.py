@@ -0,0 +1,262 @@
+"""
+Worker pool and checkpoint journal for the search-term cleanup scripts.
+
+The cleanup scripts delete the search terms of every entity of a type, in
+batches. This module fans those delete batches out to a pool of worker
+threads and records the run in an append-only checkpoint journal (entity
+list, planned batches, completed batches and completed entities), so an
+interrupted run can be continued with ``--resume`` without refetching or
+redeleting anything that was already done.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from tqdm import tqdm
+
+
+def split_into_batches(search_terms: List[str]) -> List[List[str]]:
+    """
+    Divide the search terms of an entity into delete batches.
+
+    At least 5 and at most 10 batches are used; the last batch gets the
+    remaining terms and empty batches are dropped.
+
+    Args:
+        search_terms: Search term URIs of one entity
+
+    Returns:
+        List of batches of search term URIs
+    """
+    num_batches = min(10, max(5, len(search_terms) // 1000))
+    batch_size = len(search_terms) // num_batches
+
+    batches = []
+    for i in range(num_batches - 1):
+        start_idx = i * batch_size
+        batches.append(search_terms[start_idx:start_idx + batch_size])
+    batches.append(search_terms[(num_batches - 1) * batch_size:])
+
+    return [batch for batch in batches if batch]
+
+
+class CleanupCheckpoint:
+    """
+    Append-only journal of a cleanup run.
+
+    Each line of the journal is a JSON object recording one event:
+
+        {"entities": [...]}                      entity list fetched at the start
+        {"plan": uri, "batches": [[term, ...]]}  delete batches planned for an entity
+        {"batch": uri, "num": 2}                 batch 2 of the entity was deleted
+        {"done": uri}                            every batch of the entity was deleted
+
+    Appending a line per event keeps checkpointing cheap regardless of the
+    number of entities. A line cut short by a crash is ignored on replay.
+    """
+
+    def __init__(self, path, resume: bool = False):
+        self.path = Path(path)
+        self.entities: Optional[List[str]] = None
+        self._plans: Dict[str, List[List[str]]] = {}
+        self._done_batches = defaultdict(set)
+        self._done = set()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        needs_newline = False
+        if resume and self.path.exists():
+            needs_newline = self._replay()
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+
+    def _replay(self) -> bool:
+        """Load the journal; returns True if its last line was cut short."""
+        with open(self.path, encoding='utf-8') as f:
+            content = f.read()
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'entities' in record:
+                self.entities = record['entities']
+            elif 'plan' in record:
+                self._plans[record['plan']] = record['batches']
+            elif 'batch' in record:
+                self._done_batches[record['batch']].add(record['num'])
+            elif 'done' in record:
+                self._done.add(record['done'])
+                self._plans.pop(record['done'], None)
+                self._done_batches.pop(record['done'], None)
+        return bool(content) and not content.endswith('\n')
+
+    def _append(self, record: Dict):
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def record_entities(self, entities: List[str]):
+        self.entities = list(entities)
+        self._append({'entities': self.entities})
+
+    def record_plan(self, entity: str, batches: List[List[str]]):
+        with self._lock:
+            self._plans[entity] = batches
+        self._append({'plan': entity, 'batches': batches})
+
+    def record_batch(self, entity: str, num: int):
+        with self._lock:
+            self._done_batches[entity].add(num)
+        self._append({'batch': entity, 'num': num})
+
+    def record_entity(self, entity: str):
+        with self._lock:
+            self._done.add(entity)
+            self._plans.pop(entity, None)
+            self._done_batches.pop(entity, None)
+        self._append({'done': entity})
+
+    def plan_for(self, entity: str) -> Optional[List[List[str]]]:
+        with self._lock:
+            return self._plans.get(entity)
+
+    def is_batch_done(self, entity: str, num: int) -> bool:
+        with self._lock:
+            return num in self._done_batches.get(entity, ())
+
+    def is_entity_done(self, entity: str) -> bool:
+        with self._lock:
+            return entity in self._done
+
+    def close(self):
+        self._file.close()
+
+
+def run_cleanup_pool(entities: List[str],
+                     get_search_terms: Callable[[str], Optional[List[str]]],
+                     delete_batch: Callable[[str, List[str]], Optional[int]],
+                     checkpoint: CleanupCheckpoint,
+                     workers: int = 4,
+                     batch_delay: float = 1.0,
+                     unit: str = 'entity') -> Dict:
+    """
+    Delete the search terms of all entities with a pool of worker threads.
+
+    Each entity is planned once (its search terms are fetched and split into
+    batches) and its delete batches are then run concurrently by the pool.
+    Entities already completed in the checkpoint are skipped, and for an
+    entity that was in progress only its remaining batches are run. An entity
+    is marked completed only when all of its batches succeeded, so failed
+    batches are retried by the next ``--resume``.
+
+    Args:
+        entities: URIs of all entities to clean
+        get_search_terms: Returns the search term URIs of an entity, or None on error
+        delete_batch: Deletes a batch of search terms and returns the number of
+            triples removed, or None on error
+        checkpoint: Journal used to skip completed work and record progress
+        workers: Number of worker threads
+        batch_delay: Seconds each worker waits after a batch, to spare the endpoint
+        unit: Name of the entity type, used in the progress bar
+
+    Returns:
+        Dictionary with entities_done, terms_removed, triples_removed and failed_batches
+    """
+    pending = [uri for uri in entities if not checkpoint.is_entity_done(uri)]
+    stats = {
+        'entities_done': len(entities) - len(pending),
+        'terms_removed': 0,
+        'triples_removed': 0,
+        'failed_batches': []
+    }
+    lock = threading.Lock()
+    # Bounds the number of entities in flight, so plans are not fetched far ahead of the deletes
+    slots = threading.BoundedSemaphore(workers * 2)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pbar = tqdm(total=len(pending), desc=f"Cleaning {unit}s", unit=unit)
+
+    def finish(uri, ok):
+        # The slot is released whatever happens, or the main loop would wait for it forever
+        try:
+            if ok:
+                checkpoint.record_entity(uri)
+        except Exception as e:
+            tqdm.write(f"Error recording {uri} as completed: {e}")
+            ok = False
+        finally:
+            with lock:
+                if ok:
+                    stats['entities_done'] += 1
+                pbar.update(1)
+                pbar.set_postfix({'terms': stats['terms_removed'], 'triples': stats['triples_removed']})
+            slots.release()
+
+    def run_batch(uri, num, batch, state):
+        removed = None
+        try:
+            removed = delete_batch(uri, batch)
+            if removed is not None:
+                checkpoint.record_batch(uri, num)
+        except Exception as e:
+            # A batch deleted but not journaled counts as failed; deleting it again on --resume is harmless
+            tqdm.write(f"Error deleting batch {num} of {uri}: {e}")
+            removed = None
+        finally:
+            with lock:
+                if removed is None:
+                    stats['failed_batches'].append((uri, num, len(batch)))
+                    state['ok'] = False
+                else:
+                    stats['terms_removed'] += len(batch)
+                    stats['triples_removed'] += removed
+                state['remaining'] -= 1
+                last = state['remaining'] == 0
+            if last:
+                finish(uri, state['ok'])
+        if batch_delay:
+            time.sleep(batch_delay)
+
+    def plan_entity(uri):
+        try:
+            batches = checkpoint.plan_for(uri)
+            if batches is None:
+                search_terms = get_search_terms(uri)
+                if search_terms is None:
+                    # Lookup failed: leave the entity for the next --resume
+                    finish(uri, False)
+                    return
+                batches = split_into_batches(search_terms)
+                checkpoint.record_plan(uri, batches)
+
+            todo = [(num, batch) for num, batch in enumerate(batches, 1)
+                    if not checkpoint.is_batch_done(uri, num)]
+            if not todo:
+                finish(uri, True)
+                return
+
+            state = {'remaining': len(todo), 'ok': True}
+            for num, batch in todo:
+                executor.submit(run_batch, uri, num, batch, state)
+        except Exception as e:
+            tqdm.write(f"Error planning {uri}: {e}")
+            finish(uri, False)
+
+    try:
+        for uri in pending:
+            slots.acquire()
+            executor.submit(plan_entity, uri)
+        # Every entity holds a slot until it finishes: taking them all back waits for the pool
+        for _ in range(workers * 2):
+            slots.acquire()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        pbar.close()
+
+    return stats
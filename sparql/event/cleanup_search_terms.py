@@ -6,17 +6,35 @@ This script:
 1. Gets all events from the SPARQL endpoint
 2. For each event, removes all of its search terms
 
+Delete batches are fanned out to a pool of worker threads. Progress is recorded
+in a checkpoint journal, so an interrupted run continues where it stopped with
+--resume (completed events and batches are skipped, nothing is refetched).
+
+When the triplestore mirror has synced its search_terms fact recently (see
+triplestore_mirror.py), events it records without a search term are skipped
+without asking the endpoint. Sync it right before a cleanup (``python
+triplestore_mirror.py sync --facts search_terms``): search terms generated
+after the sync are not in the mirror and would be left in place.
+
 Usage:
-    python cleanup_search_terms.py
+    python cleanup_search_terms.py [--workers 4] [--resume] [--checkpoint PATH]
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
 import requests
 from requests.auth import HTTPBasicAuth
 from dotenv import load_dotenv
-from tqdm import tqdm
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from sparql_results import SELECT_ACCEPT, iter_bindings, iter_values
+from cleanup_workers import CleanupCheckpoint, run_cleanup_pool
+from sparql_cache import SparqlCache
+from sparql_templates import IRI, binding_term
+import sparql_templates
+from triplestore_mirror import TriplestoreMirror
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent / '.env'
@@ -27,6 +45,17 @@ SPARQL_USERNAME = os.getenv('SPARQL_USERNAME')
 SPARQL_PASSWORD = os.getenv('SPARQL_PASSWORD')
 SPARQL_ENDPOINT = os.getenv('SPARQL_ENDPOINT', 'https://veniss.net/sparql')
 
+DEFAULT_CHECKPOINT = Path(__file__).parent.parent / 'logs' / 'cleanup_search_terms_event.checkpoint'
+
+# Read cache for the entity listing (see sparql_cache.py for the settings)
+cache = SparqlCache.from_env()
+# Local copy of the entities with a search term, used when synced recently (see triplestore_mirror.py)
+mirror = TriplestoreMirror.open_if_present()
+
+# Query templates, read once (sparql/templates)
+ENTITY_SEARCH_TERMS = sparql_templates.load('entity_search_terms')
+SEARCH_TERM_TRIPLES = sparql_templates.load('search_term_triples')
+
 def check_credentials():
     """Check if SPARQL credentials are configured."""
     if not SPARQL_USERNAME or not SPARQL_PASSWORD:
@@ -49,138 +78,103 @@ def get_all_events():
     """
     
     headers = {
-        'Accept': 'application/sparql-results+json',
+        'Accept': SELECT_ACCEPT,
         'Content-Type': 'application/sparql-query'
     }
     
+    events = cache.get(SPARQL_ENDPOINT, query)
+    if events is not None:
+        return events
+
     try:
-        response = requests.post(
+        with requests.post(
             SPARQL_ENDPOINT,
             data=query,
             headers=headers,
-            auth=HTTPBasicAuth(SPARQL_USERNAME, SPARQL_PASSWORD)
-        )
-        response.raise_for_status()
-        
-        results = response.json()
-        events = [binding['event']['value'] for binding in results['results']['bindings']]
+            auth=HTTPBasicAuth(SPARQL_USERNAME, SPARQL_PASSWORD),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            events = list(iter_values(response, 'event'))
+        cache.put(SPARQL_ENDPOINT, query, events)
         return events
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error querying SPARQL endpoint: {e}")
         return []
 
 def get_search_terms_for_event(event_uri):
-    """Get all search term URIs for a specific event."""
-    query = f"""
-    PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
-    PREFIX veniss_types: <https://veniss.net/resource/type/>
-    
-    SELECT DISTINCT ?searchTerm
-    WHERE {{
-        <{event_uri}> crm:P1_is_identified_by ?searchTerm .
-        ?searchTerm a crm:E41_Appellation ;
-                    crm:P2_has_type veniss_types:search_term .
-    }}
-    """
+    """Get all search term URIs for a specific event (None if the query failed)."""
+    if mirror is not None and mirror.is_fresh('search_terms') and not mirror.has_search_term(event_uri):
+        return []
+    query = ENTITY_SEARCH_TERMS.render(entity=IRI(event_uri))
     
     headers = {
-        'Accept': 'application/sparql-results+json',
+        'Accept': SELECT_ACCEPT,
         'Content-Type': 'application/sparql-query'
     }
     
     try:
-        response = requests.post(
+        with requests.post(
             SPARQL_ENDPOINT,
             data=query,
             headers=headers,
-            auth=HTTPBasicAuth(SPARQL_USERNAME, SPARQL_PASSWORD)
-        )
-        response.raise_for_status()
-        
-        results = response.json()
-        search_terms = [binding['searchTerm']['value'] for binding in results['results']['bindings']]
+            auth=HTTPBasicAuth(SPARQL_USERNAME, SPARQL_PASSWORD),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            search_terms = list(iter_values(response, 'searchTerm'))
         return search_terms
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error getting search terms for event: {e}")
-        return []
+        return None
 
 def get_triples_for_search_terms_batch(event_uri, search_terms_batch):
-    """Get all triples to remove for a batch of search terms."""
-    # Build VALUES clause for this batch of search terms
-    values_clause = " ".join([f"<{term}>" for term in search_terms_batch])
-    
-    query = f"""
-    PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
-    PREFIX veniss_types: <https://veniss.net/resource/type/>
-    
-    SELECT ?subject ?predicate ?object
-    WHERE {{
-        {{
-            # Get event -> search_term relationships
-            <{event_uri}> crm:P1_is_identified_by ?searchTerm .
-            ?searchTerm a crm:E41_Appellation ;
-                        crm:P2_has_type veniss_types:search_term .
-            VALUES ?searchTerm {{ {values_clause} }}
-            BIND(<{event_uri}> AS ?subject)
-            BIND(crm:P1_is_identified_by AS ?predicate)
-            BIND(?searchTerm AS ?object)
-        }}
-        UNION
-        {{
-            # Get all properties of search_term nodes
-            ?searchTerm ?p ?o .
-            VALUES ?searchTerm {{ {values_clause} }}
-            BIND(?searchTerm AS ?subject)
-            BIND(?p AS ?predicate)
-            BIND(?o AS ?object)
-        }}
-    }}
-    """
+    """Get all triples to remove for a batch of search terms (None if the query failed)."""
+    query = SEARCH_TERM_TRIPLES.render(
+        entity=IRI(event_uri),
+        search_terms=[IRI(term) for term in search_terms_batch]
+    )
     
     headers = {
-        'Accept': 'application/sparql-results+json',
+        'Accept': SELECT_ACCEPT,
         'Content-Type': 'application/sparql-query'
     }
     
     try:
-        response = requests.post(
+        with requests.post(
             SPARQL_ENDPOINT,
             data=query,
             headers=headers,
             auth=HTTPBasicAuth(SPARQL_USERNAME, SPARQL_PASSWORD),
-            timeout=120  # 2 minute timeout for getting batch triples
-        )
-        response.raise_for_status()
-        
-        results = response.json()
-        triples = []
-        for binding in results['results']['bindings']:
-            subject = binding['subject']['value']
-            predicate = binding['predicate']['value']
-            object_val = binding['object']['value']
-            object_type = binding['object']['type']
-            triples.append((subject, predicate, object_val, object_type))
+            timeout=120,  # 2 minute timeout for getting batch triples
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            
+            triples = []
+            for binding in iter_bindings(response):
+                subject = binding['subject']['value']
+                predicate = binding['predicate']['value']
+                triples.append((subject, predicate, binding['object']))
         
         return triples
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error getting triples for search terms batch: {e}")
-        return []
+        return None
 
 def remove_triples_batch(triples):
     """Remove a batch of triples using DELETE DATA."""
     # Build the DELETE DATA query
     triple_statements = []
-    for subject, predicate, object_val, object_type in triples:
-        # Format object based on type
-        if object_type == 'uri':
-            formatted_object = f"<{object_val}>"
-        elif object_type == 'literal':
-            formatted_object = f'"{object_val}"'
-        else:
-            formatted_object = f'"{object_val}"'
+    for subject, predicate, object_term in triples:
+        # Keep language tags and datatypes, or DELETE DATA would not match the stored literal
+        formatted_object = binding_term(object_term)
+        if formatted_object is None:
+            # Blank nodes cannot be named in DELETE DATA
+            continue
         
         triple_statements.append(f"    <{subject}> <{predicate}> {formatted_object} .")
     
@@ -208,121 +202,93 @@ DELETE DATA {{
     except requests.exceptions.RequestException as e:
         print(f"Error removing triples batch: {e}")
         return False
+    finally:
+        cache.invalidate_update(query)
+
+def delete_search_terms_batch(event_uri, search_terms_batch):
+    """
+    Remove a batch of search terms of a event.
+    
+    Returns the number of triples removed, or None if the batch failed.
+    """
+    triples = get_triples_for_search_terms_batch(event_uri, search_terms_batch)
+    if triples is None:
+        return None
+    if not triples:
+        return 0
+    if not remove_triples_batch(triples):
+        return None
+    return len(triples)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Remove all search terms from events')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Number of worker threads running delete batches (default: 4)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the run recorded in the checkpoint instead of starting over')
+    parser.add_argument('--checkpoint', default=str(DEFAULT_CHECKPOINT),
+                        help=f'Checkpoint journal path (default: {DEFAULT_CHECKPOINT})')
+    parser.add_argument('--delay', type=float, default=1.0,
+                        help='Seconds each worker waits after a batch (default: 1)')
+    return parser.parse_args()
 
 def main():
     """Main function to execute the cleanup process."""
+    args = parse_args()
     print("Starting search terms cleanup for events...")
     
     # Check credentials
     check_credentials()
     
-    # Get all events
-    print("Fetching all events...")
-    events = get_all_events()
-    
-    if not events:
-        print("No events found or error occurred.")
-        return
-    
-    print(f"Found {len(events)} events to process.")
-    
-    # Process each event individually
-    total_events_processed = 0
-    total_terms_removed = 0
-    total_triples_removed = 0
-    failed_batches = []
+    checkpoint = CleanupCheckpoint(args.checkpoint, resume=args.resume)
     
-    for event_num, event_uri in enumerate(events, 1):
-        print(f"\n--- Processing event {event_num}/{len(events)} ---")
-        print(f"URI: {event_uri}")
-        
-        # Get all search term URIs for this event
-        search_terms = get_search_terms_for_event(event_uri)
-        
-        if not search_terms:
-            print("  No search terms found for this event.")
-            total_events_processed += 1
-            continue
-        
-        print(f"  Found {len(search_terms)} search terms to remove.")
-        
-        # Divide search terms into batches (5 batches, max 10)
-        num_batches = min(10, max(5, len(search_terms) // 1000))  # At least 5, max 10 batches
-        batch_size = len(search_terms) // num_batches
-        
-        # Create batches - last batch gets remaining terms
-        batches = []
-        for i in range(num_batches - 1):
-            start_idx = i * batch_size
-            end_idx = start_idx + batch_size
-            batches.append(search_terms[start_idx:end_idx])
-        
-        # Last batch gets all remaining terms
-        last_batch_start = (num_batches - 1) * batch_size
-        batches.append(search_terms[last_batch_start:])
-        
-        print(f"  Processing in {len(batches)} batches...")
-        
-        event_success = True
-        event_terms_removed = 0
-        event_triples_removed = 0
-        
-        # Process batches with progress bar
-        with tqdm(total=len(batches), desc="  Processing batches", unit="batch") as pbar:
-            for batch_num, search_terms_batch in enumerate(batches, 1):
-                # Get triples for this batch of search terms
-                triples = get_triples_for_search_terms_batch(event_uri, search_terms_batch)
-                
-                if not triples:
-                    pbar.update(1)
-                    continue
-                
-                # Remove triples for this batch
-                if remove_triples_batch(triples):
-                    event_terms_removed += len(search_terms_batch)
-                    event_triples_removed += len(triples)
-                else:
-                    failed_batches.append((event_uri, batch_num, len(search_terms_batch), len(triples)))
-                    event_success = False
-                
-                pbar.update(1)
-                pbar.set_postfix({
-                    "batch": f"{batch_num}/{len(batches)}",
-                    "terms": event_terms_removed,
-                    "triples": event_triples_removed
-                })
-                
-                # Small delay between batches
-                import time
-                time.sleep(1)
-        
-        if event_success:
-            print(f"  ✓ Event completed successfully")
-            total_events_processed += 1
+    try:
+        events = checkpoint.entities
+        if events is None:
+            if args.resume:
+                print(f"No checkpoint found at {args.checkpoint}, starting a new run.")
+            
+            # Get all events
+            print("Fetching all events...")
+            events = get_all_events()
+            
+            if not events:
+                print("No events found or error occurred.")
+                return
+            
+            checkpoint.record_entities(events)
         else:
-            print(f"  ⚠ Event completed with some failures")
+            print(f"Resuming from checkpoint {args.checkpoint}")
         
-        print(f"    - Removed {event_terms_removed} search terms")
-        print(f"    - Removed {event_triples_removed} triples")
+        print(f"Found {len(events)} events to process with {args.workers} workers.")
         
-        total_terms_removed += event_terms_removed
-        total_triples_removed += event_triples_removed
-        
-        # Delay between events
-        import time
-        time.sleep(2)
+        stats = run_cleanup_pool(
+            events,
+            get_search_terms_for_event,
+            delete_search_terms_batch,
+            checkpoint,
+            workers=args.workers,
+            batch_delay=args.delay,
+            unit='event'
+        )
+    finally:
+        checkpoint.close()
+    
+    failed_batches = stats['failed_batches']
     
     print(f"\n🎉 Cleanup completed!")
-    print(f"Successfully processed: {total_events_processed}/{len(events)} events")
-    print(f"Total search terms removed: {total_terms_removed:,}")
-    print(f"Total triples removed: {total_triples_removed:,}")
+    print(f"Successfully processed: {stats['entities_done']}/{len(events)} events")
+    print(f"Total search terms removed: {stats['terms_removed']:,}")
+    print(f"Total triples removed: {stats['triples_removed']:,}")
     
     if failed_batches:
         print(f"\nFailed batches ({len(failed_batches)}):")
-        for event_uri, batch_num, terms, triples in failed_batches[:10]:
-            print(f"  - {event_uri} batch {batch_num} ({terms} terms, {triples} triples)")
+        for event_uri, batch_num, terms in failed_batches[:10]:
+            print(f"  - {event_uri} batch {batch_num} ({terms} terms)")
         if len(failed_batches) > 10:
             print(f"  ... and {len(failed_batches) - 10} more")
+        print(f"Run again with --resume to retry them.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
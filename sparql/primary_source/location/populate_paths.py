@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Populate the archival path appellations of the whole collection hierarchy.
+
+populate.rq only gives a path to collections whose parent already has one, so
+a single run descends one level of the P46i_forms_part_of hierarchy. This
+driver has two modes:
+
+    fixpoint (default)  Runs seed.sparql (with --seed) and then populate.rq
+                        repeatedly until a run adds no path, reporting how
+                        many paths each level added.
+    --bulk              Fetches the collection tree and the label candidates
+                        once, computes every missing path locally with the
+                        same label rules as the queries and inserts them in
+                        batched INSERT DATA requests.
+
+Credentials are read from the .env next to this script (see .env.template),
+falling back to sparql/.env.
+
+Usage:
+    python populate_paths.py --seed
+    python populate_paths.py --bulk --batch-size 500
+    python populate_paths.py --bulk --dry-run
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).parent
+
+# The local .env wins over sparql/.env, which sparql_client loads on import
+load_dotenv(BASE_DIR / '.env')
+sys.path.insert(0, str(BASE_DIR.parent.parent))
+
+import sparql_client  # noqa: E402
+from sparql_client import iri, literal, prefix_block  # noqa: E402
+
+ARCHIVES = 'http://www.researchspace.org/resource/vocab/archives'
+PATH_TYPE = 'https://veniss.net/resource/type/path'
+
+# Safety net against a cycle in the hierarchy keeping the fixpoint loop busy forever
+MAX_LEVELS = 100
+
+_ARCHIVE_COLLECTION = f"""
+  ?subject a crm:E78_Collection ;
+           crm:P71i_is_listed_in <{ARCHIVES}> ."""
+
+
+def count_paths(timeout: Optional[float] = None) -> int:
+    """Number of archive collections that have a path appellation."""
+    query = f"""{prefix_block('crm', 'veniss_types')}
+SELECT (COUNT(DISTINCT ?subject) AS ?count)
+WHERE {{{_ARCHIVE_COLLECTION}
+  ?subject crm:P1_is_identified_by ?path_app .
+  ?path_app a crm:E41_Appellation ;
+            crm:P2_has_type veniss_types:path .
+}}
+"""
+    return sparql_client.select_count(query, timeout=timeout)
+
+
+def run_fixpoint(seed: bool = False, timeout: Optional[float] = None) -> List[int]:
+    """
+    Run populate.rq until it stops adding paths.
+
+    Args:
+        seed: Run seed.sparql first, to give the root collections their path
+        timeout: Request timeout in seconds
+
+    Returns:
+        Number of paths added by each run (level), the seed included
+    """
+    added_per_level = []
+    total = count_paths(timeout)
+    print(f"{total:,} archive collections already have a path")
+
+    steps = [('seed', BASE_DIR / 'seed.sparql')] if seed else []
+    steps += [('populate', BASE_DIR / 'populate.rq')] * MAX_LEVELS
+
+    for name, query_file in steps:
+        started = time.monotonic()
+        sparql_client.update(query_file.read_text(encoding='utf-8'), timeout=timeout)
+        now_total = count_paths(timeout)
+        added = now_total - total
+        total = now_total
+        added_per_level.append(added)
+        print(f"Level {len(added_per_level)} ({name}): {added:,} paths added "
+              f"in {time.monotonic() - started:.1f}s")
+        if name == 'populate' and added <= 0:
+            break
+    else:
+        print(f"⚠ Stopped after {MAX_LEVELS} levels, the hierarchy may contain a cycle")
+
+    return added_per_level
+
+
+def fetch_tree(timeout: Optional[float] = None) -> Dict[str, List[str]]:
+    """Parents of every archive collection (empty list for roots)."""
+    query = f"""{prefix_block('crm')}
+SELECT ?subject ?parent
+WHERE {{{_ARCHIVE_COLLECTION}
+  OPTIONAL {{ ?subject crm:P46i_forms_part_of ?parent . }}
+}}
+"""
+    parents = defaultdict(list)
+    for binding in sparql_client.select(query, timeout):
+        subject = binding['subject']['value']
+        parents[subject]
+        if 'parent' in binding:
+            parents[subject].append(binding['parent']['value'])
+    return parents
+
+
+def fetch_label_candidates(timeout: Optional[float] = None) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Label candidates of every archive collection.
+
+    Returns:
+        ``{subject: {'acronym': [...], 'it': [...], 'en': [...]}}``, where
+        'en' holds both untagged and English rdfs:labels
+    """
+    query = f"""{prefix_block('crm', 'rdfs', 'veniss_types')}
+SELECT ?subject ?kind ?label
+WHERE {{{_ARCHIVE_COLLECTION}
+  {{
+    ?subject crm:P1_is_identified_by ?acronym_app .
+    ?acronym_app a crm:E41_Appellation ;
+                 crm:P2_has_type veniss_types:acronym ;
+                 rdfs:label ?label .
+    BIND("acronym" AS ?kind)
+  }}
+  UNION
+  {{
+    ?subject rdfs:label ?label .
+    FILTER(LANG(?label) = "" || LANGMATCHES(LANG(?label), "it") || LANGMATCHES(LANG(?label), "en"))
+    BIND(IF(LANGMATCHES(LANG(?label), "it"), "it", "en") AS ?kind)
+  }}
+}}
+"""
+    candidates = defaultdict(lambda: defaultdict(list))
+    for binding in sparql_client.select(query, timeout):
+        candidates[binding['subject']['value']][binding['kind']['value']].append(binding['label']['value'])
+    return candidates
+
+
+def fetch_existing_paths(timeout: Optional[float] = None) -> Dict[str, str]:
+    """Path label of every archive collection that already has one."""
+    query = f"""{prefix_block('crm', 'rdfs', 'veniss_types')}
+SELECT ?subject ?path
+WHERE {{{_ARCHIVE_COLLECTION}
+  ?subject crm:P1_is_identified_by ?path_app .
+  ?path_app a crm:E41_Appellation ;
+            crm:P2_has_type veniss_types:path ;
+            rdfs:label ?path .
+}}
+"""
+    paths = {}
+    for binding in sparql_client.select(query, timeout):
+        subject = binding['subject']['value']
+        path = binding['path']['value']
+        # Keep the result deterministic when a collection has several paths
+        if subject not in paths or path < paths[subject]:
+            paths[subject] = path
+    return paths
+
+
+def preferred_label(subject: str, candidates: Dict[str, List[str]], iri_fallback: bool) -> Optional[str]:
+    """
+    Preferred label of a collection: acronym, then Italian, then untagged/English.
+
+    Args:
+        subject: Collection IRI
+        candidates: Label candidates of the collection, by kind
+        iri_fallback: Use the last IRI segment when there is no label
+            (populate.rq does, seed.sparql does not)
+
+    Returns:
+        The label, or None if there is none and no fallback is used
+    """
+    for kind in ('acronym', 'it', 'en'):
+        if candidates.get(kind):
+            return min(candidates[kind])
+    return subject.rsplit('/', 1)[-1] if iri_fallback else None
+
+
+def compute_paths(parents: Dict[str, List[str]],
+                  candidates: Dict[str, Dict[str, List[str]]],
+                  existing: Dict[str, str]) -> Tuple[Dict[str, str], Counter]:
+    """
+    Compute the missing paths of the hierarchy.
+
+    Existing paths are kept and used as the prefix of their children's
+    paths, exactly like populate.rq does. A collection with several parents
+    gets the path through the parent whose path sorts first.
+
+    Args:
+        parents: Parents of every collection
+        candidates: Label candidates of every collection
+        existing: Paths already in the triplestore
+
+    Returns:
+        Tuple of the new paths by subject and the number of new paths per
+        level, where level 0 are the roots and level n are the collections
+        populate.rq would reach in its n-th run
+    """
+    paths = dict(existing)
+    depth = {subject: 0 for subject in existing}
+    new_paths = {}
+    per_level = Counter()
+
+    # Roots without a path get their preferred label, like seed.sparql
+    for subject, subject_parents in parents.items():
+        if not subject_parents and subject not in paths:
+            label = preferred_label(subject, candidates.get(subject, {}), iri_fallback=False)
+            if label is not None:
+                paths[subject] = new_paths[subject] = label
+                depth[subject] = 0
+                per_level[0] += 1
+
+    children = defaultdict(list)
+    for subject, subject_parents in parents.items():
+        for parent in subject_parents:
+            children[parent].append(subject)
+
+    # Breadth-first from every collection with a path, so depths come out level by level
+    frontier = sorted(paths)
+    while frontier:
+        next_frontier = []
+        for parent in frontier:
+            for child in sorted(children.get(parent, ())):
+                if child in paths:
+                    continue
+                parent_path = min((paths[p], p) for p in parents[child] if p in paths)[0]
+                label = preferred_label(child, candidates.get(child, {}), iri_fallback=True)
+                paths[child] = new_paths[child] = f"{parent_path}, {label}"
+                depth[child] = depth[parent] + 1
+                per_level[depth[child]] += 1
+                next_frontier.append(child)
+        frontier = next_frontier
+
+    return new_paths, per_level
+
+
+def insert_paths_query(paths: List[Tuple[str, str]]) -> str:
+    """INSERT DATA of path appellations, with the same IRIs as populate.rq."""
+    triples = []
+    for subject, path in paths:
+        path_app = iri(f"{subject}/path")
+        triples.append(
+            f"  {iri(subject)} crm:P1_is_identified_by {path_app} .\n"
+            f"  {path_app} a crm:E41_Appellation ;\n"
+            f"      crm:P2_has_type {iri(PATH_TYPE)} ;\n"
+            f"      rdfs:label {literal(path)} ."
+        )
+    return f"{prefix_block('crm', 'rdfs')}\nINSERT DATA {{\n" + '\n'.join(triples) + "\n}\n"
+
+
+def run_bulk(batch_size: int, dry_run: bool = False, timeout: Optional[float] = None) -> Dict:
+    """
+    Compute every missing path locally and insert them in batches.
+
+    Args:
+        batch_size: Number of paths per INSERT DATA request
+        dry_run: Only report what would be inserted
+        timeout: Request timeout in seconds
+
+    Returns:
+        Dictionary with inserted count, per-level counts and unreachable count
+    """
+    started = time.monotonic()
+    parents = fetch_tree(timeout)
+    candidates = fetch_label_candidates(timeout)
+    existing = fetch_existing_paths(timeout)
+    print(f"Fetched {len(parents):,} collections, {len(existing):,} with a path, "
+          f"in {time.monotonic() - started:.1f}s")
+
+    new_paths, per_level = compute_paths(parents, candidates, existing)
+    for level in sorted(per_level):
+        print(f"Level {level}{' (roots)' if level == 0 else ''}: {per_level[level]:,} paths")
+    unreachable = len(parents) - len(existing) - len(new_paths)
+    if unreachable:
+        print(f"⚠ {unreachable:,} collections cannot get a path (no labelled root above them)")
+
+    items = sorted(new_paths.items())
+    inserted = 0
+    if dry_run:
+        print(f"Dry run: {len(items):,} paths would be inserted")
+        for subject, path in items[:10]:
+            print(f"  {subject} → {path}")
+    else:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            sparql_client.update(insert_paths_query(batch), timeout=timeout)
+            inserted += len(batch)
+            print(f"Inserted {inserted:,}/{len(items):,} paths")
+
+    return {'inserted': inserted, 'per_level': dict(per_level), 'unreachable': unreachable}
+
+
+def parse_args(argv: List[str] = None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Populate archival path appellations')
+    parser.add_argument('--seed', action='store_true', help='Fixpoint mode: run seed.sparql first')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Compute all paths locally and insert them with INSERT DATA')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Bulk mode: paths per INSERT DATA request (default: 500)')
+    parser.add_argument('--dry-run', action='store_true', help='Bulk mode: do not insert anything')
+    parser.add_argument('--timeout', type=float, default=600,
+                        help='Request timeout in seconds (default: 600)')
+    args = parser.parse_args(argv)
+    if args.dry_run and not args.bulk:
+        parser.error('--dry-run requires --bulk')
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    sparql_client.check_credentials()
+
+    try:
+        if args.bulk:
+            stats = run_bulk(args.batch_size, args.dry_run, args.timeout)
+            print(f"✓ {stats['inserted']:,} paths inserted")
+        else:
+            levels = run_fixpoint(args.seed, args.timeout)
+            print(f"✓ {sum(levels):,} paths added in {len(levels)} runs")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Run the provenance import queries in subject batches.
+
+01–03 are whole-graph updates over every Source_Primary and its
+/container/context graph, which makes the endpoint time out on the full
+dataset. This driver restricts each update to a batch of subjects, runs the
+batches of a step concurrently and the steps one after another (02 and 03
+need the form records created by 01), then runs 04_verify_after_import.rq
+and prints a summary of the imported events.
+
+Two ways of splitting the subjects are available:
+
+    values (default)  The Source_Primary subjects are listed once and each batch
+                      gets a ``VALUES ?subject { ... }`` block.
+    hash              Each batch gets a filter on the first hex digits of
+                      MD5(STR(?subject)); no listing is needed, but every batch
+                      scans all subjects.
+
+The restriction is injected next to every ``?subject a
+veniss_ontology:Source_Primary`` pattern of a query, so subselects are
+restricted too. The queries stay idempotent, so failed batches can simply be
+rerun.
+
+Usage:
+    python run_provenance_import.py
+    python run_provenance_import.py --batch-size 200 --concurrency 2
+    python run_provenance_import.py --partition hash --partitions 256
+    python run_provenance_import.py --steps 02 03
+"""
+
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+from tqdm import tqdm
+
+BASE_DIR = Path(__file__).parent
+sys.path.insert(0, str(BASE_DIR.parent.parent))
+
+import sparql_client  # noqa: E402
+from sparql_client import prefix_block  # noqa: E402
+
+STEPS = {
+    '01': '01_create_form_records_for_subjects_with_prov_and_no_record.rq',
+    '02': '02_import_modification_events_from_prov_all.rq',
+    '03': '03_import_creation_event_from_earliest_prov_all.rq',
+}
+VERIFY_QUERY = '04_verify_after_import.rq'
+
+_SUBJECT_PATTERN = re.compile(r'^([ \t]*)\?subject a veniss_ontology:Source_Primary\b', re.MULTILINE)
+
+
+def restrict_subjects(query: str, restriction: str) -> str:
+    """
+    Insert a restriction before every Source_Primary subject pattern of a query.
+
+    Args:
+        query: Text of a provenance query
+        restriction: SPARQL line(s) binding or filtering ?subject
+
+    Returns:
+        The restricted query
+
+    Raises:
+        ValueError: If the query has no subject pattern
+    """
+    rendered, count = _SUBJECT_PATTERN.subn(
+        lambda m: f"{m.group(1)}{restriction}\n{m.group(0)}", query)
+    if not count:
+        raise ValueError('Query has no "?subject a veniss_ontology:Source_Primary" pattern')
+    return rendered
+
+
+def values_restriction(subjects: List[str]) -> str:
+    return f"VALUES ?subject {{ {' '.join(f'<{s}>' for s in subjects)} }}"
+
+
+def hash_restriction(prefix: str) -> str:
+    return f'FILTER(STRSTARTS(MD5(STR(?subject)), "{prefix}"))'
+
+
+def list_subjects(timeout: Optional[float] = None) -> List[str]:
+    """All Source_Primary subjects, sorted so batches are stable between runs."""
+    query = f"""{prefix_block('veniss_ontology')}
+SELECT ?subject WHERE {{ ?subject a veniss_ontology:Source_Primary . }}
+"""
+    return sorted(b['subject']['value'] for b in sparql_client.select(query, timeout) if 'subject' in b)
+
+
+def build_restrictions(partition: str, batch_size: int, partitions: int,
+                       timeout: Optional[float] = None) -> List[str]:
+    """
+    Restrictions covering all subjects, one per batch.
+
+    Args:
+        partition: 'values' or 'hash'
+        batch_size: Subjects per batch in values mode
+        partitions: Number of batches in hash mode (16 or 256)
+        timeout: Request timeout in seconds
+
+    Returns:
+        List of restriction lines
+    """
+    if partition == 'hash':
+        width = 1 if partitions == 16 else 2
+        return [hash_restriction(f"{n:0{width}x}") for n in range(partitions)]
+
+    subjects = list_subjects(timeout)
+    print(f"{len(subjects):,} Source_Primary subjects")
+    return [values_restriction(subjects[start:start + batch_size])
+            for start in range(0, len(subjects), batch_size)]
+
+
+def run_step(step: str, restrictions: List[str], concurrency: int, retries: int,
+             timeout: Optional[float] = None) -> Dict:
+    """
+    Run one provenance update over all batches.
+
+    Args:
+        step: Step number (key of STEPS)
+        restrictions: One restriction per batch
+        concurrency: Maximum number of batches running at the same time
+        retries: Extra attempts for a failing batch
+        timeout: Request timeout in seconds
+
+    Returns:
+        Dictionary with batches, failed batch numbers and elapsed seconds
+    """
+    query = (BASE_DIR / STEPS[step]).read_text(encoding='utf-8')
+
+    def run_batch(restriction):
+        rendered = restrict_subjects(query, restriction)
+        for attempt in range(retries + 1):
+            try:
+                sparql_client.update(rendered, timeout=timeout)
+                return
+            except requests.exceptions.RequestException:
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    started = time.monotonic()
+    failed = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(run_batch, r): num for num, r in enumerate(restrictions, 1)}
+        with tqdm(total=len(futures), desc=f"Step {step}", unit='batch') as pbar:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except requests.exceptions.RequestException as e:
+                    failed.append(futures[future])
+                    tqdm.write(f"Error in batch {futures[future]} of step {step}: {e}")
+                pbar.update(1)
+
+    return {'batches': len(restrictions), 'failed': sorted(failed), 'seconds': time.monotonic() - started}
+
+
+def verify(timeout: Optional[float] = None) -> Dict:
+    """
+    Run 04_verify_after_import.rq and summarize the imported events.
+
+    Returns:
+        Dictionary with the number of rows, subjects and events per type
+    """
+    query = (BASE_DIR / VERIFY_QUERY).read_text(encoding='utf-8')
+    rows = 0
+    subjects = set()
+    event_types = Counter()
+    for binding in sparql_client.select(query, timeout):
+        rows += 1
+        subjects.add(binding['subject']['value'])
+        event_types[binding['evType']['value'].rsplit('/', 1)[-1]] += 1
+    return {'rows': rows, 'subjects': len(subjects), 'event_types': dict(event_types)}
+
+
+def parse_args(argv: List[str] = None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Run the provenance import in subject batches')
+    parser.add_argument('--steps', nargs='+', default=list(STEPS), metavar='STEP',
+                        help=f"Steps to run, in order (default: {' '.join(STEPS)})")
+    parser.add_argument('--partition', choices=['values', 'hash'], default='values',
+                        help='How subjects are split into batches (default: values)')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Values mode: subjects per batch (default: 500)')
+    parser.add_argument('--partitions', type=int, choices=[16, 256], default=16,
+                        help='Hash mode: number of batches (default: 16)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Maximum number of batches running at the same time (default: 4)')
+    parser.add_argument('--retries', type=int, default=2, help='Extra attempts for a failing batch (default: 2)')
+    parser.add_argument('--timeout', type=float, default=600, help='Request timeout in seconds (default: 600)')
+    parser.add_argument('--skip-verify', action='store_true', help='Do not run 04_verify_after_import.rq')
+    args = parser.parse_args(argv)
+    unknown = [step for step in args.steps if step not in STEPS]
+    if unknown:
+        parser.error(f"unknown step(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    sparql_client.check_credentials()
+
+    try:
+        restrictions = build_restrictions(args.partition, args.batch_size, args.partitions, args.timeout)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Could not list subjects: {e}")
+        return 1
+
+    failures = 0
+    for step in args.steps:
+        stats = run_step(step, restrictions, args.concurrency, args.retries, args.timeout)
+        failures += len(stats['failed'])
+        status = '✓' if not stats['failed'] else '⚠'
+        print(f"{status} Step {step}: {stats['batches'] - len(stats['failed'])}/{stats['batches']} batches "
+              f"in {stats['seconds']:.1f}s")
+        if stats['failed']:
+            print(f"  Failed batches: {', '.join(map(str, stats['failed']))} (rerun to retry, the queries are idempotent)")
+
+    if not args.skip_verify:
+        try:
+            summary = verify(args.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Verification query failed: {e}")
+            return 1
+        print(f"Verification: {summary['rows']:,} events on {summary['subjects']:,} form records")
+        for event_type, count in sorted(summary['event_types'].items()):
+            print(f"  {event_type}: {count:,}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
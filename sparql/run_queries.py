@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Run SPARQL update files concurrently and record how long each one takes.
+
+Replaces the sequential curl loop of run_all_search_term_queries.sh. Query
+files without dependencies between them run in parallel (up to --concurrency
+at a time); a file only starts once every file it depends on has succeeded,
+and files whose dependencies failed are skipped.
+
+The wall time, HTTP status and response size of every query are appended to
+logs/query_timings.jsonl (one JSON object per run), so the queries that
+dominate the nightly window can be found with --report.
+
+Usage:
+    python run_queries.py                          # the five search_term.rq files
+    python run_queries.py --with-cleanup           # cleanup_search_terms.rq before each search_term.rq
+    python run_queries.py --plan nightly.json --concurrency 2
+    python run_queries.py --report                 # average timings of previous runs
+
+A plan file is a JSON list of queries:
+    [
+      {"name": "person cleanup", "file": "person/cleanup_search_terms.rq"},
+      {"name": "person", "file": "person/search_term.rq", "after": ["person cleanup"]}
+    ]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+import sparql_client
+
+BASE_DIR = Path(__file__).parent
+LOG_DIR = BASE_DIR / 'logs'
+LOG_FILE = LOG_DIR / 'search_term_cron.log'
+HISTORY_FILE = LOG_DIR / 'query_timings.jsonl'
+
+SEARCH_TERM_ENTITIES = ['event', 'group', 'person', 'primary_source', 'secondary_source']
+
+_log_lock = threading.Lock()
+
+
+def log_message(message: str):
+    """Print a message and append it to the cron log, in the format of the old shell script."""
+    line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}"
+    with _log_lock:
+        print(line, flush=True)
+        with open(LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def default_plan(with_cleanup: bool = False) -> List[Dict]:
+    """
+    The search_term.rq files of every entity type.
+
+    Args:
+        with_cleanup: Also run each type's cleanup_search_terms.rq, before its search_term.rq
+
+    Returns:
+        List of plan entries (name, file, after)
+    """
+    plan = []
+    for entity in SEARCH_TERM_ENTITIES:
+        after = []
+        cleanup = Path(entity) / 'cleanup_search_terms.rq'
+        if with_cleanup and (BASE_DIR / cleanup).exists():
+            plan.append({'name': f'{entity} cleanup', 'file': str(cleanup), 'after': []})
+            after = [f'{entity} cleanup']
+        plan.append({'name': entity, 'file': str(Path(entity) / 'search_term.rq'), 'after': after})
+    return plan
+
+
+def load_plan(path: Path) -> List[Dict]:
+    """Read a plan file; relative query paths are resolved against this directory."""
+    with open(path, encoding='utf-8') as f:
+        plan = json.load(f)
+    for entry in plan:
+        entry.setdefault('name', entry['file'])
+        entry.setdefault('after', [])
+    return plan
+
+
+def validate_plan(plan: List[Dict]) -> Optional[str]:
+    """Return an error message if the plan has unknown dependencies or cycles, else None."""
+    names = [entry['name'] for entry in plan]
+    if len(names) != len(set(names)):
+        return 'duplicate query names in plan'
+    known = set(names)
+    for entry in plan:
+        missing = [dep for dep in entry['after'] if dep not in known]
+        if missing:
+            return f"'{entry['name']}' depends on unknown queries: {', '.join(missing)}"
+        if not (BASE_DIR / entry['file']).is_file():
+            return f"query file not found: {entry['file']}"
+
+    # Kahn's algorithm: every query must become runnable eventually
+    remaining = {entry['name']: set(entry['after']) for entry in plan}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            return f"dependency cycle between: {', '.join(sorted(remaining))}"
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return None
+
+
+def run_query(entry: Dict, timeout: Optional[float] = None) -> Dict:
+    """
+    Execute one update file.
+
+    Args:
+        entry: Plan entry
+        timeout: Request timeout in seconds
+
+    Returns:
+        Timing record with name, file, status, http_code, seconds and response_bytes
+    """
+    query = (BASE_DIR / entry['file']).read_text(encoding='utf-8')
+    record = {'name': entry['name'], 'file': entry['file'], 'http_code': None, 'response_bytes': 0}
+    log_message(f"Executing: {entry['file']} ({entry['name']})")
+
+    started = time.monotonic()
+    try:
+        response = sparql_client.update(query, timeout=timeout)
+        record['http_code'] = response.status_code
+        record['response_bytes'] = len(response.content)
+        record['status'] = 'success'
+    except requests.exceptions.RequestException as e:
+        if e.response is not None:
+            record['http_code'] = e.response.status_code
+            record['response_bytes'] = len(e.response.content)
+        record['status'] = 'error'
+        record['error'] = str(e)
+    record['seconds'] = round(time.monotonic() - started, 3)
+
+    if record['status'] == 'success':
+        log_message(f"SUCCESS: {entry['file']} - HTTP {record['http_code']} "
+                    f"in {record['seconds']:.1f}s ({record['response_bytes']:,} bytes)")
+    else:
+        log_message(f"ERROR: {entry['file']} after {record['seconds']:.1f}s: {record['error']}")
+    return record
+
+
+def run_plan(plan: List[Dict], concurrency: int = 2, timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Run the queries of a plan, respecting their dependencies.
+
+    Args:
+        plan: Plan entries (validated with validate_plan)
+        concurrency: Maximum number of queries running at the same time
+        timeout: Request timeout in seconds
+
+    Returns:
+        Timing records of all queries, in completion order; queries whose
+        dependencies failed get status 'skipped'
+    """
+    waiting = {entry['name']: entry for entry in plan}
+    succeeded = set()
+    failed = set()
+    records = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        running = {}
+        while waiting or running:
+            for name, entry in list(waiting.items()):
+                if any(dep in failed for dep in entry['after']):
+                    del waiting[name]
+                    failed.add(name)
+                    records.append({'name': name, 'file': entry['file'], 'status': 'skipped'})
+                    log_message(f"SKIPPED: {entry['file']} (a dependency failed)")
+                elif all(dep in succeeded for dep in entry['after']):
+                    del waiting[name]
+                    running[executor.submit(run_query, entry, timeout)] = name
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                record = future.result()
+                records.append(record)
+                (succeeded if record['status'] == 'success' else failed).add(name)
+
+    return records
+
+
+def append_history(records: List[Dict], started: datetime, wall_seconds: float, concurrency: int):
+    """Append one run to the timing history."""
+    entry = {
+        'started': started.isoformat(timespec='seconds'),
+        'wall_seconds': round(wall_seconds, 3),
+        'concurrency': concurrency,
+        'queries': records,
+    }
+    with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def print_report(last: int = 30):
+    """Print per-query timing statistics over the last runs of the history."""
+    if not HISTORY_FILE.exists():
+        print(f"No timing history yet ({HISTORY_FILE})")
+        return
+
+    with open(HISTORY_FILE, encoding='utf-8') as f:
+        runs = [json.loads(line) for line in f if line.strip()][-last:]
+    if not runs:
+        print(f"No timing history yet ({HISTORY_FILE})")
+        return
+
+    timings = defaultdict(list)
+    for run in runs:
+        for record in run['queries']:
+            if record.get('status') == 'success':
+                timings[record['name']].append(record)
+
+    print(f"Timings over the last {len(runs)} runs "
+          f"(average run wall time {sum(r['wall_seconds'] for r in runs) / len(runs):.1f}s)")
+    print(f"{'query':<32} {'runs':>5} {'avg s':>9} {'max s':>9} {'avg bytes':>11}")
+    rows = sorted(timings.items(), key=lambda item: -sum(r['seconds'] for r in item[1]) / len(item[1]))
+    for name, records in rows:
+        seconds = [r['seconds'] for r in records]
+        size = sum(r['response_bytes'] for r in records) / len(records)
+        print(f"{name:<32} {len(records):>5} {sum(seconds) / len(seconds):>9.1f} {max(seconds):>9.1f} {size:>11,.0f}")
+
+
+def parse_args(argv: List[str] = None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Run SPARQL update files concurrently with timing')
+    parser.add_argument('--plan', type=Path, help='JSON plan file (default: the five search_term.rq files)')
+    parser.add_argument('--with-cleanup', action='store_true',
+                        help='With the default plan: run cleanup_search_terms.rq before each search_term.rq')
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help='Maximum number of queries running at the same time (default: 2)')
+    parser.add_argument('--timeout', type=float, default=None, help='Request timeout in seconds (default: none)')
+    parser.add_argument('--report', action='store_true', help='Print statistics of previous runs and exit')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    if args.report:
+        print_report()
+        return 0
+
+    sparql_client.check_credentials()
+    plan = load_plan(args.plan) if args.plan else default_plan(args.with_cleanup)
+    error = validate_plan(plan)
+    if error:
+        log_message(f"ERROR: invalid plan: {error}")
+        return 1
+
+    log_message("=========================================")
+    log_message(f"Starting execution of {len(plan)} queries (concurrency {args.concurrency})")
+    log_message(f"Endpoint: {sparql_client.SPARQL_ENDPOINT}")
+    log_message(f"Base directory: {BASE_DIR}")
+    log_message("=========================================")
+
+    started_at = datetime.now()
+    started = time.monotonic()
+    records = run_plan(plan, args.concurrency, args.timeout)
+    wall_seconds = time.monotonic() - started
+    append_history(records, started_at, wall_seconds, args.concurrency)
+
+    counts = defaultdict(int)
+    for record in records:
+        counts[record['status']] += 1
+
+    log_message("=========================================")
+    log_message(f"Execution completed in {wall_seconds:.1f}s")
+    log_message(f"Successful queries: {counts['success']}")
+    log_message(f"Failed queries: {counts['error']}")
+    log_message(f"Skipped queries: {counts['skipped']}")
+    slowest = max((r for r in records if 'seconds' in r), key=lambda r: r['seconds'], default=None)
+    if slowest:
+        log_message(f"Slowest query: {slowest['file']} ({slowest['seconds']:.1f}s)")
+    log_message("=========================================")
+
+    return 1 if counts['error'] or counts['skipped'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
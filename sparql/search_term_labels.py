@@ -0,0 +1,268 @@
+"""
+Client-side computation of search-term labels.
+
+The search_term.rq queries assemble their labels on the endpoint with many
+OPTIONAL joins, COALESCE and CONCAT. For the entity types whose labels are
+built from a handful of name components (person, group, event), this module
+fetches those components in one flat SELECT, paginated, and builds the same
+labels in Python, so the triplestore only has to answer simple lookups and
+store the result.
+
+The label rules mirror the queries:
+
+    person  [appellation][alias (]family, given[)] [alias] [patronymic] [birth[ - death]]
+            one search term per combination of name components and per
+            birth and death year, as the query's ungrouped name and dates
+            subselects do
+    group   [appellation][alias (]family, given[)] [formation] [dissolution]
+            one search term per group
+    event   [label] [island] [typology] [year]
+            one search term per label and typology of each language (it,
+            en, untagged); with neither, a search term without a label, as
+            STRLANG with an unbound language leaves ?label unbound
+
+A component that is present is kept even if its value is empty, as the
+queries' IF(BOUND(...)) do; only the person dates are dropped when empty.
+Components matched several times are repeated, as the queries' joins repeat
+them. Where a query picks an arbitrary value with SAMPLE, the smallest value
+is used here, so reruns give the same labels.
+
+primary_source and secondary_source labels depend on the archival hierarchy
+and publication events; they stay server-side.
+"""
+
+from collections import defaultdict
+from itertools import product
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import sparql_client
+from sparql_client import prefix_block
+
+# Result rows fetched per request
+PAGE_SIZE = 10000
+
+_NAME_TYPES = """
+    VALUES (?name_type ?kind) {
+      (<https://veniss.net/resource/type/given_name> "given_name")
+      (<https://veniss.net/resource/type/family_name> "family_name")
+      (<https://veniss.net/resource/type/alias> "alias")
+      (<https://veniss.net/resource/type/appellation> "appellation")%s
+    }
+    ?item crm:P1_is_identified_by ?name_node .
+    ?name_node crm:P2_has_type ?name_type ;
+               rdfs:label ?raw ."""
+
+
+def _year(event_property: str, event_class: str, kind: str) -> str:
+    return f"""
+    ?item {event_property} ?year_event .
+    ?year_event a {event_class} ;
+                crm:P4_has_time-span ?year_timespan .
+    ?year_timespan crm:P170i_time_is_defined_by ?year_primitive .
+    ?year_primitive a crm:E61_Time-Primitive ;
+                    crm:P2_has_type veniss_types:time_primitive_year ;
+                    rdfs:label ?raw .
+    BIND("{kind}" AS ?kind)"""
+
+
+# UNION branches binding ?kind and ?raw for each label component
+COMPONENTS = {
+    'person': [
+        _NAME_TYPES % '\n      (<https://veniss.net/resource/type/patronymic> "patronymic")',
+        _year('crm:P98i_was_born', 'crm:E67_Birth', 'birth_year'),
+        _year('crm:P100i_died_in', 'crm:E69_Death', 'death_year'),
+    ],
+    'group': [
+        _NAME_TYPES % '',
+        _year('crm:P95i_was_formed_by', 'crm:E66_Formation', 'formation_year'),
+        _year('crm:P99i_dissolved_by', 'crm:E68_Dissolution', 'dissolution_year'),
+    ],
+    'event': [
+        """
+    ?item rdfs:label ?raw .
+    FILTER(LANG(?raw) IN ("it", "en", ""))
+    BIND("label" AS ?kind)""",
+        """
+    ?item crm:P2_has_type ?type_node .
+    ?type_node crm:P71i_is_listed_in <https://veniss.net/resource/vocab/event_types> ;
+               rdfs:label ?raw .
+    FILTER(LANG(?raw) IN ("it", "en", ""))
+    BIND("typology" AS ?kind)""",
+        """
+    ?item veniss_ontology:has_island ?island .
+    ?island crm:P1_is_identified_by ?island_id .
+    ?island_id a crm:E41_Appellation ;
+               crm:P2_has_type veniss_types:appellation ;
+               rdfs:label ?raw .
+    BIND("island" AS ?kind)""",
+        """
+    ?item crm:P4_has_time-span ?timespan .
+    ?timespan crm:P170i_time_is_defined_by ?time_primitive .
+    ?time_primitive a crm:E61_Time-Primitive ;
+                    crm:P2_has_type veniss_types:time_primitive_year ;
+                    rdfs:label ?raw .
+    BIND("year" AS ?kind)""",
+    ],
+}
+
+# Each entity gets one row of this kind, so entities without any component still get a label
+_ITEM_ROW = '\n    BIND("item" AS ?kind)'
+
+
+def components_query(entity_class: str, entity: str, missing_check: str, limit: int, offset: int) -> str:
+    """
+    Flat SELECT of the label components of the entities still without a search term.
+
+    Args:
+        entity_class: Prefixed class of the entity type
+        entity: Entity type (key of COMPONENTS)
+        missing_check: Body of the FILTER NOT EXISTS selecting entities without a search term
+        limit: Page size
+        offset: Page offset
+
+    Returns:
+        The SELECT query, one row per (item, kind, value, lang)
+    """
+    branches = '\n  UNION\n'.join(f"  {{{branch}\n  }}" for branch in COMPONENTS[entity] + [_ITEM_ROW])
+    return f"""{prefix_block('crm', 'rdf', 'rdfs', 'veniss_ontology', 'veniss_types')}
+SELECT ?item ?kind (STR(?raw) AS ?value) (LANG(?raw) AS ?lang)
+WHERE {{
+  {{
+    SELECT ?item WHERE {{
+      ?item rdf:type {entity_class} .
+      FILTER NOT EXISTS {{{missing_check}
+      }}
+    }}
+  }}
+{branches}
+}}
+ORDER BY ?item ?kind ?value ?lang
+LIMIT {int(limit)}
+OFFSET {int(offset)}
+"""
+
+
+def fetch_components(entity_class: str, entity: str, missing_check: str, timeout: Optional[float] = None,
+                     page_size: int = PAGE_SIZE) -> Dict[str, Dict[str, List[Tuple[str, str]]]]:
+    """
+    Fetch all label components, page by page.
+
+    All pages are read before anything is written, so the pagination is not
+    disturbed by new search terms.
+
+    Returns:
+        ``{item: {kind: [(value, lang), ...]}}``
+    """
+    items = defaultdict(lambda: defaultdict(list))
+    offset = 0
+    while True:
+        rows = 0
+        query = components_query(entity_class, entity, missing_check, page_size, offset)
+        for binding in sparql_client.select(query, timeout):
+            rows += 1
+            kind = binding['kind']['value']
+            values = items[binding['item']['value']][kind]
+            if kind != 'item':
+                values.append((binding['value']['value'], binding.get('lang', {}).get('value', '')))
+        if rows < page_size:
+            return items
+        offset += page_size
+
+
+def _values(components: Dict[str, List[Tuple[str, str]]], kind: str) -> List[str]:
+    """Values of a component, once per matching row."""
+    return sorted(value for value, _ in components.get(kind, ()))
+
+
+def _first(components: Dict[str, List[Tuple[str, str]]], kind: str) -> Optional[str]:
+    values = _values(components, kind)
+    return values[0] if values else None
+
+
+def _names(components: Dict[str, List[Tuple[str, str]]]) -> List[str]:
+    """Name values, one per combination of the name components (the queries' ?value)."""
+    names = []
+    for given, family, alias, appellation in product(
+            _values(components, 'given_name') or [None],
+            _values(components, 'family_name') or [None],
+            _values(components, 'alias') or [None],
+            _values(components, 'appellation') or [None]):
+        fullname = (f"{family}, " if family is not None else '') + (given or '')
+        person_name = f"{alias} ({fullname})" if alias is not None else fullname
+        names.append((appellation or '') + person_name)
+    return names
+
+
+def _join(*parts: Optional[str]) -> str:
+    """First part followed by every other present part, separated by spaces."""
+    head, *tail = parts
+    return (head or '') + ''.join(f" {part}" for part in tail if part is not None)
+
+
+def _dates(components: Dict[str, List[Tuple[str, str]]]) -> List[Optional[str]]:
+    """Date values, one per birth and death year combination (the query's ?dates)."""
+    # Death years are only reached through a birth in the query
+    births = _values(components, 'birth_year')
+    if not births:
+        return [None]
+    return [f"{birth} - {death}" if death is not None else birth
+            for birth, death in product(births, _values(components, 'death_year') or [None])]
+
+
+def person_labels(components: Dict[str, List[Tuple[str, str]]]) -> List[Tuple[str, Optional[str]]]:
+    alias = _first(components, 'alias')
+    patronymic = _first(components, 'patronymic')
+    # Empty dates are left out, as the query's ?dates != "" test does
+    return [(_join(name, alias, patronymic, dates or None), None)
+            for name, dates in product(_names(components), _dates(components))]
+
+
+def group_labels(components: Dict[str, List[Tuple[str, str]]]) -> List[Tuple[str, Optional[str]]]:
+    name = min(_names(components))
+    label = _join(name, _first(components, 'formation_year'), _first(components, 'dissolution_year'))
+    return [(label, None)]
+
+
+def event_labels(components: Dict[str, List[Tuple[str, str]]]) -> List[Tuple[Optional[str], Optional[str]]]:
+    labels_by_lang = defaultdict(list)
+    for value, lang in components.get('label', ()):
+        labels_by_lang[lang].append(value)
+    typologies_by_lang = defaultdict(list)
+    for value, lang in components.get('typology', ()):
+        typologies_by_lang[lang].append(value)
+
+    # Without an event label the language comes from the typology; with neither, ?lang is
+    # unbound and the query mints the search term without a label
+    langs = sorted(labels_by_lang) or sorted(typologies_by_lang)
+    if not langs:
+        return [(None, None)]
+    island = _first(components, 'island')
+    year = _first(components, 'year')
+
+    labels = []
+    for lang in langs:
+        for event_label, typology in product(sorted(labels_by_lang[lang]) or [None],
+                                             sorted(typologies_by_lang[lang]) or [None]):
+            labels.append((_join(event_label, island, typology, year), lang or None))
+    return labels
+
+
+LABEL_BUILDERS: Dict[str, Callable[[Dict], List[Tuple[Optional[str], Optional[str]]]]] = {
+    'person': person_labels,
+    'group': group_labels,
+    'event': event_labels,
+}
+
+
+def build_labels(entity: str, items: Dict[str, Dict]) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Build the search-term labels of the fetched entities.
+
+    Yields:
+        ``(item, label, lang)`` tuples; lang is None for plain literals and
+        label is None for a search term without a label
+    """
+    builder = LABEL_BUILDERS[entity]
+    for item in sorted(items):
+        for label, lang in builder(items[item]):
+            yield item, label, lang
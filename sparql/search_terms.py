@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Batched driver for the search_term.rq generation queries.
+
+Running a whole search_term.rq as one INSERT ... WHERE update makes the endpoint
+time out on full regenerations. This driver injects a LIMIT into the query's
+"entities without a search_term" subselect and repeats the update until no
+such entity is left, reporting progress after every batch.
+
+With --incremental only the entities whose form record was modified since the
+previous incremental run get their search terms deleted and regenerated. The
+modifications are found through the entity_form_record_modification events
+created by primary_source/provenance/02_import_modification_events_from_prov_all.rq.
+The events carry the time of the modification, not of their import, so the
+stored watermark is the start time of the run minus WATERMARK_OVERLAP rather
+than the latest modification seen: events imported late with an older
+timestamp are still picked up by the next run. The watermarks are stored per
+entity type in logs/search_terms_state.json.
+
+With --rebuild the search terms of a type are regenerated from scratch into a
+staging named graph, which then replaces the live search-term graph of the type
+in a single MOVE. The old search terms are dropped as a whole graph and the
+platform keeps serving the previous ones until the swap. --graph keeps the
+search terms of the other modes in the same named graph.
+
+With --client-side the labels of persons, groups and events are built in Python
+from one flat, paginated SELECT of their name components (see
+search_term_labels.py) and written back with INSERT DATA, instead of being
+assembled on the endpoint. Primary and secondary sources always use their
+search_term.rq.
+
+Usage:
+    python search_terms.py                          # all entity types
+    python search_terms.py person group --batch-size 200
+    python search_terms.py --incremental --since 2025-01-01T00:00:00Z   # first incremental run
+    python search_terms.py --incremental            # nightly refresh
+    python search_terms.py person --rebuild         # full rebuild with graph swap
+    python search_terms.py person group event --client-side --rebuild
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+import sparql_client
+import search_term_labels
+from sparql_client import iri, literal, prefix_block
+
+BASE_DIR = Path(__file__).parent
+STATE_PATH = BASE_DIR / 'logs' / 'search_terms_state.json'
+
+# Named graph holding the search terms of an entity type ({entity} is replaced by the type)
+DEFAULT_GRAPH = 'https://veniss.net/graph/search_terms/{entity}'
+
+# How far before the start of an incremental run the next one looks back, to catch
+# modification events imported after the run with an earlier timestamp
+WATERMARK_OVERLAP = timedelta(days=2)
+
+FORM_RECORD_MODIFICATION = 'http://www.researchspace.org/resource/system/vocab/resource_type/entity_form_record_modification'
+
+# Entity types with a search_term.rq, in the order they are processed.
+# 'candidate' lists the extra patterns an entity needs before the query can
+# give it a search term, so counts match what a batch can actually process.
+ENTITY_TYPES = {
+    'event': {
+        'class': 'veniss_ontology:Event',
+        'candidate': '',
+    },
+    'group': {
+        'class': 'veniss_ontology:Group',
+        'candidate': '',
+    },
+    'person': {
+        'class': 'veniss_ontology:Person',
+        'candidate': '',
+    },
+    'primary_source': {
+        'class': 'veniss_ontology:Source_Primary',
+        'candidate': """
+  ?item crm:P1_is_identified_by ?candidate_title .
+  ?candidate_title crm:P2_has_type veniss_types:attributed_title ;
+                   rdfs:label ?candidate_label .""",
+    },
+    'secondary_source': {
+        'class': 'veniss_ontology:Source_Secondary',
+        'candidate': '',
+    },
+}
+
+# The commented-out "# LIMIT 100" line inside each query's candidate subselect
+_LIMIT_MARKER = re.compile(r'^([ \t]*)#[ \t]*LIMIT[ \t]+\d+[ \t]*$', re.MULTILINE)
+
+# Opening line of each query's candidate subselect
+_CANDIDATE_SELECT = re.compile(r'^([ \t]*)SELECT[ \t]+(?:DISTINCT[ \t]+)?\?item[ \t]+WHERE[ \t]*\{[ \t]*$',
+                               re.MULTILINE)
+
+# Head of the INSERT template and the closing brace just before WHERE
+_INSERT_TEMPLATE = re.compile(r'^INSERT[ \t]*\{[ \t]*\n(.*?)^\}[ \t]*\n(?=WHERE)', re.MULTILINE | re.DOTALL)
+
+# The "already has a search_term" check of the candidate subselect
+_EXISTING_CHECK = re.compile(
+    r'^([ \t]*)FILTER NOT EXISTS \{[ \t]*\n'
+    r'(\s*\?item crm:P1_is_identified_by \?existingSt .*?veniss_types:search_term \.[ \t]*\n)'
+    r'[ \t]*\}',
+    re.MULTILINE | re.DOTALL)
+
+_HAS_SEARCH_TERM = """
+    ?item crm:P1_is_identified_by ?existingSt .
+    ?existingSt a crm:E41_Appellation ;
+                crm:P2_has_type veniss_types:search_term ."""
+
+
+def query_path(entity: str) -> Path:
+    """Path of the search_term.rq of an entity type."""
+    return BASE_DIR / entity / 'search_term.rq'
+
+
+def load_query(entity: str) -> str:
+    """Read the search_term.rq of an entity type."""
+    return query_path(entity).read_text(encoding='utf-8')
+
+
+def with_batch_limit(query: str, limit: int) -> str:
+    """
+    Enable the batch LIMIT of a search_term.rq.
+
+    Args:
+        query: Text of a search_term.rq
+        limit: Maximum number of entities handled by one update
+
+    Returns:
+        The query with its commented-out LIMIT replaced by ``LIMIT <limit>``
+
+    Raises:
+        ValueError: If the query has no LIMIT marker
+    """
+    rendered, count = _LIMIT_MARKER.subn(lambda m: f"{m.group(1)}LIMIT {int(limit)}", query, count=1)
+    if not count:
+        raise ValueError("Query has no '# LIMIT' marker in its candidate subselect")
+    return rendered
+
+
+def with_items(query: str, items: List[str]) -> str:
+    """
+    Restrict a search_term.rq to the given entities.
+
+    Args:
+        query: Text of a search_term.rq
+        items: Entity URIs
+
+    Returns:
+        The query with a ``VALUES ?item`` block at the start of its candidate subselect
+
+    Raises:
+        ValueError: If the query has no candidate subselect or a URI is not a valid IRI
+    """
+    match = _CANDIDATE_SELECT.search(query)
+    if not match:
+        raise ValueError("Query has no 'SELECT ?item WHERE {' candidate subselect")
+    indent = match.group(1) + '  '
+    values = f"{indent}VALUES ?item {{ {' '.join(iri(item) for item in items)} }}\n"
+    return query[:match.end()] + '\n' + values + query[match.end() + 1:]
+
+
+def _indent(text: str, prefix: str = '  ') -> str:
+    return ''.join(prefix + line if line.strip() else line for line in text.splitlines(keepends=True))
+
+
+def in_graph(query: str, graph: str) -> str:
+    """
+    Make a search_term.rq write to and check a named graph.
+
+    The INSERT template is wrapped in ``GRAPH <graph>`` and the check for an
+    existing search term only looks inside that graph, so batches and
+    rebuilds see exactly the search terms they wrote.
+
+    Args:
+        query: Text of a search_term.rq
+        graph: IRI of the named graph
+
+    Returns:
+        The rewritten query
+
+    Raises:
+        ValueError: If the query does not have the expected INSERT template or check
+    """
+    template = _INSERT_TEMPLATE.search(query)
+    check = _EXISTING_CHECK.search(query)
+    if not template or not check:
+        raise ValueError('Query does not have the expected INSERT template and search_term check')
+
+    query = (query[:template.start()]
+             + f"INSERT {{\n  GRAPH <{graph}> {{\n{_indent(template.group(1))}  }}\n}}\n"
+             + query[template.end():])
+
+    check = _EXISTING_CHECK.search(query)
+    indent = check.group(1)
+    return (query[:check.start()]
+            + f"{indent}FILTER NOT EXISTS {{\n{indent}  GRAPH <{graph}> {{\n{_indent(check.group(2))}{indent}  }}\n{indent}}}"
+            + query[check.end():])
+
+
+def graph_for(template: Optional[str], entity: str) -> Optional[str]:
+    """Named graph of an entity type, from a graph IRI that may contain ``{entity}``."""
+    return template.replace('{entity}', entity) if template else None
+
+
+def staging_graph(graph: str) -> str:
+    """Staging graph used while rebuilding a search-term graph."""
+    return f"{graph}/staging"
+
+
+def _missing_check(graph: Optional[str] = None) -> str:
+    """Pattern matching an existing search term of ?item (in ``graph`` if given)."""
+    if graph:
+        return f"\n    GRAPH <{graph}> {{{_indent(_HAS_SEARCH_TERM)}\n    }}"
+    return _HAS_SEARCH_TERM
+
+
+def count_missing_query(entity: str, graph: Optional[str] = None) -> str:
+    """SELECT counting the entities of a type that can get a search term but have none."""
+    config = ENTITY_TYPES[entity]
+    check = _missing_check(graph)
+    return f"""{prefix_block('crm', 'rdf', 'rdfs', 'veniss_ontology', 'veniss_types')}
+SELECT (COUNT(DISTINCT ?item) AS ?count)
+WHERE {{
+  ?item rdf:type {config['class']} .{config['candidate']}
+  FILTER NOT EXISTS {{{check}
+  }}
+}}
+"""
+
+
+def count_missing(entity: str, timeout: float = None, graph: Optional[str] = None) -> int:
+    """Number of entities of a type still waiting for a search term (in ``graph`` if given)."""
+    return sparql_client.select_count(count_missing_query(entity, graph), timeout=timeout)
+
+
+def run_batched(entity: str, batch_size: int, timeout: float = None, graph: Optional[str] = None) -> Dict:
+    """
+    Generate the missing search terms of an entity type in batches.
+
+    The batch update is repeated until no entity without a search term is
+    left. The loop also stops when a batch makes no progress, so entities
+    the query cannot label never cause an endless loop.
+
+    Args:
+        entity: Entity type (key of ENTITY_TYPES)
+        batch_size: Maximum number of entities per update
+        timeout: Request timeout in seconds
+        graph: Named graph to write the search terms to (default graph if None)
+
+    Returns:
+        Dictionary with batches, processed and remaining counts
+    """
+    query = with_batch_limit(load_query(entity), batch_size)
+    if graph:
+        query = in_graph(query, graph)
+
+    remaining = count_missing(entity, timeout, graph)
+    print(f"[{entity}] {remaining:,} entities without a search_term")
+
+    stats = {'batches': 0, 'processed': 0, 'remaining': remaining}
+    while remaining > 0:
+        started = time.monotonic()
+        sparql_client.update(query, timeout=timeout)
+        stats['batches'] += 1
+
+        now_remaining = count_missing(entity, timeout, graph)
+        processed = remaining - now_remaining
+        elapsed = time.monotonic() - started
+        print(f"[{entity}] batch {stats['batches']}: {processed:,} entities in {elapsed:.1f}s, "
+              f"{now_remaining:,} remaining")
+
+        if processed <= 0:
+            print(f"[{entity}] ⚠ no progress in the last batch, stopping with {now_remaining:,} entities left")
+            remaining = now_remaining
+            break
+
+        stats['processed'] += processed
+        remaining = now_remaining
+
+    stats['remaining'] = remaining
+    return stats
+
+
+def insert_search_terms_query(terms: Iterable[Tuple[str, Optional[str], Optional[str]]],
+                              graph: Optional[str] = None) -> str:
+    """
+    INSERT DATA of search terms, shaped like the ones search_term.rq creates.
+
+    Args:
+        terms: ``(item, label, lang)`` tuples; a None label writes the search
+            term without rdfs:label
+        graph: Named graph to write to (default graph if None)
+
+    Returns:
+        The update request
+    """
+    triples = []
+    for item, label, lang in terms:
+        st = iri(f"{item}/search_term/{uuid.uuid4()}")
+        label_triple = f" ;\n      rdfs:label {literal(label, lang)}" if label is not None else ''
+        triples.append(
+            f"  {iri(item)} crm:P1_is_identified_by {st} .\n"
+            f"  {st} a crm:E41_Appellation ;\n"
+            f"      crm:P2_has_type veniss_types:search_term{label_triple} ."
+        )
+    data = '\n'.join(triples)
+    if graph:
+        data = f"  GRAPH <{graph}> {{\n{_indent(data)}\n  }}"
+    return f"{prefix_block('crm', 'rdfs', 'veniss_types')}\nINSERT DATA {{\n{data}\n}}\n"
+
+
+def run_client_side(entity: str, batch_size: int, timeout: float = None, graph: Optional[str] = None) -> Dict:
+    """
+    Generate the missing search terms of an entity type with labels built in Python.
+
+    The name components of every entity without a search term are fetched
+    first (all pages), the labels are built locally and the search terms are
+    written with INSERT DATA requests.
+
+    Args:
+        entity: Entity type (key of search_term_labels.LABEL_BUILDERS)
+        batch_size: Maximum number of search terms per INSERT DATA request
+        timeout: Request timeout in seconds
+        graph: Named graph to write the search terms to (default graph if None)
+
+    Returns:
+        Dictionary with batches, processed and remaining counts
+    """
+    started = time.monotonic()
+    items = search_term_labels.fetch_components(ENTITY_TYPES[entity]['class'], entity,
+                                                _missing_check(graph), timeout)
+    terms = list(search_term_labels.build_labels(entity, items))
+    print(f"[{entity}] {len(terms):,} labels for {len(items):,} entities built "
+          f"in {time.monotonic() - started:.1f}s")
+
+    stats = {'batches': 0, 'processed': len(items), 'remaining': 0}
+    for start in range(0, len(terms), batch_size):
+        batch = terms[start:start + batch_size]
+        sparql_client.update(insert_search_terms_query(batch, graph), timeout=timeout)
+        stats['batches'] += 1
+        print(f"[{entity}] inserted {start + len(batch):,}/{len(terms):,} search terms")
+
+    stats['remaining'] = count_missing(entity, timeout, graph)
+    return stats
+
+
+def modified_entities_query(entity: str, since: str) -> str:
+    """SELECT of the entities of a type whose form record was modified after ``since``."""
+    config = ENTITY_TYPES[entity]
+    return f"""{prefix_block('crm', 'crmdig', 'rdf', 'xsd', 'veniss_ontology')}
+SELECT DISTINCT ?item
+WHERE {{
+  ?item rdf:type {config['class']} ;
+        crm:P129i_is_subject_of ?record .
+  ?record crmdig:L11i_was_output_of ?event .
+  ?event crm:P2_has_type <{FORM_RECORD_MODIFICATION}> ;
+         crm:P4_has_time-span ?timespan .
+  ?timespan crm:P82_at_some_time_within ?t .
+  FILTER(?t > "{since}"^^xsd:dateTime)
+}}
+"""
+
+
+def modified_entities(entity: str, since: str, timeout: float = None) -> List[str]:
+    """
+    Find the entities of a type modified after a timestamp.
+
+    Args:
+        entity: Entity type (key of ENTITY_TYPES)
+        since: xsd:dateTime lexical value; only later modifications are returned
+        timeout: Request timeout in seconds
+
+    Returns:
+        URIs of the modified entities
+    """
+    return [binding['item']['value']
+            for binding in sparql_client.select(modified_entities_query(entity, since), timeout)]
+
+
+def delete_search_terms_query(items: List[str], graph: Optional[str] = None) -> str:
+    """
+    DELETE of every triple of the search terms of the given entities (in ``graph`` if given).
+
+    Raises:
+        ValueError: If a URI is not a valid IRI
+    """
+    values = ' '.join(iri(item) for item in items)
+    pattern = """
+  ?item crm:P1_is_identified_by ?st .
+  ?st ?p ?o ."""
+    match = """
+  ?item crm:P1_is_identified_by ?st .
+  ?st crm:P2_has_type veniss_types:search_term ;
+      ?p ?o ."""
+    if graph:
+        pattern = f"\n  GRAPH <{graph}> {{{_indent(pattern)}\n  }}"
+        match = f"\n  GRAPH <{graph}> {{{_indent(match)}\n  }}"
+    return f"""{prefix_block('crm', 'veniss_types')}
+DELETE {{{pattern}
+}}
+WHERE {{
+  VALUES ?item {{ {values} }}{match}
+}}
+"""
+
+
+def refresh_entities(entity: str, items: List[str], batch_size: int, timeout: float = None,
+                     graph: Optional[str] = None) -> int:
+    """
+    Delete and regenerate the search terms of the given entities.
+
+    Args:
+        entity: Entity type (key of ENTITY_TYPES)
+        items: Entity URIs
+        batch_size: Maximum number of entities per update
+        timeout: Request timeout in seconds
+        graph: Named graph holding the search terms (default graph if None)
+
+    Returns:
+        Number of entities refreshed
+    """
+    query = load_query(entity)
+    if graph:
+        query = in_graph(query, graph)
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        started = time.monotonic()
+        sparql_client.update(delete_search_terms_query(batch, graph), timeout=timeout)
+        sparql_client.update(with_items(query, batch), timeout=timeout)
+        elapsed = time.monotonic() - started
+        print(f"[{entity}] refreshed {start + len(batch):,}/{len(items):,} entities ({elapsed:.1f}s)")
+    return len(items)
+
+
+def _format_time(value: datetime) -> str:
+    """xsd:dateTime lexical value of an aware datetime, in UTC."""
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse an xsd:dateTime value; values without a timezone are taken as UTC."""
+    # Python < 3.11 does not accept the 'Z' suffix
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def load_state(path: Path = STATE_PATH) -> Dict[str, str]:
+    """Watermarks of the previous incremental runs, keyed by entity type."""
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, str], path: Path = STATE_PATH):
+    """Write the watermarks atomically, so an interrupted run never leaves a broken file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    tmp.replace(path)
+
+
+def run_incremental(entity: str, since: str, batch_size: int, timeout: float = None,
+                    graph: Optional[str] = None) -> Dict:
+    """
+    Refresh the search terms of the entities modified after ``since``.
+
+    The new watermark is taken from the clock before the modified entities
+    are queried, minus WATERMARK_OVERLAP. Entities modified inside the
+    overlap are refreshed again by the next run, which is harmless.
+
+    Args:
+        entity: Entity type (key of ENTITY_TYPES)
+        since: Watermark of the previous run (xsd:dateTime lexical value)
+        batch_size: Maximum number of entities per update
+        timeout: Request timeout in seconds
+        graph: Named graph holding the search terms (default graph if None)
+
+    Returns:
+        Dictionary with the number of refreshed entities and the new watermark
+    """
+    watermark = _format_time(datetime.now(timezone.utc) - WATERMARK_OVERLAP)
+    items = modified_entities(entity, since, timeout)
+    print(f"[{entity}] {len(items):,} entities modified since {since}")
+    refreshed = refresh_entities(entity, items, batch_size, timeout, graph) if items else 0
+    return {'refreshed': refreshed, 'watermark': watermark}
+
+
+def run_rebuild(entity: str, graph: str, batch_size: int, timeout: float = None,
+                generate: Callable[..., Dict] = None, force: bool = False) -> Dict:
+    """
+    Rebuild the search-term graph of an entity type and swap it in.
+
+    The search terms are generated in batches into an empty staging graph,
+    which then replaces the live graph with one MOVE update. If generation
+    raises, or stops with entities still missing a search term, the MOVE is
+    skipped: the live graph is left untouched and the staging graph is kept
+    for inspection (the next rebuild drops it).
+
+    Args:
+        entity: Entity type (key of ENTITY_TYPES)
+        graph: Live search-term graph of the type
+        batch_size: Maximum number of entities per update
+        timeout: Request timeout in seconds
+        generate: Function filling the staging graph, called like run_batched
+            (default: run_batched)
+        force: Swap the staging graph in even if entities are still missing
+            a search term
+
+    Returns:
+        Dictionary with batches, processed and remaining counts, and whether
+        the staging graph was swapped in
+    """
+    generate = generate or run_batched
+    staging = staging_graph(graph)
+    sparql_client.update(f"DROP SILENT GRAPH <{staging}>", timeout=timeout)
+    print(f"[{entity}] building search terms in <{staging}>")
+
+    stats = generate(entity, batch_size, timeout, graph=staging)
+    stats['swapped'] = False
+    if stats['remaining'] and not force:
+        print(f"[{entity}] ⚠ {stats['remaining']:,} entities still without a search_term, "
+              f"<{graph}> left untouched and <{staging}> kept for inspection (use --force to swap anyway)")
+        return stats
+
+    started = time.monotonic()
+    sparql_client.update(f"MOVE SILENT GRAPH <{staging}> TO GRAPH <{graph}>", timeout=timeout)
+    print(f"[{entity}] swapped <{staging}> into <{graph}> in {time.monotonic() - started:.1f}s")
+    stats['swapped'] = True
+    return stats
+
+
+def parse_args(argv: List[str] = None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Generate search terms in batches')
+    parser.add_argument('entities', nargs='*', metavar='ENTITY',
+                        help=f"Entity types to process (default: all of {', '.join(ENTITY_TYPES)})")
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Maximum number of entities per update (default: 500)')
+    parser.add_argument('--timeout', type=float, default=600,
+                        help='Request timeout in seconds (default: 600)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only refresh entities whose form record was modified since the last incremental run')
+    parser.add_argument('--since', metavar='TIMESTAMP',
+                        help='With --incremental: xsd:dateTime to start from instead of the stored watermark')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Rebuild the search terms in a staging graph and swap it in (implies --graph)')
+    parser.add_argument('--graph', nargs='?', const=DEFAULT_GRAPH, metavar='IRI',
+                        help=f"Keep search terms in a named graph; {{entity}} is replaced by the type "
+                             f"(default: {DEFAULT_GRAPH})")
+    parser.add_argument('--client-side', action='store_true',
+                        help='Build person, group and event labels in Python and write them with INSERT DATA')
+    parser.add_argument('--force', action='store_true',
+                        help='With --rebuild: swap the staging graph in even if entities are still missing a search term')
+    args = parser.parse_args(argv)
+    unknown = [entity for entity in args.entities if entity not in ENTITY_TYPES]
+    if unknown:
+        parser.error(f"unknown entity type(s): {', '.join(unknown)}")
+    if args.incremental and args.rebuild:
+        parser.error('--incremental and --rebuild cannot be combined')
+    if args.incremental and args.client_side:
+        parser.error('--incremental and --client-side cannot be combined')
+    if args.force and not args.rebuild:
+        parser.error('--force requires --rebuild')
+    if args.rebuild and not args.graph:
+        args.graph = DEFAULT_GRAPH
+    if args.since:
+        if not args.incremental:
+            parser.error('--since requires --incremental')
+        try:
+            _parse_time(args.since)
+        except ValueError:
+            parser.error(f"invalid timestamp for --since: {args.since}")
+    return args
+
+
+def main_incremental(entities: List[str], args) -> int:
+    """Run the incremental refresh and advance the stored watermark of each entity type."""
+    state = load_state()
+    failures = 0
+    for entity in entities:
+        since = args.since or state.get(entity)
+        if since is None:
+            failures += 1
+            print(f"[{entity}] ❌ no previous incremental run recorded, pass --since TIMESTAMP")
+            continue
+        try:
+            stats = run_incremental(entity, since, args.batch_size, args.timeout,
+                                    graph_for(args.graph, entity))
+        except requests.exceptions.RequestException as e:
+            # The watermark is left untouched, so the next run retries the same entities
+            failures += 1
+            print(f"[{entity}] ❌ error: {e}")
+            continue
+        state[entity] = stats['watermark']
+        save_state(state)
+        print(f"[{entity}] ✓ {stats['refreshed']:,} entities refreshed, watermark {stats['watermark']}")
+
+    return 1 if failures else 0
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    sparql_client.check_credentials()
+
+    entities = args.entities or list(ENTITY_TYPES)
+    if args.incremental:
+        return main_incremental(entities, args)
+
+    failures = 0
+    for entity in entities:
+        graph = graph_for(args.graph, entity)
+        generate = run_batched
+        if args.client_side:
+            if entity in search_term_labels.LABEL_BUILDERS:
+                generate = run_client_side
+            else:
+                print(f"[{entity}] labels are built server-side for this type, using search_term.rq")
+        try:
+            if args.rebuild:
+                stats = run_rebuild(entity, graph, args.batch_size, args.timeout, generate, args.force)
+                if not stats['swapped']:
+                    failures += 1
+                    continue
+            else:
+                stats = generate(entity, args.batch_size, args.timeout, graph)
+            print(f"[{entity}] ✓ {stats['processed']:,} entities in {stats['batches']} batches, "
+                  f"{stats['remaining']:,} left without a search_term")
+        except requests.exceptions.RequestException as e:
+            failures += 1
+            print(f"[{entity}] ❌ error: {e}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
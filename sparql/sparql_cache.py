@@ -0,0 +1,222 @@
+"""
+Read-through cache for SPARQL SELECT/ASK results.
+
+Several tools send the same small read queries again and again, within one
+session (island URI lookups) or across a cron cycle (entity listings,
+identifier prefixes). ``SparqlCache`` keeps those results in memory and,
+optionally, in a SQLite file, keyed by endpoint and normalized query text.
+
+Entries expire after a TTL and both stores are bounded, evicting the least
+recently used entries first. Each entry is tagged with the named graphs its
+query reads (``GRAPH``/``FROM`` clauses; untagged queries read the default
+graph). ``invalidate_update`` drops the entries an update can affect, so a
+client that sends its updates through the same cache never reads its own
+stale results.
+
+Only cache results that are small and JSON-serializable; large listings
+should keep streaming with sparql_results.
+
+Configuration (environment, e.g. in sparql/.env):
+    SPARQL_CACHE        set to 0 to disable caching
+    SPARQL_CACHE_PATH   SQLite file for the disk cache (default: memory only)
+    SPARQL_CACHE_TTL    seconds before an entry expires (default: 3600)
+    SPARQL_CACHE_SIZE   maximum number of entries per store (default: 1000)
+
+Usage:
+    cache = SparqlCache.from_env()
+    rows = cache.get(endpoint, query)
+    if rows is None:
+        rows = run_query(...)
+        cache.put(endpoint, query, rows)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Optional, Set
+
+DEFAULT_TTL = 3600
+DEFAULT_SIZE = 1000
+
+# Tag of queries reading the default graph
+DEFAULT_GRAPH = ''
+
+_COMMENT_LINE = re.compile(r'^[ \t]*#.*$', re.MULTILINE)
+_WHITESPACE = re.compile(r'\s+')
+_READ_GRAPHS = re.compile(r'\b(?:GRAPH|FROM(?:\s+NAMED)?)\s+<([^>]*)>', re.IGNORECASE)
+# Graphs written by an update: GRAPH/WITH clauses and the operands of graph management operations
+_WRITE_GRAPHS = re.compile(
+    r'\b(?:GRAPH|WITH|INTO|TO|MOVE|COPY|ADD|DROP|CLEAR|SILENT)\s+(?:GRAPH\s+)?<([^>]*)>', re.IGNORECASE)
+
+
+def normalize_query(query: str) -> str:
+    """Query text with comment lines removed and whitespace collapsed."""
+    return _WHITESPACE.sub(' ', _COMMENT_LINE.sub('', query)).strip()
+
+
+def cache_key(endpoint: str, query: str) -> str:
+    return hashlib.sha256(f"{endpoint}\n{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+
+def read_graphs(query: str) -> Set[str]:
+    """Named graphs a query reads, or the default graph tag if it names none."""
+    return set(_READ_GRAPHS.findall(query)) or {DEFAULT_GRAPH}
+
+
+def write_graphs(update: str) -> Set[str]:
+    """Named graphs an update writes, or the default graph tag if it names none."""
+    return set(_WRITE_GRAPHS.findall(update)) or {DEFAULT_GRAPH}
+
+
+class SparqlCache:
+    """
+    Two-level (memory, optional SQLite) LRU cache of SPARQL read results.
+
+    Args:
+        path: SQLite file for the disk level (None for memory only)
+        ttl: Seconds before an entry expires
+        max_entries: Maximum number of entries kept by each level
+        enabled: When False, every lookup misses and nothing is stored
+    """
+
+    def __init__(self, path=None, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_SIZE,
+                 enabled: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if enabled and path:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    graphs TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> 'SparqlCache':
+        """Cache configured from the SPARQL_CACHE* environment variables."""
+        return cls(
+            path=os.getenv('SPARQL_CACHE_PATH') or None,
+            ttl=float(os.getenv('SPARQL_CACHE_TTL', DEFAULT_TTL)),
+            max_entries=int(os.getenv('SPARQL_CACHE_SIZE', DEFAULT_SIZE)),
+            enabled=os.getenv('SPARQL_CACHE', '1') != '0',
+        )
+
+    def get(self, endpoint: str, query: str) -> Optional[Any]:
+        """
+        Look up the cached result of a query.
+
+        Returns:
+            The cached value, or None on a miss or expired entry
+        """
+        if not self.enabled:
+            return None
+        key = cache_key(endpoint, query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, _, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, graphs, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, graphs, created = row
+                    if now - created <= self.ttl:
+                        self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = json.loads(value)
+                        self._remember(key, value, set(json.loads(graphs)), created)
+                        self.hits += 1
+                        return value
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, endpoint: str, query: str, value: Any, graphs: Optional[Iterable[str]] = None):
+        """
+        Store the result of a query.
+
+        Args:
+            endpoint: SPARQL endpoint URL
+            query: Query text
+            value: JSON-serializable result
+            graphs: Graphs the query reads (default: taken from the query text)
+        """
+        if not self.enabled:
+            return
+        key = cache_key(endpoint, query)
+        graphs = set(graphs) if graphs is not None else read_graphs(query)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, graphs, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, graphs, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value), json.dumps(sorted(graphs)), now, now))
+                self._db.execute("""
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                    )""", (self.max_entries,))
+                self._db.commit()
+
+    def _remember(self, key: str, value: Any, graphs: Set[str], created: float):
+        """Store an entry in memory, evicting the least recently used ones (caller holds the lock)."""
+        self._memory[key] = (value, graphs, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, graphs: Iterable[str]):
+        """
+        Drop the entries that read any of the given graphs.
+
+        Entries reading the default graph are always dropped: on the endpoint
+        the default graph is the union of all graphs.
+        """
+        graphs = set(graphs) | {DEFAULT_GRAPH}
+        with self._lock:
+            for key in [k for k, (_, tags, _) in self._memory.items() if tags & graphs]:
+                del self._memory[key]
+            if self._db is not None:
+                stale = [key for key, tags in self._db.execute("SELECT key, graphs FROM entries")
+                         if set(json.loads(tags)) & graphs]
+                self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in stale])
+                self._db.commit()
+
+    def invalidate_update(self, update: str):
+        """Drop the entries an update request can affect."""
+        self.invalidate(write_graphs(update))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
@@ -0,0 +1,162 @@
+"""
+Minimal client for the VeNiss SPARQL endpoint, shared by the Python drivers in this directory.
+
+Credentials are read from sparql/.env (see .env.template):
+    SPARQL_USERNAME, SPARQL_PASSWORD and optionally SPARQL_ENDPOINT.
+
+Small read results can be cached with select_cached() and ask(cached=True)
+(see sparql_cache.py for the SPARQL_CACHE* settings); every update() sent
+through this module invalidates the cached results of the graphs it writes.
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.auth import HTTPBasicAuth
+from dotenv import load_dotenv
+
+from sparql_cache import SparqlCache
+from sparql_results import SELECT_ACCEPT, iter_bindings
+# iri and literal are re-exported for the drivers building queries with this client
+from sparql_templates import iri, literal, prefixes  # noqa: F401
+
+# Load environment variables from the .env file next to this module
+load_dotenv(Path(__file__).parent / '.env')
+
+SPARQL_USERNAME = os.getenv('SPARQL_USERNAME')
+SPARQL_PASSWORD = os.getenv('SPARQL_PASSWORD')
+SPARQL_ENDPOINT = os.getenv('SPARQL_ENDPOINT', 'https://veniss.net/sparql')
+
+cache = SparqlCache.from_env()
+
+PREFIXES = {
+    'crm': 'http://www.cidoc-crm.org/cidoc-crm/',
+    'crmdig': 'http://www.cidoc-crm.org/extensions/crmdig/',
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
+    'xsd': 'http://www.w3.org/2001/XMLSchema#',
+    'veniss_ontology': 'https://veniss.net/ontology#',
+    'veniss_types': 'https://veniss.net/resource/type/',
+}
+
+
+def check_credentials():
+    """Check if SPARQL credentials are configured."""
+    if not SPARQL_USERNAME or not SPARQL_PASSWORD:
+        print("Error: SPARQL credentials not found.")
+        print("Please create a .env file in the sparql/ directory with:")
+        print("SPARQL_USERNAME=your_username")
+        print("SPARQL_PASSWORD=your_password")
+        sys.exit(1)
+
+
+def prefix_block(*names: str) -> str:
+    """Return PREFIX declarations for the given prefix names (all known prefixes if none given)."""
+    return prefixes(PREFIXES, *names)
+
+
+def _auth() -> HTTPBasicAuth:
+    return HTTPBasicAuth(SPARQL_USERNAME, SPARQL_PASSWORD)
+
+
+def select(query: str, timeout: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Run a SELECT query and yield its bindings while the response arrives.
+
+    Args:
+        query: SPARQL SELECT query
+        timeout: Request timeout in seconds
+
+    Yields:
+        Binding dictionaries in the SPARQL JSON results shape
+    """
+    with requests.post(
+        SPARQL_ENDPOINT,
+        data=query.encode('utf-8'),
+        headers={'Accept': SELECT_ACCEPT, 'Content-Type': 'application/sparql-query'},
+        auth=_auth(),
+        timeout=timeout,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+        yield from iter_bindings(response)
+
+
+def select_cached(query: str, timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Run a SELECT query through the read cache.
+
+    Only use this for small results: they are materialized and stored.
+
+    Args:
+        query: SPARQL SELECT query
+        timeout: Request timeout in seconds
+
+    Returns:
+        List of binding dictionaries
+    """
+    bindings = cache.get(SPARQL_ENDPOINT, query)
+    if bindings is None:
+        bindings = list(select(query, timeout))
+        cache.put(SPARQL_ENDPOINT, query, bindings)
+    return bindings
+
+
+def select_count(query: str, variable: str = 'count', timeout: Optional[float] = None) -> int:
+    """Run a SELECT query projecting a single COUNT and return it as an int."""
+    for binding in select(query, timeout):
+        if variable in binding:
+            return int(binding[variable]['value'])
+    return 0
+
+
+def ask(query: str, timeout: Optional[float] = None, cached: bool = False) -> bool:
+    """Run an ASK query and return its boolean answer (through the read cache if ``cached``)."""
+    if cached:
+        answer = cache.get(SPARQL_ENDPOINT, query)
+        if answer is not None:
+            return answer
+    response = requests.post(
+        SPARQL_ENDPOINT,
+        data=query.encode('utf-8'),
+        headers={'Accept': 'application/sparql-results+json', 'Content-Type': 'application/sparql-query'},
+        auth=_auth(),
+        timeout=timeout
+    )
+    response.raise_for_status()
+    answer = bool(response.json().get('boolean', False))
+    if cached:
+        cache.put(SPARQL_ENDPOINT, query, answer)
+    return answer
+
+
+def update(query: str, timeout: Optional[float] = None) -> requests.Response:
+    """
+    Run a SPARQL update.
+
+    Args:
+        query: SPARQL update request
+        timeout: Request timeout in seconds
+
+    Returns:
+        The endpoint response
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails
+    """
+    try:
+        response = requests.post(
+            SPARQL_ENDPOINT,
+            data=query.encode('utf-8'),
+            headers={'Content-Type': 'application/sparql-update'},
+            auth=_auth(),
+            timeout=timeout
+        )
+    finally:
+        # A failed or timed out update may still have been applied
+        cache.invalidate_update(query)
+    response.raise_for_status()
+    return response
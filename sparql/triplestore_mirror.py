@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of the triplestore facts the diagnosis and automation tools check.
+
+Existence checks, prefix diagnostics and mismatch reports ask the live endpoint
+for a small, stable set of facts. This module keeps those facts in a SQLite
+file so they can be answered at local-disk speed:
+
+    building_identifiers  rdfs:value of the identifiers of every entity
+                          (what check_building_exists asks)
+    repr_labels           2D representation labels of buildings, with the
+                          building label (comprehensive_sync_diagnosis.py,
+                          check_identifier_mismatches.py)
+    islands               island labels and URIs (get_island_uri)
+    search_terms          entities that have a search_term appellation
+                          (person and event cleanup_search_terms.py)
+
+``sync`` refreshes the mirror incrementally: each fact is streamed into a
+temporary table and only the rows that appeared or disappeared are written.
+Tools that insert into the triplestore can write the new facts through with
+``record_building`` so the mirror stays current between syncs.
+
+Usage:
+    python triplestore_mirror.py sync                       # all facts
+    python triplestore_mirror.py sync --facts repr_labels --max-age 3600
+    python triplestore_mirror.py status
+
+The mirror file defaults to sparql/logs/triplestore_mirror.sqlite
+(TRIPLESTORE_MIRROR_PATH to change it). Consumers only use facts synced
+within TRIPLESTORE_MIRROR_MAX_AGE seconds (default: 86400).
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+DEFAULT_PATH = Path(__file__).parent / 'logs' / 'triplestore_mirror.sqlite'
+DEFAULT_MAX_AGE = 86400
+
+# Rows written to the temporary table at a time during a sync
+INSERT_CHUNK = 5000
+
+FACTS = {
+    'building_identifiers': {
+        'columns': ['identifier'],
+        'query': """
+PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT DISTINCT ?identifier WHERE {
+  ?building crm:P1_is_identified_by ?identifier_node .
+  ?identifier_node rdfs:value ?identifier .
+}
+""",
+    },
+    'repr_labels': {
+        'columns': ['repr_label', 'building_label'],
+        'query': """
+PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX veniss: <https://veniss.net/ontology#>
+
+SELECT DISTINCT ?repr_label ?building_label WHERE {
+  ?building a veniss:Building ;
+            crm:P196i_is_defined_by ?physical_changes .
+  ?physical_changes crm:P166i_had_presence ?phase .
+  ?phase crm:P138i_has_representation ?repr .
+  ?repr rdfs:label ?repr_label .
+  OPTIONAL { ?building rdfs:label ?building_label . }
+}
+""",
+    },
+    'islands': {
+        'columns': ['label', 'uri'],
+        'query': """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX veniss: <https://veniss.net/ontology#>
+
+SELECT DISTINCT ?label ?uri WHERE {
+  ?uri a veniss:Island ;
+       rdfs:label ?label .
+  FILTER(LANG(?label) = "")
+}
+""",
+    },
+    'search_terms': {
+        'columns': ['item'],
+        'query': """
+PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
+PREFIX veniss_types: <https://veniss.net/resource/type/>
+
+SELECT DISTINCT ?item WHERE {
+  ?item crm:P1_is_identified_by ?search_term .
+  ?search_term a crm:E41_Appellation ;
+               crm:P2_has_type veniss_types:search_term .
+}
+""",
+    },
+}
+
+
+class TriplestoreMirror:
+    """
+    SQLite mirror of the FACTS tables.
+
+    Args:
+        path: SQLite file (created if missing)
+        max_age: Seconds after a sync during which a fact is considered fresh
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_age: float = DEFAULT_MAX_AGE):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._db:
+            for name, fact in FACTS.items():
+                columns = ', '.join(f"{column} TEXT" for column in fact['columns'])
+                key = ', '.join(fact['columns'])
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {name} ({columns}, UNIQUE ({key}))")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    fact TEXT PRIMARY KEY,
+                    synced_at REAL NOT NULL,
+                    row_count INTEGER NOT NULL
+                )""")
+
+    @classmethod
+    def open_if_present(cls) -> Optional['TriplestoreMirror']:
+        """The configured mirror if its file exists, else None (consumers then query the endpoint)."""
+        path = Path(os.getenv('TRIPLESTORE_MIRROR_PATH') or DEFAULT_PATH)
+        if not path.exists():
+            return None
+        return cls(path, float(os.getenv('TRIPLESTORE_MIRROR_MAX_AGE', DEFAULT_MAX_AGE)))
+
+    def synced_at(self, fact: str) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute("SELECT synced_at FROM sync_state WHERE fact = ?", (fact,)).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, fact: str) -> bool:
+        """True if the fact was synced within max_age seconds."""
+        synced = self.synced_at(fact)
+        return synced is not None and time.time() - synced <= self.max_age
+
+    def sync_fact(self, fact: str, rows: Iterable[tuple]) -> Dict:
+        """
+        Bring one fact table in line with the given rows, writing only the differences.
+
+        Args:
+            fact: Name of the fact (key of FACTS)
+            rows: Current rows, as tuples in the order of the fact's columns
+
+        Returns:
+            Dictionary with rows, added and removed counts
+        """
+        columns = FACTS[fact]['columns']
+        column_list = ', '.join(columns)
+        placeholders = ', '.join('?' for _ in columns)
+        # IS rather than = so NULL columns (buildings without a label) compare equal
+        same_row = ' AND '.join(f"f.{column} IS {fact}.{column}" for column in columns)
+        not_mirrored = ' AND '.join(f"m.{column} IS f.{column}" for column in columns)
+
+        with self._lock, self._db:
+            self._db.execute("DROP TABLE IF EXISTS temp.fresh")
+            self._db.execute(f"CREATE TEMP TABLE fresh ({column_list}, UNIQUE ({column_list}))")
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= INSERT_CHUNK:
+                    self._db.executemany(f"INSERT OR IGNORE INTO temp.fresh VALUES ({placeholders})", chunk)
+                    chunk = []
+            if chunk:
+                self._db.executemany(f"INSERT OR IGNORE INTO temp.fresh VALUES ({placeholders})", chunk)
+
+            removed = self._db.execute(
+                f"DELETE FROM {fact} WHERE NOT EXISTS (SELECT 1 FROM temp.fresh AS f WHERE {same_row})"
+            ).rowcount
+            added = self._db.execute(
+                f"INSERT INTO {fact} ({column_list}) SELECT {column_list} FROM temp.fresh AS f "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {fact} AS m WHERE {not_mirrored})"
+            ).rowcount
+            total = self._db.execute("SELECT COUNT(*) FROM temp.fresh").fetchone()[0]
+            self._db.execute("DROP TABLE temp.fresh")
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (fact, synced_at, row_count) VALUES (?, ?, ?)",
+                (fact, time.time(), total))
+
+        return {'rows': total, 'added': added, 'removed': removed}
+
+    def sync(self, select: Callable[[str], Iterator[Dict]], facts: Optional[List[str]] = None,
+             max_age: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Refresh the mirror from the endpoint.
+
+        Args:
+            select: Function running a SELECT query and yielding bindings
+            facts: Facts to refresh (default: all)
+            max_age: Skip facts synced less than this many seconds ago
+
+        Returns:
+            Sync statistics per refreshed fact
+        """
+        results = {}
+        for fact in facts or list(FACTS):
+            synced = self.synced_at(fact)
+            if max_age is not None and synced is not None and time.time() - synced < max_age:
+                continue
+            columns = FACTS[fact]['columns']
+            rows = (tuple(binding.get(column, {}).get('value') for column in columns)
+                    for binding in select(FACTS[fact]['query']))
+            started = time.monotonic()
+            results[fact] = self.sync_fact(fact, rows)
+            results[fact]['seconds'] = time.monotonic() - started
+        return results
+
+    def has_identifier(self, identifier: str) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM building_identifiers WHERE identifier = ?", (identifier,)).fetchone() is not None
+
+    def repr_labels(self, prefix: str) -> Set[str]:
+        """2D representation labels starting with a prefix."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT repr_label FROM repr_labels WHERE substr(repr_label, 1, ?) = ?",
+                (len(prefix), prefix)).fetchall()
+        return {row[0] for row in rows}
+
+    def repr_labels_with_buildings(self, prefix: str) -> Dict[str, List[str]]:
+        """2D representation labels starting with a prefix, with the labels of the buildings using them."""
+        result = {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT repr_label, building_label FROM repr_labels "
+                "WHERE substr(repr_label, 1, ?) = ? AND building_label IS NOT NULL ORDER BY repr_label",
+                (len(prefix), prefix)).fetchall()
+        for repr_label, building_label in rows:
+            result.setdefault(repr_label, []).append(building_label)
+        return result
+
+    def island_uri(self, label: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT MIN(uri) FROM islands WHERE label = ?", (label,)).fetchone()
+        return row[0] if row else None
+
+    def has_search_term(self, item: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM search_terms WHERE item = ?", (item,)).fetchone() is not None
+
+    def record_building(self, identifier: str, building_label: str, repr_labels: Iterable[str]):
+        """Write the facts of a newly inserted building through to the mirror."""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO building_identifiers (identifier) VALUES (?)", (identifier,))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO repr_labels (repr_label, building_label) VALUES (?, ?)",
+                [(label, building_label) for label in repr_labels])
+
+    def status(self) -> Dict[str, Dict]:
+        """Row count and last sync time of every fact."""
+        with self._lock:
+            rows = self._db.execute("SELECT fact, synced_at, row_count FROM sync_state").fetchall()
+        synced = {fact: (synced_at, count) for fact, synced_at, count in rows}
+        return {fact: {'synced_at': synced.get(fact, (None, 0))[0], 'rows': synced.get(fact, (None, 0))[1]}
+                for fact in FACTS}
+
+    def close(self):
+        self._db.close()
+
+
+def parse_args(argv: List[str] = None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Mirror key triplestore facts into SQLite')
+    parser.add_argument('command', choices=['sync', 'status'])
+    parser.add_argument('--facts', nargs='+', metavar='FACT',
+                        help=f"Facts to sync (default: all of {', '.join(FACTS)})")
+    parser.add_argument('--max-age', type=float, default=None,
+                        help='Skip facts synced less than this many seconds ago')
+    parser.add_argument('--path', type=Path, default=Path(os.getenv('TRIPLESTORE_MIRROR_PATH') or DEFAULT_PATH),
+                        help=f"Mirror file (default: {DEFAULT_PATH})")
+    args = parser.parse_args(argv)
+    unknown = [fact for fact in args.facts or [] if fact not in FACTS]
+    if unknown:
+        parser.error(f"unknown fact(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    mirror = TriplestoreMirror(args.path)
+
+    if args.command == 'status':
+        for fact, info in mirror.status().items():
+            when = datetime.fromtimestamp(info['synced_at']).isoformat(timespec='seconds') \
+                if info['synced_at'] else 'never'
+            print(f"{fact:<22} {info['rows']:>10,} rows   synced {when}")
+        return 0
+
+    import requests
+    import sparql_client
+
+    sparql_client.check_credentials()
+    try:
+        results = mirror.sync(sparql_client.select, args.facts, args.max_age)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Sync failed: {e}")
+        return 1
+    finally:
+        mirror.close()
+
+    if not results:
+        print("All facts are fresh, nothing to sync")
+    for fact, stats in results.items():
+        print(f"✓ {fact}: {stats['rows']:,} rows (+{stats['added']:,} / -{stats['removed']:,}) "
+              f"in {stats['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
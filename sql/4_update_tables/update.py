@@ -426,6 +426,76 @@ def _4_create_trigger_update_feature_source(cursor, t_name):
                 """
                 cursor.execute(query_create_trigger)
 
+# Fifth passage, maintain geometry fingerprints (see ../3_create_tables/4_geometry_fingerprints.pgsql)
+
+
+def _5_create_geometry_fingerprint(cursor, t_name):
+    for t in list_types:
+        table = f'{t_name}_{t}'
+        if _check_if_table_exists(cursor, f'{table}'):
+
+            print(f'Adding geometry fingerprint to {table} ...')
+            query_add_column = f"""
+              ALTER TABLE PUBLIC.{table} ADD COLUMN IF NOT EXISTS geometry_fp char(32);
+              CREATE INDEX IF NOT EXISTS {table}_identifier_fp_idx ON PUBLIC.{table} (identifier, geometry_fp);
+            """
+            cursor.execute(query_add_column)
+
+            # create trigger keeping the fingerprint current on insert and geometry update
+            query_trigger_fingerprint = f"""
+              DROP TRIGGER IF EXISTS set_geometry_fingerprint ON PUBLIC.{table};
+              CREATE TRIGGER set_geometry_fingerprint
+              BEFORE INSERT OR UPDATE OF geometry ON PUBLIC.{table}
+              FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.SET_geometry_fingerprint();
+            """
+            cursor.execute(query_trigger_fingerprint)
+
+            # Fill in existing rows with the UPDATE triggers disabled: update_veniss_data
+            # would copy QGIS geometries to veniss_data, and log_change_update (step 6,
+            # present when the pipeline is rerun) would log every row as changed
+            cursor.execute(f"""
+              SELECT tgname FROM pg_trigger
+              WHERE tgrelid = 'public.{table}'::regclass
+              AND tgname IN ('update_veniss_data', 'log_change_update');
+            """)
+            update_triggers = [row[0] for row in cursor.fetchall()]
+            disable = ''.join(f'ALTER TABLE PUBLIC.{table} DISABLE TRIGGER {trigger};\n' for trigger in update_triggers)
+            enable = ''.join(f'ALTER TABLE PUBLIC.{table} ENABLE TRIGGER {trigger};\n' for trigger in update_triggers)
+            query_backfill = f"""
+              {disable}
+              UPDATE PUBLIC.{table}
+              SET geometry_fp = PRODUCTION.geometry_fingerprint(geometry)
+              WHERE geometry_fp IS DISTINCT FROM PRODUCTION.geometry_fingerprint(geometry);
+              {enable}
+            """
+            cursor.execute(query_backfill)
+
+def _6_create_change_log_triggers(cursor, t_name):
+    for t in list_types:
+        table = f'{t_name}_{t}'
+        if _check_if_table_exists(cursor, f'{table}'):
+
+            print(f'Creating change log triggers for {table} ...')
+            # statement-level triggers logging the written identifiers to PRODUCTION.change_log
+            query_trigger_change_log = f"""
+              DROP TRIGGER IF EXISTS log_change_insert ON PUBLIC.{table};
+              DROP TRIGGER IF EXISTS log_change_update ON PUBLIC.{table};
+              DROP TRIGGER IF EXISTS log_change_delete ON PUBLIC.{table};
+              CREATE TRIGGER log_change_insert
+              AFTER INSERT ON PUBLIC.{table}
+              REFERENCING NEW TABLE AS new_rows
+              FOR EACH STATEMENT EXECUTE PROCEDURE PRODUCTION.LOG_changes();
+              CREATE TRIGGER log_change_update
+              AFTER UPDATE ON PUBLIC.{table}
+              REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+              FOR EACH STATEMENT EXECUTE PROCEDURE PRODUCTION.LOG_changes();
+              CREATE TRIGGER log_change_delete
+              AFTER DELETE ON PUBLIC.{table}
+              REFERENCING OLD TABLE AS old_rows
+              FOR EACH STATEMENT EXECUTE PROCEDURE PRODUCTION.LOG_changes();
+            """
+            cursor.execute(query_trigger_change_log)
+
 # generate the command for accepting table name from input
 
 
@@ -466,6 +536,16 @@ def execute_pipeline(table_name):
         print('[4] Done.\n')
         conn.commit()
 
+        print('[5] Creating geometry fingerprints ...')
+        _5_create_geometry_fingerprint(cursor, t_name)
+        print('[5] Done.\n')
+        conn.commit()
+
+        print('[6] Creating change log triggers ...')
+        _6_create_change_log_triggers(cursor, t_name)
+        print('[6] Done.\n')
+        conn.commit()
+
         print('##############################################')
         print('##                  TESTING                 ##')
         print('##############################################\n')
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """
-Check if santospirito buildings fall within the hardcoded bounding box
+Check if the buildings of every island fall within the hardcoded bounding box
+
+Reads the precomputed extents in PRODUCTION.island_extents
+(sql/3_create_tables/6_island_extents.pgsql) instead of computing ST_Extent
+over each island's table.
 """
 import psycopg2
 import os
@@ -17,31 +21,34 @@ HARDCODED_BBOX = {
     'maxY': 5692943.0214672936126590
 }
 
-def check_island_bbox(conn, island_name):
-    """Check if island buildings fall within hardcoded bbox"""
-    table_name = f"qgis_{island_name}_buildings"
-    
-    query = f"""
-    SELECT 
-        '{island_name}' as island,
-        ST_XMin(ST_Transform(ST_Extent(geometry), 3857)) as minX,
-        ST_YMin(ST_Transform(ST_Extent(geometry), 3857)) as minY,
-        ST_XMax(ST_Transform(ST_Extent(geometry), 3857)) as maxX,
-        ST_YMax(ST_Transform(ST_Extent(geometry), 3857)) as maxY,
-        COUNT(*) as building_count,
-        -- Check if island bbox overlaps with hardcoded bbox
-        CASE 
-            WHEN ST_XMax(ST_Transform(ST_Extent(geometry), 3857)) < {HARDCODED_BBOX['minX']} THEN 'OUTSIDE (too far west)'
-            WHEN ST_XMin(ST_Transform(ST_Extent(geometry), 3857)) > {HARDCODED_BBOX['maxX']} THEN 'OUTSIDE (too far east)'
-            WHEN ST_YMax(ST_Transform(ST_Extent(geometry), 3857)) < {HARDCODED_BBOX['minY']} THEN 'OUTSIDE (too far south)'
-            WHEN ST_YMin(ST_Transform(ST_Extent(geometry), 3857)) > {HARDCODED_BBOX['maxY']} THEN 'OUTSIDE (too far north)'
-            ELSE 'INSIDE'
+def check_island_bboxes(conn, layer='Buildings'):
+    """Extent of one layer of every island and where it lies relative to the hardcoded bbox"""
+    query = """
+    SELECT
+        island, minx, miny, maxx, maxy, feature_count,
+        CASE
+            WHEN maxx < %(minX)s THEN 'OUTSIDE (too far west)'
+            WHEN minx > %(maxX)s THEN 'OUTSIDE (too far east)'
+            WHEN maxy < %(minY)s THEN 'OUTSIDE (too far south)'
+            WHEN miny > %(maxY)s THEN 'OUTSIDE (too far north)'
+            WHEN minx >= %(minX)s AND maxx <= %(maxX)s AND miny >= %(minY)s AND maxy <= %(maxY)s THEN 'INSIDE'
+            ELSE 'PARTLY OUTSIDE'
         END as bbox_status
-    FROM {table_name};
+    FROM PRODUCTION.island_extents
+    WHERE t = %(layer)s
+    ORDER BY island;
     """
-    
+
+    cursor = conn.cursor()
+    cursor.execute(query, {**HARDCODED_BBOX, 'layer': layer})
+    results = cursor.fetchall()
+    cursor.close()
+    return results
+
+def get_map_extent(conn):
+    """Extent of all features (PRODUCTION.map_extent), the extent the map should open on"""
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute("SELECT minx, miny, maxx, maxy FROM PRODUCTION.map_extent")
     result = cursor.fetchone()
     cursor.close()
     return result
@@ -55,35 +62,35 @@ try:
         user=os.getenv('DB_USER'),
         password=os.getenv('DB_PASSWORD')
     )
-    
+
     print("Hardcoded Bounding Box (EPSG:3857):")
     print(f"  minX: {HARDCODED_BBOX['minX']}")
     print(f"  minY: {HARDCODED_BBOX['minY']}")
     print(f"  maxX: {HARDCODED_BBOX['maxX']}")
     print(f"  maxY: {HARDCODED_BBOX['maxY']}")
+
+    map_extent = get_map_extent(conn)
+    if map_extent and map_extent[0] is not None:
+        minX, minY, maxX, maxY = map_extent
+        print("\nExtent of all islands (PRODUCTION.map_extent, EPSG:3857):")
+        print(f"  minX: {minX}")
+        print(f"  minY: {minY}")
+        print(f"  maxX: {maxX}")
+        print(f"  maxY: {maxY}")
     print("\n" + "="*80 + "\n")
-    
-    # Check multiple islands
-    islands = ['santospirito', 'sansecondo', 'lazzarettovecchio', 'sanservolo']
-    
-    for island in islands:
-        try:
-            result = check_island_bbox(conn, island)
-            if result:
-                island_name, minX, minY, maxX, maxY, count, status = result
-                print(f"Island: {island_name}")
-                print(f"  Building Count: {count}")
-                print(f"  Bounding Box (EPSG:3857):")
-                print(f"    minX: {minX}")
-                print(f"    minY: {minY}")
-                print(f"    maxX: {maxX}")
-                print(f"    maxY: {maxY}")
-                print(f"  Status: {status}")
-                print()
-        except Exception as e:
-            print(f"Error checking {island}: {e}\n")
-    
+
+    for island_name, minX, minY, maxX, maxY, count, status in check_island_bboxes(conn):
+        print(f"Island: {island_name}")
+        print(f"  Building Count: {count}")
+        print(f"  Bounding Box (EPSG:3857):")
+        print(f"    minX: {minX}")
+        print(f"    minY: {minY}")
+        print(f"    maxX: {maxX}")
+        print(f"    maxY: {maxY}")
+        print(f"  Status: {status}")
+        print()
+
     conn.close()
-    
+
 except Exception as e:
     print(f"Database connection error: {e}")
@@ -6,8 +6,15 @@ import psycopg2
 import requests
 from requests.auth import HTTPBasicAuth
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'sparql'))
+from sparql_results import SELECT_ACCEPT, iter_bindings
+from triplestore_mirror import TriplestoreMirror
+import sparql_templates
+
 load_dotenv('VeNiss_queries/sparql/buildings_automation/.env')
 
 def get_qgis_identifiers(conn, island):
@@ -24,40 +31,30 @@ def get_production_identifiers(conn, prefix):
 
 def get_rdf_2d_labels(island_prefix):
     """Get all 2D representation labels from RDF for buildings with this prefix"""
-    query = f"""
-PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX veniss: <https://veniss.net/ontology#>
-
-SELECT DISTINCT ?building_label ?repr_label WHERE {{
-  ?building a veniss:Building ;
-            rdfs:label ?building_label ;
-            crm:P196i_is_defined_by ?physical_changes .
-  ?physical_changes crm:P166i_had_presence ?phase .
-  ?phase crm:P138i_has_representation ?repr .
-  ?repr rdfs:label ?repr_label .
-  FILTER(STRSTARTS(?repr_label, "{island_prefix}"))
-}}
-ORDER BY ?repr_label
-"""
+    mirror = TriplestoreMirror.open_if_present()
+    if mirror is not None and mirror.is_fresh('repr_labels'):
+        print("Reading RDF labels from the triplestore mirror")
+        return mirror.repr_labels_with_buildings(island_prefix)
+
+    query = sparql_templates.load('repr_labels_with_buildings').render(prefix=island_prefix)
     
     try:
-        response = requests.post(
+        with requests.post(
             os.getenv('SPARQL_ENDPOINT', 'https://veniss.net/sparql'),
             auth=HTTPBasicAuth(os.getenv('SPARQL_USERNAME'), os.getenv('SPARQL_PASSWORD')),
-            headers={'Accept': 'application/sparql-results+json'},
-            data={'query': query}
-        )
-        response.raise_for_status()
-        
-        results = response.json()
-        rdf_data = {}
-        for binding in results.get('results', {}).get('bindings', []):
-            repr_label = binding['repr_label']['value']
-            building_label = binding['building_label']['value']
-            if repr_label not in rdf_data:
-                rdf_data[repr_label] = []
-            rdf_data[repr_label].append(building_label)
+            headers={'Accept': SELECT_ACCEPT},
+            data={'query': query},
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            
+            rdf_data = {}
+            for binding in iter_bindings(response):
+                repr_label = binding['repr_label']['value']
+                building_label = binding['building_label']['value']
+                if repr_label not in rdf_data:
+                    rdf_data[repr_label] = []
+                rdf_data[repr_label].append(building_label)
         
         return rdf_data
     except Exception as e:
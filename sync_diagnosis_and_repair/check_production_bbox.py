@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """
 Check if buildings in PRODUCTION.veniss_data fall within the hardcoded bounding box
+
+Island extents come from PRODUCTION.island_extents
+(sql/3_create_tables/6_island_extents.pgsql); individual buildings are only
+tested for islands whose extent is not entirely inside the bbox.
 """
 import psycopg2
 import os
@@ -17,41 +21,35 @@ HARDCODED_BBOX = {
     'maxY': 5692943.0214672936126590
 }
 
-def check_production_bbox(conn, island_prefix):
-    """Check if buildings fall within hardcoded bbox in PRODUCTION.veniss_data"""
-    
-    query = f"""
-    SELECT 
-        '{island_prefix}' as island,
-        COUNT(*) as total_buildings,
-        COUNT(*) FILTER (WHERE ST_Within(geometry, ST_MakeEnvelope(
-            {HARDCODED_BBOX['minX']}, 
-            {HARDCODED_BBOX['minY']}, 
-            {HARDCODED_BBOX['maxX']}, 
-            {HARDCODED_BBOX['maxY']}, 
-            3857
-        ))) as buildings_in_bbox,
-        COUNT(*) - COUNT(*) FILTER (WHERE ST_Within(geometry, ST_MakeEnvelope(
-            {HARDCODED_BBOX['minX']}, 
-            {HARDCODED_BBOX['minY']}, 
-            {HARDCODED_BBOX['maxX']}, 
-            {HARDCODED_BBOX['maxY']}, 
-            3857
-        ))) as buildings_outside_bbox,
-        ST_XMin(ST_Extent(geometry)) as actual_minX,
-        ST_YMin(ST_Extent(geometry)) as actual_minY,
-        ST_XMax(ST_Extent(geometry)) as actual_maxX,
-        ST_YMax(ST_Extent(geometry)) as actual_maxY
-    FROM PRODUCTION.veniss_data
-    WHERE identifier LIKE '{island_prefix}%'
-    GROUP BY 1;
+def check_production_bboxes(conn, layer='Buildings'):
+    """Check if the features of one layer fall within the hardcoded bbox, for every island"""
+
+    query = """
+    SELECT
+        e.island,
+        e.feature_count as total_buildings,
+        e.feature_count - COALESCE(o.outside, 0) as buildings_in_bbox,
+        COALESCE(o.outside, 0) as buildings_outside_bbox,
+        e.minx, e.miny, e.maxx, e.maxy
+    FROM PRODUCTION.island_extents e
+    LEFT JOIN LATERAL (
+        -- Only islands whose extent is not entirely inside need a per-building test
+        SELECT COUNT(*) as outside
+        FROM PRODUCTION.veniss_data v
+        WHERE NOT (e.minx >= %(minX)s AND e.maxx <= %(maxX)s AND e.miny >= %(minY)s AND e.maxy <= %(maxY)s)
+        AND split_part(v.identifier, '_', 1) = e.island
+        AND v.t = e.t
+        AND NOT ST_Within(v.geometry, ST_MakeEnvelope(%(minX)s, %(minY)s, %(maxX)s, %(maxY)s, 3857))
+    ) o ON true
+    WHERE e.t = %(layer)s
+    ORDER BY e.island;
     """
-    
+
     cursor = conn.cursor()
-    cursor.execute(query)
-    result = cursor.fetchone()
+    cursor.execute(query, {**HARDCODED_BBOX, 'layer': layer})
+    results = cursor.fetchall()
     cursor.close()
-    return result
+    return results
 
 try:
     # Connect to database
@@ -62,7 +60,7 @@ try:
         user=os.getenv('DB_USER'),
         password=os.getenv('DB_PASSWORD')
     )
-    
+
     print("Checking PRODUCTION.veniss_data buildings against hardcoded bounding box")
     print("="*80)
     print(f"Hardcoded BBox (EPSG:3857):")
@@ -71,40 +69,26 @@ try:
     print(f"  maxX: {HARDCODED_BBOX['maxX']}")
     print(f"  maxY: {HARDCODED_BBOX['maxY']}")
     print("\n" + "="*80 + "\n")
-    
-    # Check islands with their identifier prefixes
-    islands = [
-        ('santospirito', 'SSP_BLDG'),
-        ('sansecondo', 'SSC_BLDG'),
-        ('lazzarettovecchio', 'LZV_BLDG'),
-        ('sanservolo', 'SSV_BLDG')
-    ]
-    
-    for island_name, prefix in islands:
-        try:
-            result = check_production_bbox(conn, prefix)
-            if result:
-                island, total, in_bbox, outside, minX, minY, maxX, maxY = result
-                print(f"Island: {island_name} (prefix: {prefix})")
-                print(f"  Total Buildings: {total}")
-                print(f"  Buildings INSIDE hardcoded bbox: {in_bbox}")
-                print(f"  Buildings OUTSIDE hardcoded bbox: {outside}")
-                print(f"  Actual extent (EPSG:3857):")
-                print(f"    minX: {minX}")
-                print(f"    minY: {minY}")
-                print(f"    maxX: {maxX}")
-                print(f"    maxY: {maxY}")
-                
-                if outside > 0:
-                    print(f"  ⚠️  WARNING: {outside} buildings fall outside the hardcoded bbox!")
-                    print(f"  This is why they don't appear on the map!")
-                else:
-                    print(f"  ✓ All buildings are within the bbox")
-                print()
-        except Exception as e:
-            print(f"Error checking {island_name}: {e}\n")
-    
+
+    for island, total, in_bbox, outside, minX, minY, maxX, maxY in check_production_bboxes(conn):
+        print(f"Island: {island}")
+        print(f"  Total Buildings: {total}")
+        print(f"  Buildings INSIDE hardcoded bbox: {in_bbox}")
+        print(f"  Buildings OUTSIDE hardcoded bbox: {outside}")
+        print(f"  Actual extent (EPSG:3857):")
+        print(f"    minX: {minX}")
+        print(f"    minY: {minY}")
+        print(f"    maxX: {maxX}")
+        print(f"    maxY: {maxY}")
+
+        if outside > 0:
+            print(f"  ⚠️  WARNING: {outside} buildings fall outside the hardcoded bbox!")
+            print(f"  This is why they don't appear on the map!")
+        else:
+            print(f"  ✓ All buildings are within the bbox")
+        print()
+
     conn.close()
-    
+
 except Exception as e:
     print(f"Database connection error: {e}")
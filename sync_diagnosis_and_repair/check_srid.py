@@ -1,7 +1,20 @@
 #!/usr/bin/env python3
 """
-Check the actual SRID of geometries in building tables
+Audit the SRID of the geometries of every QGIS table (and PRODUCTION.veniss_data)
+
+The declared SRIDs of all tables are read from geometry_columns in one query.
+Where the SRID is enforced - by the column type (geometry(MultiPolygon, 3003))
+or by a validated CHECK (st_srid(column) = <declared SRID>) constraint - the
+catalog is proof enough and no rows are read. Other tables get a TABLESAMPLE
+probe of about --sample-rows rows instead of a full scan. A sample can come
+back empty; the probe then reads the first --sample-rows geometries instead,
+as it does for tables that were never analyzed (no row estimate). A table
+where no geometry could be read is reported as not verified.
+
+Usage:
+    python check_srid.py [--sample-rows 1000]
 """
+import argparse
 import psycopg2
 import os
 from dotenv import load_dotenv
@@ -9,71 +22,170 @@ from dotenv import load_dotenv
 # Load environment from the buildings automation folder
 load_dotenv('VeNiss_queries/sparql/buildings_automation/.env')
 
-def check_geometry_srids(conn, island_name):
-    """Check actual SRID of geometries in the table"""
-    table_name = f"qgis_{island_name}_buildings"
-    
-    query = f"""
-    SELECT 
-        '{island_name}' as island,
-        COUNT(*) as total_buildings,
-        COUNT(DISTINCT ST_SRID(geometry)) as distinct_srids,
-        STRING_AGG(DISTINCT ST_SRID(geometry)::text, ', ') as srid_values,
-        postgis_typmod_srid(a.atttypmod) as column_srid
-    FROM {table_name}
-    CROSS JOIN (
-        SELECT atttypmod 
-        FROM pg_attribute a
-        JOIN pg_class c ON a.attrelid = c.oid
-        WHERE c.relname = '{table_name}' AND a.attname = 'geometry'
-    ) a
-    GROUP BY postgis_typmod_srid(a.atttypmod);
+# PRODUCTION.veniss_data is stored in Web Mercator
+PRODUCTION_SRID = 3857
+
+def quote_ident(name):
+    """Quote a schema, table or column name for use in SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+def get_declared_srids(conn):
     """
-    
+    Declared SRID and how it is enforced, for every geometry column of the audited tables.
+
+    Returns:
+        List of (schema, table, column, declared srid, geometry type, enforced by, estimated rows),
+        enforced by being 'type', 'constraint' or None and estimated rows being None for
+        tables that were never analyzed
+    """
+    query = """
+    SELECT
+        g.f_table_schema, g.f_table_name, g.f_geometry_column, g.srid, g.type,
+        CASE
+            WHEN postgis_typmod_srid(a.atttypmod) > 0 THEN 'type'
+            -- Only a constraint that is exactly the SRID test proves it (as AddGeometryColumn creates it)
+            WHEN EXISTS (
+                SELECT 1 FROM pg_constraint k
+                WHERE k.conrelid = c.oid AND k.contype = 'c' AND k.convalidated
+                AND pg_get_constraintdef(k.oid)
+                    = 'CHECK ((st_srid(' || quote_ident(g.f_geometry_column) || ') = ' || g.srid || '))'
+            ) THEN 'constraint'
+        END as enforced_by,
+        -- reltuples is -1 until the first VACUUM/ANALYZE (PostgreSQL 14+)
+        CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint END as estimated_rows
+    FROM geometry_columns g
+    JOIN pg_namespace n ON n.nspname = g.f_table_schema
+    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = g.f_table_name
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = g.f_geometry_column
+    WHERE (g.f_table_schema = 'public' AND g.f_table_name LIKE 'qgis_%')
+    OR (g.f_table_schema = 'production' AND g.f_table_name = 'veniss_data')
+    ORDER BY g.f_table_schema, g.f_table_name, g.f_geometry_column;
+    """
+
     cursor = conn.cursor()
     cursor.execute(query)
-    result = cursor.fetchone()
+    result = cursor.fetchall()
     cursor.close()
     return result
 
-try:
-    # Connect to database
-    conn = psycopg2.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        port=os.getenv('DB_PORT', '5432'),
-        database=os.getenv('DB_NAME', 'postgres'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD')
-    )
-    
-    print("Checking SRID of geometry data in building tables")
-    print("="*80 + "\n")
-    
-    # Check multiple islands
-    islands = ['santospirito', 'sansecondo', 'lazzarettovecchio', 'sanservolo']
-    
-    for island in islands:
-        try:
-            result = check_geometry_srids(conn, island)
-            if result:
-                island_name, total, distinct_count, srid_values, column_srid = result
-                print(f"Island: {island_name}")
-                print(f"  Total Buildings: {total}")
-                print(f"  Column SRID (from type definition): {column_srid}")
-                print(f"  Actual SRID(s) in data: {srid_values}")
-                print(f"  Number of distinct SRIDs: {distinct_count}")
-                
-                if '0' in srid_values:
-                    print(f"  ⚠️  WARNING: Geometries have SRID 0 (unset)!")
-                elif srid_values != str(column_srid):
-                    print(f"  ⚠️  WARNING: Data SRID doesn't match column SRID!")
-                else:
-                    print(f"  ✓ OK: SRID is properly set")
+def probe_srids(conn, schema, table, column, estimated_rows, sample_rows):
+    """
+    SRIDs found in a sample of about sample_rows rows (all rows of small tables).
+
+    Tables without a row estimate, and samples that came back empty, are probed
+    with the first sample_rows geometries instead, so no table is read in full
+    unless its estimate says it is small.
+
+    Returns:
+        Tuple of a dictionary mapping SRID to the number of sampled geometries
+        and a description of how the rows were read
+    """
+    cursor = conn.cursor()
+    target = f"{quote_ident(schema)}.{quote_ident(table)}"
+    column = quote_ident(column)
+
+    if estimated_rows is None:
+        how = 'first rows, never analyzed'
+    else:
+        percent = 100.0 if estimated_rows <= sample_rows else 100.0 * sample_rows / estimated_rows
+        sample = '' if percent >= 100 else f'TABLESAMPLE SYSTEM ({percent:.4f})'
+        cursor.execute(f"""
+            SELECT ST_SRID({column}), COUNT(*)
+            FROM {target} {sample}
+            WHERE {column} IS NOT NULL
+            GROUP BY 1
+        """)
+        result = dict(cursor.fetchall())
+        # An empty result of a full read means the table has no geometries
+        if result or not sample:
+            cursor.close()
+            return result, 'sample' if sample else 'all rows'
+        how = 'first rows, sample was empty'
+
+    cursor.execute(f"""
+        SELECT ST_SRID({column}), COUNT(*)
+        FROM (SELECT {column} FROM {target} WHERE {column} IS NOT NULL LIMIT %s) AS first_rows
+        GROUP BY 1
+    """, (sample_rows,))
+    result = dict(cursor.fetchall())
+    cursor.close()
+    return result, how
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Audit the SRIDs of the QGIS tables')
+    parser.add_argument('--sample-rows', type=int, default=1000,
+                        help='Rows probed in tables whose SRID is not enforced (default: 1000)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        # Connect to database
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '5432'),
+            database=os.getenv('DB_NAME', 'postgres'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD')
+        )
+
+        print("Auditing SRID of geometry data in QGIS tables")
+        print("="*80 + "\n")
+
+        columns = get_declared_srids(conn)
+        problems = 0
+        unverified = 0
+
+        for schema, table, column, declared, geom_type, enforced_by, estimated_rows in columns:
+            print(f"Table: {schema}.{table} ({column}, {geom_type})")
+            print(f"  Declared SRID: {declared}")
+
+            if schema == 'production' and declared != PRODUCTION_SRID:
+                print(f"  ⚠️  WARNING: PRODUCTION geometries should be in EPSG:{PRODUCTION_SRID}!")
+                problems += 1
+
+            if declared == 0:
+                print(f"  ⚠️  WARNING: No SRID declared (0)!")
+                problems += 1
+
+            if enforced_by:
+                print(f"  ✓ OK: SRID enforced by the column {enforced_by}, no rows read")
                 print()
-        except Exception as e:
-            print(f"Error checking {island}: {e}\n")
-    
-    conn.close()
-    
-except Exception as e:
-    print(f"Database connection error: {e}")
+                continue
+
+            try:
+                srids, how = probe_srids(conn, schema, table, column, estimated_rows, args.sample_rows)
+            except Exception as e:
+                print(f"  Error probing {table}: {e}\n")
+                conn.rollback()
+                unverified += 1
+                continue
+
+            sampled = sum(srids.values())
+            print(f"  Actual SRID(s) in {sampled} geometries ({how}): "
+                  f"{', '.join(str(srid) for srid in sorted(srids)) or '-'}")
+
+            if not srids:
+                print(f"  ⚠️  NOT VERIFIED: no geometries could be read")
+                unverified += 1
+            elif 0 in srids:
+                print(f"  ⚠️  WARNING: Geometries have SRID 0 (unset)!")
+                problems += 1
+            elif declared and set(srids) - {declared}:
+                print(f"  ⚠️  WARNING: Data SRID doesn't match column SRID!")
+                problems += 1
+            elif len(srids) > 1:
+                print(f"  ⚠️  WARNING: Mixed SRIDs in one table!")
+                problems += 1
+            else:
+                print(f"  ✓ OK: SRID is consistent (not enforced; {how})")
+            print()
+
+        print("="*80)
+        print(f"📊 {len(columns)} geometry columns audited, {problems} problem(s), {unverified} not verified")
+
+        conn.close()
+
+    except Exception as e:
+        print(f"Database connection error: {e}")
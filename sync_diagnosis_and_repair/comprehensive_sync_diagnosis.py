@@ -6,18 +6,52 @@ Checks synchronization between:
 2. production.veniss_data -> production.feature_sources
 3. Source columns in QGIS tables -> production.sources_years
 4. Existing triggers on tables
+5. 2D representation labels in RDF -> production.veniss_data, for every island
+
+The whole run reads one consistent snapshot of the database. A checksum
+pre-pass (count and hash of identifier and geometry per island and layer, on
+both sides) limits the identifier and orphan checks to the tables and prefixes
+that differ; --full checks every table. With --workers N the identifier checks
+are spread over N connections that import that snapshot. With --since-last only the identifiers
+written since the previous --since-last run (PRODUCTION.change_log) are checked,
+the orphan checks look only at the updated and deleted ones, totals are
+estimates, and the watermark moves forward on success.
+
+The report is written as NDJSON while issues are found; compare two reports
+with `python diagnosis_report.py diff`.
+
+Usage:
+    python comprehensive_sync_diagnosis.py [--workers 4] [--full] [--since-last]
 """
+import argparse
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 import requests
 from requests.auth import HTTPBasicAuth
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 from collections import defaultdict
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
+import time
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'sparql'))
+from sparql_cache import SparqlCache
+from sparql_results import SELECT_ACCEPT, iter_values
+from triplestore_mirror import TriplestoreMirror
+from diagnosis_report import NdjsonReportWriter
+import sparql_templates
+
 load_dotenv('VeNiss_queries/sparql/buildings_automation/.env')
 
+# Read cache for the RDF label listings (see sparql_cache.py for the settings)
+rdf_cache = SparqlCache.from_env()
+# Local copy of the 2D labels, used when synced recently (see triplestore_mirror.py)
+rdf_mirror = TriplestoreMirror.open_if_present()
+
 # Island configurations with their identifier prefixes
 ISLANDS_CONFIG = {
     'bueldellovo': 'BDO',
@@ -79,81 +113,529 @@ ISLANDS_CONFIG = {
 
 TABLE_TYPES = ['buildings', 'islands', 'openspaces', 'open_spaces']
 
+# Island and layer part of an identifier; keep in line with the SQL in reconcile_rdf_labels
+LABEL_PREFIX = re.compile(r'^([^_]+_[^_]+)_')
+
+# RDF labels fetched per request
+RDF_PAGE_SIZE = 10000
+
+# Candidate identifier columns, in order of preference
+IDENTIFIER_COLUMNS = ['identifier', 'BW_ID', 'bw_id']
+
+# Name under which --since-last stores its watermark in PRODUCTION.diagnosis_watermark
+WATERMARK_NAME = 'comprehensive_sync_diagnosis'
+
+# Trigger events encoded in pg_trigger.tgtype
+TRIGGER_EVENTS = [(4, 'INSERT'), (8, 'DELETE'), (16, 'UPDATE')]
+
+
+def db_params():
+    """Connection parameters from the environment"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+        'database': os.getenv('DB_NAME', 'postgres'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD')
+    }
+
 
 def connect_db():
     """Connect to PostgreSQL database"""
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        port=os.getenv('DB_PORT', '5432'),
-        database=os.getenv('DB_NAME', 'postgres'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD')
-    )
+    return psycopg2.connect(**db_params())
 
 
-def get_all_qgis_tables(conn):
-    """Get list of all qgis_ tables in public schema"""
+def get_catalog_snapshot(conn):
+    """
+    Read the columns and triggers of every public.qgis_* table in two catalog queries.
+    
+    Returns:
+        Dictionary mapping table name to a dictionary with:
+            columns: {column name: data type}, in column order
+            id_column: identifier column (None if the table has none)
+            boolean_columns: sorted boolean columns (the source columns)
+            triggers: [(trigger name, event, action statement)], sorted by trigger name
+    """
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public' 
-        AND table_name LIKE 'qgis_%'
-        ORDER BY table_name
+        SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), a.atttypid = 'boolean'::regtype
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE n.nspname = 'public'
+        AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND c.relname LIKE 'qgis_%'
+        ORDER BY c.relname, a.attnum
     """)
-    return [row[0] for row in cursor.fetchall()]
+    snapshot = {}
+    for table, column, data_type, is_boolean in cursor.fetchall():
+        info = snapshot.setdefault(table, {'columns': {}, 'boolean_columns': [], 'triggers': []})
+        if column is None:
+            continue
+        info['columns'][column] = data_type
+        if is_boolean:
+            info['boolean_columns'].append(column)
+    
+    cursor.execute("""
+        SELECT c.relname, t.tgname, t.tgtype,
+               substring(pg_get_triggerdef(t.oid) FROM 'EXECUTE .*$')
+        FROM pg_trigger t
+        JOIN pg_class c ON c.oid = t.tgrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+        AND c.relname LIKE 'qgis_%'
+        AND NOT t.tgisinternal
+        ORDER BY c.relname, t.tgname
+    """)
+    for table, trigger, tgtype, action in cursor.fetchall():
+        if table not in snapshot:
+            continue
+        for bit, event in TRIGGER_EVENTS:
+            if tgtype & bit:
+                snapshot[table]['triggers'].append((trigger, event, action))
+    
+    for info in snapshot.values():
+        info['boolean_columns'].sort()
+        info['id_column'] = next((col for col in IDENTIFIER_COLUMNS if col in info['columns']), None)
+    
+    return snapshot
+
+
+def quote_ident(name):
+    """Quote a table or column name for use in SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def qgis_identifiers_sql(catalog, tables, only=None):
+    """
+    UNION ALL of the identifier columns of the given QGIS tables.
+    
+    Args:
+        catalog: Catalog snapshot from get_catalog_snapshot
+        tables: Tables to include (tables without an identifier column are skipped)
+        only: SQL text[] expression (e.g. a query placeholder); if given, only these identifiers
+            are selected, by lookup rather than a scan of each table
+    
+    Returns:
+        SQL selecting (table_name, identifier) rows, or None if no table has an identifier column
+    """
+    parts = []
+    for table in tables:
+        id_col = catalog[table]['id_column']
+        if not id_col:
+            continue
+        column = quote_ident(id_col)
+        name = table.replace("'", "''")
+        lookup = f" AND {column}::text = ANY({only})" if only else ""
+        parts.append(
+            f"SELECT '{name}'::text AS table_name, {column}::text AS identifier "
+            f"FROM public.{quote_ident(table)} WHERE {column} IS NOT NULL AND {column}::text <> ''{lookup}"
+        )
+    return '\n        UNION ALL\n        '.join(parts) if parts else None
 
 
-def get_table_columns(conn, table_name, schema='public'):
-    """Get columns for a table"""
+def check_qgis_tables(conn, catalog, tables):
+    """
+    Count the identifiers of QGIS tables and find those missing from PRODUCTION.veniss_data.
+    
+    The anti-join runs in the database and the rows are read from a server-side
+    cursor, one table at a time; only counts, samples and missing identifiers
+    are returned. Tables without identifiers are not yielded.
+    
+    Yields:
+        (table, result) tuples, result being a dictionary with count, sample (first 3 identifiers)
+        and missing (sorted identifiers not in PRODUCTION.veniss_data)
+    """
+    union = qgis_identifiers_sql(catalog, tables)
+    if union is None:
+        return
+    
+    cursor = conn.cursor(name='qgis_checks')
+    # One table per fetch: a row can carry every missing identifier of its table
+    cursor.itersize = 1
+    cursor.execute(f"""
+        WITH qgis AS (
+        {union}
+        ),
+        ids AS (SELECT DISTINCT table_name, identifier FROM qgis),
+        production AS (SELECT DISTINCT identifier::text AS identifier FROM PRODUCTION.veniss_data)
+        SELECT i.table_name,
+               COUNT(*),
+               (array_agg(i.identifier ORDER BY i.identifier))[1:3],
+               COALESCE(array_agg(i.identifier ORDER BY i.identifier) FILTER (WHERE p.identifier IS NULL), '{{}}')
+        FROM ids i
+        LEFT JOIN production p ON p.identifier = i.identifier
+        GROUP BY i.table_name
+    """)
+    for table, count, sample, missing in cursor:
+        yield table, {'count': count, 'sample': sample, 'missing': missing}
+    cursor.close()
+
+
+def orphaned_production(conn, catalog, prepass=None, candidates=None):
+    """
+    PRODUCTION.veniss_data identifiers in no QGIS table, sorted, read from a server-side cursor.
+    
+    Args:
+        prepass: Result of changed_tables; if given, only the veniss_data identifiers of the
+            differing prefixes are looked up, in the tables using those prefixes
+        candidates: If given, only these identifiers are looked up, in every table
+    """
+    if candidates is not None:
+        union = qgis_identifiers_sql(catalog, sorted(catalog), only='%(candidates)s')
+        scope = "AND v.identifier = ANY(%(candidates)s)"
+        params = {'candidates': sorted(candidates)}
+        if not candidates:
+            return
+    elif prepass is None:
+        union = qgis_identifiers_sql(catalog, sorted(catalog))
+        scope, params = "", None
+    else:
+        union = qgis_identifiers_sql(catalog, sorted(prepass['tables']))
+        scope = "AND COALESCE(substring(v.identifier FROM '^([^_]+_[^_]+)_'), v.identifier) = ANY(%(prefixes)s)"
+        params = {'prefixes': prepass['prefixes']}
+        if not prepass['prefixes']:
+            return
+    if union is None:
+        return
+    
+    cursor = conn.cursor(name='orphaned_production')
+    cursor.execute(f"""
+        WITH qgis AS (
+        {union}
+        )
+        SELECT DISTINCT v.identifier
+        FROM PRODUCTION.veniss_data v
+        WHERE v.identifier IS NOT NULL
+        {scope}
+        AND NOT EXISTS (SELECT 1 FROM qgis q WHERE q.identifier = v.identifier::text)
+        ORDER BY 1
+    """, params)
+    for (identifier,) in cursor:
+        yield identifier
+    cursor.close()
+
+
+def orphaned_feature_sources(conn, candidates=None):
+    """
+    PRODUCTION.feature_sources identifiers not in veniss_data, sorted, read from a server-side cursor.
+    
+    Args:
+        candidates: If given, only these identifiers are looked up
+    """
+    scope, params = "", ()
+    if candidates is not None:
+        if not candidates:
+            return
+        scope, params = "AND f.identifier = ANY(%s)", (sorted(candidates),)
+    cursor = conn.cursor(name='orphaned_feature_sources')
+    cursor.execute(f"""
+        SELECT DISTINCT f.identifier
+        FROM PRODUCTION.feature_sources f
+        WHERE f.identifier IS NOT NULL
+        {scope}
+        AND NOT EXISTS (SELECT 1 FROM PRODUCTION.veniss_data v WHERE v.identifier = f.identifier)
+        ORDER BY 1
+    """, params)
+    for (identifier,) in cursor:
+        yield identifier
+    cursor.close()
+
+
+def report_orphans(report, category, title, identifiers, shown=20):
+    """
+    Write orphans to the report as they are read, printing the first ones.
+    
+    Returns:
+        Number of orphans
+    """
+    count = 0
+    for identifier in identifiers:
+        if count == 0:
+            print(f"\n❌ {title}:")
+        if count < shown:
+            print(f"    - {identifier}")
+        report.write(category, {'identifier': identifier})
+        count += 1
+    if count > shown:
+        print(f"    ... and {count - shown} more")
+    if count:
+        print(f"    Total: {count}")
+    return count
+
+
+def count_identifiers(conn, catalog, prepass=None):
+    """
+    Number of distinct identifiers in the QGIS tables, PRODUCTION.veniss_data and PRODUCTION.feature_sources.
+    
+    Args:
+        prepass: Result of changed_tables; if given, the QGIS and veniss_data numbers are its
+            counts of rows with an identifier, and only feature_sources is queried
+    
+    Returns:
+        Dictionary with qgis, production, feature_sources and unit (what the QGIS and
+        PRODUCTION numbers count, for printing)
+    """
+    if prepass is not None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(DISTINCT identifier) FROM PRODUCTION.feature_sources")
+        return {'qgis': prepass['qgis_rows'], 'production': prepass['production_rows'],
+                'feature_sources': cursor.fetchone()[0], 'unit': 'rows with an identifier',
+                'feature_sources_unit': 'distinct identifiers'}
+    union = qgis_identifiers_sql(catalog, sorted(catalog))
+    qgis_count = f"(SELECT COUNT(DISTINCT identifier) FROM ({union}) qgis)" if union else "0"
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {qgis_count},
+               (SELECT COUNT(DISTINCT identifier) FROM PRODUCTION.veniss_data),
+               (SELECT COUNT(DISTINCT identifier) FROM PRODUCTION.feature_sources)
+    """)
+    qgis, production, feature_sources = cursor.fetchone()
+    return {'qgis': qgis, 'production': production, 'feature_sources': feature_sources,
+            'unit': 'distinct identifiers', 'feature_sources_unit': 'distinct identifiers'}
+
+
+def estimate_identifiers(conn, catalog):
+    """
+    count_identifiers from the planner's row estimates (pg_class.reltuples); no table is read.
+    
+    Tables never analyzed (reltuples -1) count as 0.
+    """
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT column_name, data_type 
-        FROM information_schema.columns
-        WHERE table_schema = %s AND table_name = %s
-        ORDER BY ordinal_position
-    """, (schema, table_name))
-    return {row[0]: row[1] for row in cursor.fetchall()}
+        SELECT n.nspname = 'production' AND c.relname = 'veniss_data',
+               n.nspname = 'production' AND c.relname = 'feature_sources',
+               GREATEST(c.reltuples, 0)::bigint
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE (n.nspname = 'public' AND c.relname = ANY(%s))
+        OR (n.nspname = 'production' AND c.relname IN ('veniss_data', 'feature_sources'))
+    """, ([table for table, info in catalog.items() if info['id_column']],))
+    totals = {'qgis': 0, 'production': 0, 'feature_sources': 0,
+              'unit': 'rows (estimated)', 'feature_sources_unit': 'rows (estimated)'}
+    for is_production, is_feature_sources, rows in cursor.fetchall():
+        key = 'production' if is_production else 'feature_sources' if is_feature_sources else 'qgis'
+        totals[key] += rows
+    return totals
+
+
+def row_hash_sql(identifier, geometry_hash):
+    """SQL hashing one (identifier, geometry) row to a bigint; summed, it gives an order-independent checksum"""
+    return f"('x' || substr(md5({identifier} || ':' || {geometry_hash}), 1, 15))::bit(60)::bigint"
 
 
-def get_identifiers_from_qgis(conn, table_name):
-    """Get all identifiers from a QGIS table"""
+def compute_checksums(conn, catalog):
+    """
+    Count and checksum of the identifiers per island and layer (identifier prefix), on both sides.
+    
+    Where the QGIS table and PRODUCTION.veniss_data both have a geometry_fp
+    column the fingerprint is hashed with the identifier. Other tables hash the
+    WKB of their geometry as the veniss_data triggers write it
+    (ST_Transform(geometry, 3857), a no-op for tables already in EPSG:3857), so
+    geometry edits are caught either way; adding geometry_fp
+    (4_geometry_fingerprints.pgsql) spares the transform. Tables without a
+    geometry column are checksummed on the identifier alone.
+    
+    Returns:
+        Tuple of ({table: {'kind': 'fp', 'wkb' or 'id', 'prefixes': {prefix: (count, checksum)}}},
+                  {prefix: {'fp', 'wkb' or 'id': (count, checksum)}})
+    """
     cursor = conn.cursor()
-    columns = get_table_columns(conn, table_name)
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'production' AND table_name = 'veniss_data' AND column_name = 'geometry_fp'
+        )
+    """)
+    production_fp = cursor.fetchone()[0]
+    
+    parts = []
+    for table, info in sorted(catalog.items()):
+        id_col = info['id_column']
+        if not id_col:
+            continue
+        column = quote_ident(id_col)
+        name = table.replace("'", "''")
+        if production_fp and 'geometry_fp' in info['columns']:
+            kind, geometry_hash = 'fp', "COALESCE(geometry_fp, '')"
+        elif 'geometry' in info['columns']:
+            kind, geometry_hash = 'wkb', "COALESCE(md5(ST_AsBinary(ST_Transform(geometry, 3857))), '')"
+        else:
+            kind, geometry_hash = 'id', "''"
+        row_hash = row_hash_sql(f"{column}::text", geometry_hash)
+        parts.append(
+            f"SELECT '{name}'::text AS table_name, '{kind}'::text AS kind, {column}::text AS identifier, "
+            f"{row_hash} AS row_hash "
+            f"FROM public.{quote_ident(table)} WHERE {column} IS NOT NULL AND {column}::text <> ''"
+        )
+    qgis = defaultdict(dict)
+    kinds = {}
+    if parts:
+        union = '\n            UNION ALL\n            '.join(parts)
+        cursor.execute(f"""
+            SELECT table_name, kind, COALESCE(substring(identifier FROM '^([^_]+_[^_]+)_'), identifier),
+                   COUNT(*), SUM(row_hash)
+            FROM (
+                {union}
+            ) q
+            GROUP BY 1, 2, 3
+        """)
+        for table, kind, prefix, count, checksum in cursor.fetchall():
+            qgis[table][prefix] = (count, checksum)
+            kinds[table] = kind
     
-    # Check which identifier column exists
-    id_col = None
-    for possible_col in ['identifier', 'BW_ID', 'bw_id']:
-        if possible_col in columns:
-            id_col = possible_col
-            break
+    fp_hash = row_hash_sql('identifier', "COALESCE(geometry_fp, '')") if production_fp else 'NULL::bigint'
+    wkb_hash = row_hash_sql('identifier', "COALESCE(md5(ST_AsBinary(geometry)), '')")
+    id_hash = row_hash_sql('identifier', "''")
+    cursor.execute(f"""
+        SELECT COALESCE(substring(identifier FROM '^([^_]+_[^_]+)_'), identifier),
+               COUNT(*), SUM({fp_hash}), SUM({wkb_hash}), SUM({id_hash})
+        FROM PRODUCTION.veniss_data
+        WHERE identifier IS NOT NULL AND identifier <> ''
+        GROUP BY 1
+    """)
+    production = {}
+    for prefix, count, fp_checksum, wkb_checksum, id_checksum in cursor.fetchall():
+        production[prefix] = {'fp': (count, fp_checksum), 'wkb': (count, wkb_checksum), 'id': (count, id_checksum)}
+    for table in qgis:
+        qgis[table] = {'kind': kinds[table], 'prefixes': qgis[table]}
+    return dict(qgis), production
+
+
+def changed_tables(conn, catalog):
+    """
+    Checksum pre-pass: the QGIS tables and identifier prefixes that may differ from production.
     
-    if not id_col:
-        return set(), None
+    The aggregates of every prefix are summed over the QGIS tables using it and
+    compared with the PRODUCTION aggregate for that prefix; all tables using a
+    prefix that differs are returned. Prefixes found only in PRODUCTION differ
+    too (their identifiers can only be orphans). Empty tables are always returned.
     
-    try:
-        cursor.execute(f'SELECT DISTINCT "{id_col}" FROM public.{table_name} WHERE "{id_col}" IS NOT NULL')
-        return set(row[0] for row in cursor.fetchall() if row[0]), id_col
-    except Exception as e:
-        print(f"    Error reading {table_name}: {e}")
-        return set(), id_col
+    Returns:
+        Dictionary with:
+            tables: set of table names to check
+            prefixes: sorted prefixes whose aggregates differ (where orphans can be)
+            qgis_rows, production_rows: rows with an identifier counted by the pre-pass
+                (duplicate identifiers counted once per row)
+    """
+    qgis, production = compute_checksums(conn, catalog)
+    changed = {table for table, info in catalog.items() if info['id_column'] and table not in qgis}
+    
+    totals = defaultdict(lambda: [0, 0])
+    users = defaultdict(set)
+    for table, info in qgis.items():
+        for prefix, (count, checksum) in info['prefixes'].items():
+            key = (prefix, info['kind'])
+            totals[key][0] += count
+            totals[key][1] += checksum or 0
+            users[prefix].add(table)
+    
+    differing = set(production) - set(users)
+    for (prefix, kind), (count, checksum) in totals.items():
+        count_p, checksum_p = production.get(prefix, {}).get(kind, (0, 0))
+        if (count, checksum) != (count_p, checksum_p or 0):
+            differing.add(prefix)
+    # A prefix checksummed in two ways (some of its tables lack fingerprints) cannot be compared as a whole
+    for prefix, tables in users.items():
+        if len({qgis[table]['kind'] for table in tables}) > 1:
+            differing.add(prefix)
+    for prefix in differing:
+        changed |= users[prefix]
+    return {
+        'tables': changed,
+        'prefixes': sorted(differing),
+        'qgis_rows': sum(count for (count, checksum) in totals.values()),
+        'production_rows': sum(aggregates['id'][0] for aggregates in production.values())
+    }
 
 
-def get_production_identifiers(conn, prefix=None):
-    """Get all identifiers from PRODUCTION.veniss_data"""
+def get_changes_since_watermark(conn):
+    """
+    Identifiers logged in PRODUCTION.change_log since the last successful --since-last run.
+    
+    The watermark is the xmin of the previous run's snapshot: the rows of every
+    transaction from there on are read, including those still in progress then
+    and committed since, whatever their change_log id. Rows the previous run
+    already saw may be read again, which only repeats their check.
+    
+    Returns:
+        Tuple of ({table: sorted identifiers}, set of identifiers updated or deleted (the only
+        ones that can have become orphans), xmin of this snapshot: the next watermark);
+        changes and removed are None if no watermark is stored yet, all three are None if the
+        change log is not installed
+    """
     cursor = conn.cursor()
-    if prefix:
-        cursor.execute(f"SELECT DISTINCT identifier FROM PRODUCTION.veniss_data WHERE identifier LIKE '{prefix}%'")
-    else:
-        cursor.execute("SELECT DISTINCT identifier FROM PRODUCTION.veniss_data")
-    return set(row[0] for row in cursor.fetchall())
+    cursor.execute("SELECT to_regclass('production.change_log'), to_regclass('production.diagnosis_watermark')")
+    if None in cursor.fetchone():
+        return None, None, None
+    cursor.execute("SELECT snapshot_xmin::text FROM PRODUCTION.diagnosis_watermark WHERE name = %s",
+                   (WATERMARK_NAME,))
+    row = cursor.fetchone()
+    # Every transaction below this xmin had finished when the snapshot was taken
+    cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+    snapshot_xmin = cursor.fetchone()[0]
+    if row is None or row[0] is None:
+        return None, None, snapshot_xmin
+    
+    cursor.execute("""
+        SELECT table_name, array_agg(DISTINCT identifier ORDER BY identifier),
+               array_agg(DISTINCT identifier) FILTER (WHERE operation IN ('U', 'D'))
+        FROM PRODUCTION.change_log
+        WHERE xid >= %s::xid8 AND identifier IS NOT NULL AND identifier <> ''
+        GROUP BY table_name
+    """, (row[0],))
+    changes, removed = {}, set()
+    for table, identifiers, updated_or_deleted in cursor.fetchall():
+        changes[table] = identifiers
+        removed.update(updated_or_deleted or [])
+    return changes, removed, snapshot_xmin
+
 
+def store_watermark(snapshot_xmin):
+    """Record the snapshot xmin of a successful run (on its own connection; the diagnosis is read-only)"""
+    conn = connect_db()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO PRODUCTION.diagnosis_watermark (name, snapshot_xmin)
+                VALUES (%s, %s::xid8)
+                ON CONFLICT (name) DO UPDATE
+                SET snapshot_xmin = GREATEST(diagnosis_watermark.snapshot_xmin, EXCLUDED.snapshot_xmin),
+                    updated_at = now()
+            """, (WATERMARK_NAME, snapshot_xmin))
+        conn.commit()
+    finally:
+        conn.close()
 
-def get_feature_sources_identifiers(conn):
-    """Get all identifiers from PRODUCTION.feature_sources"""
+
+def check_changed_rows(conn, catalog, changes):
+    """
+    check_qgis_tables restricted to the identifiers in the change log.
+    
+    Args:
+        changes: {table: identifiers} from get_changes_since_watermark
+    
+    Yields:
+        Same as check_qgis_tables, for the changed tables that still exist;
+        count is the number of changed identifiers still in the table
+    """
     cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT identifier FROM PRODUCTION.feature_sources")
-    return set(row[0] for row in cursor.fetchall())
+    for table, identifiers in sorted(changes.items()):
+        id_col = catalog.get(table, {}).get('id_column')
+        if not id_col:
+            continue
+        column = quote_ident(id_col)
+        cursor.execute(f"""
+            SELECT COUNT(*),
+                   COALESCE((array_agg(c.identifier ORDER BY c.identifier))[1:3], '{{}}'),
+                   COALESCE(array_agg(c.identifier ORDER BY c.identifier) FILTER (
+                       WHERE NOT EXISTS (SELECT 1 FROM PRODUCTION.veniss_data p WHERE p.identifier::text = c.identifier)
+                   ), '{{}}')
+            FROM unnest(%s::text[]) AS c(identifier)
+            WHERE EXISTS (SELECT 1 FROM public.{quote_ident(table)} q WHERE q.{column}::text = c.identifier)
+        """, (identifiers,))
+        count, sample, missing = cursor.fetchone()
+        yield table, {'count': count, 'sample': sample, 'missing': missing}
 
 
 def get_sources_years(conn):
@@ -163,82 +645,234 @@ def get_sources_years(conn):
     return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
 
 
-def get_boolean_columns(conn, table_name):
-    """Get boolean columns from a table (these are source columns)"""
+def label_prefix(label):
+    """Island and layer part of an identifier (e.g. SSP_BLDG for SSP_BLDG_13), or the label itself"""
+    match = LABEL_PREFIX.match(label)
+    return match.group(1) if match else label
+
+
+def fetch_rdf_labels(page_size=RDF_PAGE_SIZE):
+    """
+    Get the 2D representation labels of all buildings, page by page.
+    
+    Returns:
+        Set of labels (empty if the endpoint could not be queried)
+    """
+    if rdf_mirror is not None and rdf_mirror.is_fresh('repr_labels'):
+        return rdf_mirror.repr_labels('')
+    
+    template = sparql_templates.load('repr_labels_page')
+    endpoint = os.getenv('SPARQL_ENDPOINT', 'https://veniss.net/sparql')
+    labels = set()
+    offset = 0
+    while True:
+        query = template.render(limit=page_size, offset=offset)
+        page = rdf_cache.get(endpoint, query)
+        if page is None:
+            try:
+                with requests.post(
+                    endpoint,
+                    auth=HTTPBasicAuth(os.getenv('SPARQL_USERNAME'), os.getenv('SPARQL_PASSWORD')),
+                    headers={'Accept': SELECT_ACCEPT},
+                    data={'query': query},
+                    timeout=120,
+                    stream=True
+                ) as response:
+                    response.raise_for_status()
+                    page = list(iter_values(response, 'repr_label'))
+            except Exception as e:
+                print(f"    Error querying RDF labels (offset {offset}): {e}")
+                return set()
+            rdf_cache.put(endpoint, query, page)
+        labels.update(page)
+        if len(page) < page_size:
+            return labels
+        offset += page_size
+
+
+def reconcile_rdf_labels(conn, labels):
+    """
+    Diff RDF 2D labels against PRODUCTION.veniss_data, per label prefix.
+    
+    The labels are sent once as an array; the database returns the labels it
+    does not know and the number of PRODUCTION identifiers for each prefix.
+    
+    Returns:
+        Dictionary mapping prefix to a dictionary with rdf (label count),
+        production (identifier count) and rdf_only (sorted labels not in PRODUCTION)
+    """
+    buckets = defaultdict(int)
+    for label in labels:
+        buckets[label_prefix(label)] += 1
+    results = {prefix: {'rdf': count, 'production': 0, 'rdf_only': []} for prefix, count in buckets.items()}
+    if not labels:
+        return results
+    
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT column_name 
-        FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = %s AND data_type = 'boolean'
-        ORDER BY column_name
-    """, (table_name,))
-    return [row[0] for row in cursor.fetchall()]
+        SELECT r.label
+        FROM unnest(%s::text[]) AS r(label)
+        WHERE NOT EXISTS (SELECT 1 FROM PRODUCTION.veniss_data v WHERE v.identifier = r.label)
+        ORDER BY 1
+    """, (sorted(labels),))
+    for (label,) in cursor.fetchall():
+        results[label_prefix(label)]['rdf_only'].append(label)
+    
+    cursor.execute("""
+        SELECT prefix, COUNT(DISTINCT identifier)
+        FROM (
+            SELECT identifier, COALESCE(substring(identifier FROM '^([^_]+_[^_]+)_'), identifier) AS prefix
+            FROM PRODUCTION.veniss_data
+        ) v
+        WHERE prefix = ANY(%s)
+        GROUP BY prefix
+    """, (sorted(results),))
+    for prefix, count in cursor.fetchall():
+        results[prefix]['production'] = count
+    return results
 
 
-def get_triggers_for_table(conn, table_name):
-    """Get all triggers defined on a table"""
+def run_parallel_checks(conn, catalog, tables, workers, record, prepass=None):
+    """
+    Run the identifier checks on a pool of connections sharing the snapshot of conn.
+    
+    conn must be inside a REPEATABLE READ transaction. Its snapshot is exported
+    with pg_export_snapshot() and imported by every worker connection, so all
+    checks see the database as it was when the coordinator's transaction started,
+    whatever is edited while they run.
+    
+    Args:
+        conn: Coordinator connection
+        catalog: Catalog snapshot from get_catalog_snapshot
+        tables: QGIS tables to check
+        workers: Number of worker connections
+        record: Called with (table, result) of every checked table, in this thread, as each
+            worker finishes its share
+        prepass: Result of changed_tables, passed on to count_identifiers
+    
+    Returns:
+        count_identifiers result
+    """
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT trigger_name, event_manipulation, action_statement
-        FROM information_schema.triggers
-        WHERE event_object_schema = 'public' AND event_object_table = %s
-        ORDER BY trigger_name
-    """, (table_name,))
-    return cursor.fetchall()
-
-
-def check_rdf_identifiers(prefix):
-    """Query RDF for 2D representation labels"""
-    query = f"""
-PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX veniss: <https://veniss.net/ontology#>
-
-SELECT DISTINCT ?repr_label WHERE {{
-  ?building a veniss:Building ;
-            crm:P196i_is_defined_by ?physical_changes .
-  ?physical_changes crm:P166i_had_presence ?phase .
-  ?phase crm:P138i_has_representation ?repr .
-  ?repr rdfs:label ?repr_label .
-  FILTER(STRSTARTS(?repr_label, "{prefix}"))
-}}
-"""
+    cursor.execute("SELECT pg_export_snapshot()")
+    snapshot_id = cursor.fetchone()[0]
+    
+    pool = ThreadedConnectionPool(1, workers, **db_params())
+    
+    def in_snapshot(check, *args):
+        worker_conn = pool.getconn()
+        try:
+            worker_conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            worker_conn.cursor().execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+            return check(worker_conn, *args)
+        finally:
+            worker_conn.rollback()
+            pool.putconn(worker_conn)
+    
+    def table_share(worker_conn, chunk):
+        # Read in the worker, before its connection goes back to the pool
+        return list(check_qgis_tables(worker_conn, catalog, chunk))
+    
     try:
-        response = requests.post(
-            os.getenv('SPARQL_ENDPOINT', 'https://veniss.net/sparql'),
-            auth=HTTPBasicAuth(os.getenv('SPARQL_USERNAME'), os.getenv('SPARQL_PASSWORD')),
-            headers={'Accept': 'application/sparql-results+json'},
-            data={'query': query},
-            timeout=30
-        )
-        response.raise_for_status()
-        results = response.json()
-        return set(b['repr_label']['value'] for b in results.get('results', {}).get('bindings', []))
-    except Exception as e:
-        print(f"    Error querying RDF for {prefix}: {e}")
-        return set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            totals = executor.submit(in_snapshot, count_identifiers, catalog, prepass)
+            # Interleaved chunks, so large and small islands are spread over the workers
+            chunks = [tables[start::workers] for start in range(workers)]
+            table_futures = [executor.submit(in_snapshot, table_share, chunk) for chunk in chunks if chunk]
+            for future in as_completed(table_futures):
+                for table, result in future.result():
+                    record(table, result)
+            return totals.result()
+    finally:
+        pool.closeall()
 
 
-def run_diagnosis():
-    """Run comprehensive diagnosis"""
+def run_diagnosis(workers=1, full=False, since_last=False):
+    """
+    Run comprehensive diagnosis.
+    
+    Args:
+        workers: Connections running the identifier checks
+        full: Check the identifiers of every table, skipping the checksum pre-pass
+        since_last: Check only the identifiers in PRODUCTION.change_log since the previous
+            --since-last run, then move the watermark forward
+    """
     print("=" * 100)
     print("VeNiss PostgreSQL Sync Diagnosis Report")
     print(f"Generated: {datetime.now().isoformat()}")
     print("=" * 100)
     
     conn = connect_db()
+    # One snapshot for the whole run, so edits made meanwhile cannot show up as inconsistencies
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
     
-    # Get all QGIS tables
-    qgis_tables = get_all_qgis_tables(conn)
+    # Columns and triggers of all QGIS tables
+    catalog = get_catalog_snapshot(conn)
+    qgis_tables = sorted(catalog)
     print(f"\n📋 Found {len(qgis_tables)} QGIS tables in public schema\n")
     
-    # Get all production identifiers
-    all_production_ids = get_production_identifiers(conn)
-    print(f"📋 Found {len(all_production_ids)} identifiers in PRODUCTION.veniss_data\n")
+    changes, removed, snapshot_xmin = None, None, None
+    if since_last:
+        changes, removed, snapshot_xmin = get_changes_since_watermark(conn)
+        if changes is None:
+            reason = 'no previous run' if snapshot_xmin is not None else 'PRODUCTION.change_log not installed'
+            print(f"⚠️  --since-last: {reason}, checking everything\n")
+        else:
+            print(f"📋 Changed since last run: {sum(len(ids) for ids in changes.values())} identifiers "
+                  f"in {len(changes)} tables\n")
+    
+    # Checksum pre-pass: only tables and prefixes whose checksums differ from PRODUCTION get the
+    # identifier and orphan checks
+    prepass = None
+    if changes is not None:
+        detail_tables = sorted(table for table in changes if table in catalog)
+    elif full:
+        detail_tables = qgis_tables
+    else:
+        started = time.monotonic()
+        prepass = changed_tables(conn, catalog)
+        detail_tables = sorted(prepass['tables'])
+        print(f"⏱  Checksum pre-pass took {time.monotonic() - started:.1f}s: "
+              f"{len(detail_tables)} of {len(qgis_tables)} tables, "
+              f"{len(prepass['prefixes'])} prefixes differ from PRODUCTION\n")
+    
+    # Issues are streamed to the report as they are found (see diagnosis_report.py)
+    report_file = f"sync_diagnosis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+    report = NdjsonReportWriter(report_file)
+    print(f"📄 Writing report to: {report_file}\n")
+    
+    # Per table, only what the table analysis prints is kept; missing identifiers go to the report
+    table_checks = {} if changes is not None else {
+        table: {'count': 0, 'sample': [], 'missing': [], 'missing_count': 0} for table in detail_tables
+    }
+    
+    def record(table, check):
+        missing = check['missing']
+        if missing:
+            report.write('missing_from_production', {
+                'table': table,
+                'count': len(missing),
+                'identifiers': missing
+            })
+        table_checks[table] = {'count': check['count'], 'sample': check['sample'],
+                               'missing': missing[:5], 'missing_count': len(missing)}
     
-    # Get all feature_sources identifiers
-    feature_sources_ids = get_feature_sources_identifiers(conn)
-    print(f"📋 Found {len(feature_sources_ids)} identifiers in PRODUCTION.feature_sources\n")
+    # Identifier checks; the set differences are computed by the database
+    started = time.monotonic()
+    if changes is not None:
+        # Only the logged identifiers; the totals are estimates rather than a scan of every table
+        totals = estimate_identifiers(conn, catalog)
+        for table, check in check_changed_rows(conn, catalog, changes):
+            record(table, check)
+    elif workers > 1:
+        totals = run_parallel_checks(conn, catalog, detail_tables, workers, record, prepass)
+    else:
+        totals = count_identifiers(conn, catalog, prepass)
+        for table, check in check_qgis_tables(conn, catalog, detail_tables):
+            record(table, check)
+    print(f"⏱  Identifier checks took {time.monotonic() - started:.1f}s ({workers} worker(s))\n")
+    print(f"📋 Found {totals['production']} {totals['unit']} in PRODUCTION.veniss_data\n")
+    print(f"📋 Found {totals['feature_sources']} {totals['feature_sources_unit']} in PRODUCTION.feature_sources\n")
     
     # Get sources_years
     sources_years = get_sources_years(conn)
@@ -247,18 +881,6 @@ def run_diagnosis():
         print(f"    - {source}: {start}-{end}")
     print()
     
-    # Collect all issues
-    issues = {
-        'missing_from_production': [],
-        'orphaned_in_production': [],
-        'orphaned_feature_sources': [],
-        'source_name_mismatches': [],
-        'missing_triggers': [],
-        'rdf_mismatches': [],
-        'table_structure_issues': []
-    }
-    
-    all_qgis_identifiers = set()
     tables_with_triggers = {}
     unique_source_columns = set()
     
@@ -270,43 +892,44 @@ def run_diagnosis():
         print(f"\n📁 Analyzing: {table}")
         print("-" * 80)
         
-        # Get identifiers
-        qgis_ids, id_col = get_identifiers_from_qgis(conn, table)
+        info = catalog[table]
+        id_col = info['id_column']
         
         if not id_col:
-            issues['table_structure_issues'].append({
+            report.write('table_structure_issues', {
                 'table': table,
                 'issue': 'No identifier column found (expected: identifier, BW_ID, or bw_id)'
             })
             print(f"    ⚠️  No identifier column found!")
             continue
         
+        check = table_checks.get(table)
         print(f"    Identifier column: {id_col}")
-        print(f"    Total identifiers: {len(qgis_ids)}")
+        if check is None:
+            if changes is not None:
+                print(f"    ✓ No changes since last run, identifier check skipped")
+            else:
+                print(f"    ✓ Checksums match PRODUCTION, identifier check skipped")
+        elif changes is not None:
+            print(f"    Changed identifiers: {check['count']}")
+        else:
+            print(f"    Total identifiers: {check['count']}")
         
-        if qgis_ids:
-            all_qgis_identifiers.update(qgis_ids)
-            
+        if check and check['count']:
             # Sample identifiers
-            sample = sorted(list(qgis_ids))[:3]
-            print(f"    Sample: {', '.join(sample)}")
+            print(f"    Sample: {', '.join(check['sample'])}")
             
-            # Check against production
-            missing = qgis_ids - all_production_ids
-            if missing:
-                print(f"    ❌ Missing from PRODUCTION.veniss_data: {len(missing)}")
-                for mid in sorted(list(missing))[:5]:
+            # Check against production (already in the report)
+            missing_count = check['missing_count']
+            if missing_count:
+                print(f"    ❌ Missing from PRODUCTION.veniss_data: {missing_count}")
+                for mid in check['missing']:
                     print(f"        - {mid}")
-                if len(missing) > 5:
-                    print(f"        ... and {len(missing) - 5} more")
-                issues['missing_from_production'].append({
-                    'table': table,
-                    'count': len(missing),
-                    'identifiers': sorted(list(missing))
-                })
+                if missing_count > 5:
+                    print(f"        ... and {missing_count - 5} more")
         
         # Check boolean columns (sources)
-        bool_cols = get_boolean_columns(conn, table)
+        bool_cols = info['boolean_columns']
         if bool_cols:
             print(f"    Source columns ({len(bool_cols)}): {', '.join(bool_cols[:5])}")
             if len(bool_cols) > 5:
@@ -317,14 +940,14 @@ def run_diagnosis():
             # Check if sources are in sources_years
             for col in bool_cols:
                 if col not in sources_years:
-                    issues['source_name_mismatches'].append({
+                    report.write('source_name_mismatches', {
                         'table': table,
                         'column': col,
                         'issue': 'Source column not found in PRODUCTION.sources_years'
                     })
         
         # Check triggers
-        triggers = get_triggers_for_table(conn, table)
+        triggers = info['triggers']
         tables_with_triggers[table] = triggers
         
         expected_triggers = ['insert_veniss_data', 'update_veniss_data', 'delete_veniss_data']
@@ -338,7 +961,7 @@ def run_diagnosis():
             print(f"    ⚠️  No triggers defined!")
         
         if missing_triggers:
-            issues['missing_triggers'].append({
+            report.write('missing_triggers', {
                 'table': table,
                 'missing': missing_triggers,
                 'existing': [t[0] for t in triggers]
@@ -350,24 +973,16 @@ def run_diagnosis():
     print("ORPHAN ANALYSIS")
     print("=" * 100)
     
-    orphaned_production = all_production_ids - all_qgis_identifiers
-    if orphaned_production:
-        print(f"\n❌ Orphaned in PRODUCTION.veniss_data (not in any QGIS table): {len(orphaned_production)}")
-        for oid in sorted(list(orphaned_production))[:20]:
-            print(f"    - {oid}")
-        if len(orphaned_production) > 20:
-            print(f"    ... and {len(orphaned_production) - 20} more")
-        issues['orphaned_in_production'] = sorted(list(orphaned_production))
+    # Written to the report while the server-side cursors are read; with --since-last only the
+    # identifiers updated or deleted since the last run are looked up
+    report_orphans(report, 'orphaned_in_production',
+                   'Orphaned in PRODUCTION.veniss_data (not in any QGIS table)',
+                   orphaned_production(conn, catalog, prepass, removed))
     
     # Check feature_sources orphans
-    orphaned_feature_sources = feature_sources_ids - all_production_ids
-    if orphaned_feature_sources:
-        print(f"\n❌ Orphaned in PRODUCTION.feature_sources (not in veniss_data): {len(orphaned_feature_sources)}")
-        for oid in sorted(list(orphaned_feature_sources))[:20]:
-            print(f"    - {oid}")
-        if len(orphaned_feature_sources) > 20:
-            print(f"    ... and {len(orphaned_feature_sources) - 20} more")
-        issues['orphaned_feature_sources'] = sorted(list(orphaned_feature_sources))
+    report_orphans(report, 'orphaned_feature_sources',
+                   'Orphaned in PRODUCTION.feature_sources (not in veniss_data)',
+                   orphaned_feature_sources(conn, removed))
     
     # Check source column names vs sources_years
     print("\n" + "=" * 100)
@@ -388,71 +1003,79 @@ def run_diagnosis():
     
     # RDF check for a few key islands
     print("\n" + "=" * 100)
-    print("RDF MISMATCH CHECK (sample islands)")
+    print("RDF MISMATCH CHECK (all islands)")
     print("=" * 100)
     
-    # Check a few key islands for RDF mismatches
-    sample_islands = ['SSP_BLDG', 'SSC_BLDG', 'LZV_BLDG', 'SSV_BLDG', 'CRT_BLDG']
-    for prefix in sample_islands:
-        print(f"\n📊 Checking RDF for prefix: {prefix}")
-        rdf_ids = check_rdf_identifiers(prefix)
-        prod_ids_prefix = get_production_identifiers(conn, prefix)
-        
-        if rdf_ids:
-            print(f"    RDF 2D labels: {len(rdf_ids)}")
-            print(f"    PRODUCTION: {len(prod_ids_prefix)}")
-            
-            rdf_not_in_prod = rdf_ids - prod_ids_prefix
-            if rdf_not_in_prod:
-                print(f"    ❌ In RDF but NOT in PRODUCTION: {len(rdf_not_in_prod)}")
-                for rid in sorted(list(rdf_not_in_prod))[:5]:
-                    print(f"        - {rid}")
-                issues['rdf_mismatches'].append({
-                    'prefix': prefix,
-                    'rdf_only': sorted(list(rdf_not_in_prod))
-                })
-        else:
-            print(f"    No RDF 2D representations found for {prefix}")
+    rdf_labels = fetch_rdf_labels()
+    print(f"\n📊 RDF 2D labels: {len(rdf_labels)}")
+    island_names = {code: island for island, code in ISLANDS_CONFIG.items()}
+    for prefix, result in sorted(reconcile_rdf_labels(conn, rdf_labels).items()):
+        rdf_not_in_prod = result['rdf_only']
+        island = island_names.get(prefix.split('_')[0], '?')
+        status = '❌' if rdf_not_in_prod else '✓'
+        print(f"\n{status} {prefix} ({island}): RDF {result['rdf']}, PRODUCTION {result['production']}")
+        if rdf_not_in_prod:
+            print(f"    In RDF but NOT in PRODUCTION: {len(rdf_not_in_prod)}")
+            for rid in rdf_not_in_prod[:5]:
+                print(f"        - {rid}")
+            if len(rdf_not_in_prod) > 5:
+                print(f"        ... and {len(rdf_not_in_prod) - 5} more")
+            report.write('rdf_mismatches', {
+                'prefix': prefix,
+                'island': island,
+                'rdf_only': rdf_not_in_prod
+            })
     
     # Summary
     print("\n" + "=" * 100)
     print("SUMMARY")
     print("=" * 100)
     
-    total_issues = (
-        len(issues['missing_from_production']) +
-        len(issues['orphaned_in_production']) +
-        len(issues['orphaned_feature_sources']) +
-        len(issues['source_name_mismatches']) +
-        len(issues['missing_triggers']) +
-        len(issues['rdf_mismatches']) +
-        len(issues['table_structure_issues'])
-    )
+    counts = report.counts
+    total_issues = sum(counts.values())
     
     print(f"\n📊 Total QGIS tables: {len(qgis_tables)}")
-    print(f"📊 Total QGIS identifiers: {len(all_qgis_identifiers)}")
-    print(f"📊 Total PRODUCTION identifiers: {len(all_production_ids)}")
+    print(f"📊 Total QGIS {totals['unit']}: {totals['qgis']}")
+    print(f"📊 Total PRODUCTION {totals['unit']}: {totals['production']}")
     print(f"📊 Unique source columns: {len(unique_source_columns)}")
     
     print(f"\n🔴 Issues found:")
-    print(f"    - Tables with missing identifiers in PRODUCTION: {len(issues['missing_from_production'])}")
-    print(f"    - Orphaned PRODUCTION records: {len(issues['orphaned_in_production'])}")
-    print(f"    - Orphaned feature_sources records: {len(issues['orphaned_feature_sources'])}")
-    print(f"    - Source name mismatches: {len(issues['source_name_mismatches'])}")
-    print(f"    - Tables with missing triggers: {len(issues['missing_triggers'])}")
-    print(f"    - RDF mismatches: {len(issues['rdf_mismatches'])}")
-    print(f"    - Table structure issues: {len(issues['table_structure_issues'])}")
+    print(f"    - Tables with missing identifiers in PRODUCTION: {counts['missing_from_production']}")
+    print(f"    - Orphaned PRODUCTION records: {counts['orphaned_in_production']}")
+    print(f"    - Orphaned feature_sources records: {counts['orphaned_feature_sources']}")
+    print(f"    - Source name mismatches: {counts['source_name_mismatches']}")
+    print(f"    - Tables with missing triggers: {counts['missing_triggers']}")
+    print(f"    - RDF mismatches: {counts['rdf_mismatches']}")
+    print(f"    - Table structure issues: {counts['table_structure_issues']}")
     
     conn.close()
     
-    # Save detailed report
-    report_file = f"sync_diagnosis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(report_file, 'w') as f:
-        json.dump(issues, f, indent=2)
+    # Summary line marks the report as complete
+    mode = 'since_last' if changes is not None else 'full' if full else 'checksum'
+    report.close(generated=datetime.now().isoformat(), mode=mode)
     print(f"\n📄 Detailed report saved to: {report_file}")
     
-    return issues
+    # Successful run: the next --since-last run starts after the changes seen in this snapshot
+    if since_last and snapshot_xmin is not None:
+        store_watermark(snapshot_xmin)
+        print(f"📌 Watermark stored: transactions from xid {snapshot_xmin} on")
+    
+    return counts
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Diagnose QGIS / PRODUCTION / RDF synchronization')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Connections checking tables in parallel on one shared snapshot (default: 1)')
+    parser.add_argument('--full', action='store_true',
+                        help='Check the identifiers of every table, even where the checksums match')
+    parser.add_argument('--since-last', action='store_true',
+                        help='Check only identifiers changed since the previous --since-last run '
+                             '(needs sql/3_create_tables/5_change_log.pgsql)')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    run_diagnosis()
+    args = parse_args()
+    run_diagnosis(workers=max(1, args.workers), full=args.full, since_last=args.since_last)
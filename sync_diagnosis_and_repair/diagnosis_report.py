@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Sync diagnosis reports: streaming NDJSON writer, reader and report-to-report diff.
+
+comprehensive_sync_diagnosis.py writes one JSON object per line as it finds
+issues, so memory does not grow with the number of issues and an interrupted
+run still leaves everything found so far. Each line has a "category" (one of
+CATEGORIES) and the fields of the issue; the last line is a "summary" record
+with the counts per category. Orphans are written one identifier per line.
+
+Older reports (one indented JSON document, sync_diagnosis_report_*.json) can
+be read and diffed too.
+
+A report without its summary line comes from a run that did not finish and
+is neither diffed nor used for repairs. Reports are only diffed against
+reports of the same coverage: a --since-last report lists the issues of the
+changed identifiers only, so against a whole-database report every other
+issue would show up as resolved.
+
+Usage:
+    python diagnosis_report.py diff                      # two most recent reports
+    python diagnosis_report.py diff OLD_REPORT NEW_REPORT
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Issue categories, in report order
+CATEGORIES = [
+    'missing_from_production',
+    'orphaned_in_production',
+    'orphaned_feature_sources',
+    'source_name_mismatches',
+    'missing_triggers',
+    'rdf_mismatches',
+    'table_structure_issues'
+]
+
+# Categories listing bare identifiers in the old single-document reports
+IDENTIFIER_CATEGORIES = {'orphaned_in_production', 'orphaned_feature_sources'}
+
+REPORT_PATTERN = 'sync_diagnosis_report_*'
+
+# Differences listed per category by the diff command
+SAMPLE_SIZE = 10
+
+# Run modes (summary 'mode') of reports that cover only the changes since the previous run
+PARTIAL_MODES = {'since_last'}
+
+
+class NdjsonReportWriter:
+    """
+    Append issues to an NDJSON report as they are found.
+
+    Usage:
+        with NdjsonReportWriter('sync_diagnosis_report_20251126_010000.ndjson') as report:
+            report.write('missing_triggers', {'table': ..., 'missing': [...], 'existing': [...]})
+            report.counts['missing_triggers']   # 1
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.counts = {category: 0 for category in CATEGORIES}
+        self._file = open(self.path, 'w')
+
+    def write(self, category, record):
+        """Write one issue; the line is flushed so the report is usable while the run continues"""
+        self._file.write(json.dumps({'category': category, **record}) + '\n')
+        self._file.flush()
+        self.counts[category] += 1
+
+    def close(self, **summary):
+        """Write the summary record (counts plus the given fields) and close the file"""
+        if self._file.closed:
+            return
+        self._file.write(json.dumps({'category': 'summary', 'counts': self.counts, **summary}) + '\n')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # An interrupted run keeps its issues but gets no summary line
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def iter_report(path):
+    """
+    Stream the issues of a report, NDJSON or old single-document JSON.
+
+    Yields:
+        (category, record) tuples; the summary record is skipped
+    """
+    path = Path(path)
+    with open(path) as f:
+        first = f.readline()
+        f.seek(0)
+        if first.strip() == '{':
+            # Old format: one indented document
+            for category, items in json.load(f).items():
+                for item in items:
+                    yield category, {'identifier': item} if category in IDENTIFIER_CATEGORIES else item
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            category = record.pop('category')
+            if category != 'summary':
+                yield category, record
+
+
+def read_summary(path):
+    """
+    Summary record of a report, written when its run finished.
+    
+    Old single-document reports were written whole at the end of a run; they
+    get {'mode': 'legacy'}.
+    
+    Returns:
+        Summary dictionary (counts, mode, generated), or None if the run did not finish
+    """
+    with open(path, 'rb') as f:
+        if f.readline().strip() == b'{':
+            return {'mode': 'legacy'}
+        # The summary is the last line; read only the end of the file
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - 65536))
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    if not lines:
+        return None
+    try:
+        record = json.loads(lines[-1])
+    except ValueError:
+        # Interrupted in the middle of a line
+        return None
+    return record if record.get('category') == 'summary' else None
+
+
+def coverage(summary):
+    """'changes' for reports of the changes since the previous run, 'all' for whole-database reports"""
+    return 'changes' if summary.get('mode') in PARTIAL_MODES else 'all'
+
+
+def comparison_problem(old_path, new_path):
+    """
+    Why two reports cannot be diffed.
+    
+    Returns:
+        Message, or None if they can be compared
+    """
+    summaries = {}
+    for path in (old_path, new_path):
+        summaries[path] = read_summary(path)
+        if summaries[path] is None:
+            return f"{path} has no summary line: its diagnosis did not finish"
+    old, new = summaries[old_path], summaries[new_path]
+    if coverage(old) != coverage(new):
+        return (f"{old_path} (mode {old.get('mode')}) and {new_path} (mode {new.get('mode')}) "
+                f"do not cover the same identifiers")
+    return None
+
+
+def load_issues(path):
+    """
+    Rebuild the issues dictionary of the old report format from any report.
+
+    Returns:
+        {category: list}, orphan categories as lists of identifiers
+    """
+    issues = {category: [] for category in CATEGORIES}
+    for category, record in iter_report(path):
+        if category in IDENTIFIER_CATEGORIES:
+            issues.setdefault(category, []).append(record['identifier'])
+        else:
+            issues.setdefault(category, []).append(record)
+    return issues
+
+
+def issue_facts(category, record):
+    """
+    Split an issue into the atomic facts two reports are compared on.
+
+    Yields:
+        (category, scope, item) tuples, e.g. ('missing_from_production', table, identifier)
+    """
+    if category == 'missing_from_production':
+        for identifier in record.get('identifiers', []):
+            yield category, record['table'], identifier
+    elif category in IDENTIFIER_CATEGORIES:
+        yield category, '', record['identifier']
+    elif category == 'source_name_mismatches':
+        yield category, record['table'], record['column']
+    elif category == 'missing_triggers':
+        for trigger in record.get('missing', []):
+            yield category, record['table'], trigger
+    elif category == 'rdf_mismatches':
+        for label in record.get('rdf_only', []):
+            yield category, record['prefix'], label
+    else:
+        yield category, record.get('table', ''), record.get('issue', json.dumps(record, sort_keys=True))
+
+
+def diff_reports(old_path, new_path):
+    """
+    Compare two reports fact by fact.
+
+    The facts of the old report and the facts found only in the new one are
+    held in memory; the new report is streamed against them, so facts present
+    in both are not stored twice.
+
+    Returns:
+        Tuple of ({category: [(scope, item)] new since the old report},
+                  {category: [(scope, item)] no longer reported})
+    """
+    # Old fact -> still reported by the new report
+    old_facts = {fact: False for category, record in iter_report(old_path) for fact in issue_facts(category, record)}
+    added = defaultdict(dict)
+    for category, record in iter_report(new_path):
+        for fact in issue_facts(category, record):
+            if fact in old_facts:
+                old_facts[fact] = True
+            else:
+                # Dictionary keys: duplicates listed once, in report order
+                added[category][fact[1:]] = None
+    resolved = defaultdict(list)
+    for category, scope, item in sorted(fact for fact, reported in old_facts.items() if not reported):
+        resolved[category].append((scope, item))
+    return {category: list(facts) for category, facts in added.items()}, dict(resolved)
+
+
+def latest_reports(directory='.', count=1, finished=False):
+    """
+    The most recent report files in a directory (names carry the timestamp), oldest first.
+    
+    Args:
+        count: Number of reports, or None for all
+        finished: Only reports with a summary line (see read_summary)
+    """
+    reports = sorted(Path(directory).glob(REPORT_PATTERN), key=lambda path: path.stem)
+    if finished:
+        reports = [path for path in reports if read_summary(path) is not None]
+    return reports if count is None else reports[-count:]
+
+
+def latest_comparable_reports(directory='.'):
+    """
+    The two most recent finished reports of the same coverage.
+    
+    Returns:
+        (old, new) paths, or None if there is no such pair
+    """
+    latest = {}
+    for path in reversed(latest_reports(directory, count=None, finished=True)):
+        kind = coverage(read_summary(path))
+        if kind in latest:
+            return path, latest[kind]
+        latest[kind] = path
+    return None
+
+
+def print_diff(old_path, new_path):
+    """
+    Print what changed between two reports.
+    
+    Returns:
+        False if the reports cannot be compared (see comparison_problem)
+    """
+    problem = comparison_problem(old_path, new_path)
+    if problem:
+        print(f"❌ Cannot compare reports: {problem}")
+        return False
+    added, resolved = diff_reports(old_path, new_path)
+    print(f"📋 {old_path} → {new_path}")
+    if not added and not resolved:
+        print("\n✓ No differences")
+        return True
+    for category in CATEGORIES:
+        for symbol, label, facts in (('❌', 'new', added.get(category, [])),
+                                     ('✓', 'resolved', resolved.get(category, []))):
+            if not facts:
+                continue
+            print(f"\n{symbol} {category}: {len(facts)} {label}")
+            for scope, item in facts[:SAMPLE_SIZE]:
+                print(f"    - {scope + ': ' if scope else ''}{item}")
+            if len(facts) > SAMPLE_SIZE:
+                print(f"    ... and {len(facts) - SAMPLE_SIZE} more")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync diagnosis report tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    diff_parser = subparsers.add_parser(
+        'diff', help='Compare two reports (default: the two most recent finished ones of the same coverage)')
+    diff_parser.add_argument('reports', nargs='*', metavar='REPORT', help='Old and new report')
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        if len(args.reports) == 2:
+            old_path, new_path = args.reports
+        elif not args.reports:
+            reports = latest_comparable_reports()
+            if reports is None:
+                parser.error('no two finished reports of the same coverage in the current directory')
+            old_path, new_path = reports
+        else:
+            parser.error('give two reports, or none to compare the two most recent')
+        if not print_diff(old_path, new_path):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
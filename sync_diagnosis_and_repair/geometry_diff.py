@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Geometry diff engine: QGIS tables vs PRODUCTION.veniss_data.
+
+One pass over all QGIS tables finds the features whose geometry differs from
+production and tells real edits from precision noise:
+
+1. Rows whose fingerprints match production are skipped; every other QGIS
+   geometry is made valid and transformed to EPSG:3857 once, and kept if its
+   WKB differs from production.
+2. Bounding boxes are compared first: a box edge that moved by more than the
+   tolerance is a real edit, and the (expensive) Hausdorff distance is not
+   computed for that row.
+3. The remaining rows are classified by Hausdorff distance (if a Hausdorff
+   tolerance is given) or by centroid distance and area difference.
+
+The classified rows are kept in a temporary table, from which the per-table
+and overall totals are read with GROUPING SETS and the significant changes
+are listed for fix_5_sync_geometry_updates.
+
+Usage:
+    from geometry_diff import run_geometry_diff
+    diff = run_geometry_diff(conn)
+    diff['totals']['qgis_certosa_buildings']   # {'total': ..., 'significant': ..., 'precision': ...}
+    diff['changes']                            # significant rows
+"""
+
+CENTROID_TOLERANCE = 0.1  # metres
+AREA_TOLERANCE = 1.0  # square metres
+
+# Columns of the rows returned in 'rows' and 'changes'
+ROW_COLUMNS = ['table_name', 'identifier', 'bbox_shift', 'centroid_distance', 'area_diff', 'hausdorff', 'significant']
+
+
+def get_diff_tables(cursor):
+    """
+    QGIS tables that can be compared with production.
+
+    Returns:
+        Dictionary mapping table name to True if it has a geometry_fp column
+    """
+    cursor.execute("""
+        SELECT table_name, bool_or(column_name = 'geometry_fp')
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name LIKE 'qgis_%'
+        AND column_name IN ('identifier', 'geometry', 'geometry_fp')
+        GROUP BY table_name
+        HAVING bool_or(column_name = 'identifier') AND bool_or(column_name = 'geometry')
+        ORDER BY table_name
+    """)
+    return {table: has_fp for table, has_fp in cursor.fetchall()}
+
+
+def production_has_fingerprint(cursor):
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'production' AND table_name = 'veniss_data' AND column_name = 'geometry_fp'
+        )
+    """)
+    return cursor.fetchone()[0]
+
+
+def diff_query(tables, production_fp, centroid_tolerance, area_tolerance, hausdorff_tolerance=None):
+    """
+    SQL creating the temporary table geometry_diff with one classified row per differing feature.
+
+    Args:
+        tables: {table name: has geometry_fp column}
+        production_fp: True if PRODUCTION.veniss_data has a geometry_fp column
+        centroid_tolerance: Centroid distance (m) above which a change is significant
+        area_tolerance: Area difference (m²) above which a change is significant
+        hausdorff_tolerance: If given, classify by Hausdorff distance (m) instead of centroid/area
+    """
+    parts = []
+    for table, has_fp in sorted(tables.items()):
+        name = table.replace("'", "''")
+        ident = '"' + table.replace('"', '""') + '"'
+        if has_fp and production_fp:
+            # Matching fingerprints are skipped before any transform
+            differs = "q.geometry_fp IS DISTINCT FROM p.geometry_fp"
+        else:
+            differs = "ST_AsBinary(t.geom) IS DISTINCT FROM ST_AsBinary(p.geometry)"
+        parts.append(
+            f"SELECT '{name}'::text AS table_name, q.identifier::text AS identifier, "
+            f"t.geom AS qgeom, p.geometry AS pgeom "
+            f"FROM public.{ident} q "
+            f"JOIN PRODUCTION.veniss_data p ON p.identifier = q.identifier "
+            # OFFSET 0 keeps the subquery from being flattened, so the transform runs once per row
+            f"CROSS JOIN LATERAL (SELECT ST_Transform(ST_MakeValid(q.geometry), 3857) AS geom OFFSET 0) t "
+            f"WHERE q.identifier IS NOT NULL AND {differs}"
+        )
+    union = '\n            UNION ALL\n            '.join(parts)
+    # Bounding box edges move by at most the Hausdorff distance, so the box test is exact in that mode
+    box_tolerance = hausdorff_tolerance if hausdorff_tolerance is not None else centroid_tolerance
+    if hausdorff_tolerance is not None:
+        fine_test = f"hausdorff > {float(hausdorff_tolerance)}"
+        hausdorff = f"CASE WHEN bbox_shift <= {float(box_tolerance)} THEN ST_HausdorffDistance(qgeom, pgeom) END"
+    else:
+        fine_test = f"centroid_distance > {float(centroid_tolerance)} OR area_diff > {float(area_tolerance)}"
+        hausdorff = "NULL::float8"
+
+    return f"""
+        DROP TABLE IF EXISTS pg_temp.geometry_diff;
+        CREATE TEMP TABLE geometry_diff AS
+        WITH pairs AS (
+            {union}
+        ),
+        candidates AS (
+            SELECT table_name, identifier, qgeom, pgeom,
+                   GREATEST(
+                       ABS(ST_XMin(qgeom) - ST_XMin(pgeom)), ABS(ST_XMax(qgeom) - ST_XMax(pgeom)),
+                       ABS(ST_YMin(qgeom) - ST_YMin(pgeom)), ABS(ST_YMax(qgeom) - ST_YMax(pgeom))
+                   ) AS bbox_shift
+            FROM pairs
+        ),
+        measured AS (
+            -- OFFSET 0: not inlined, so hausdorff is computed once, not once per reference
+            SELECT table_name, identifier, bbox_shift,
+                   ST_Distance(ST_Centroid(qgeom), ST_Centroid(pgeom)) AS centroid_distance,
+                   ABS(ST_Area(qgeom) - ST_Area(pgeom)) AS area_diff,
+                   {hausdorff} AS hausdorff
+            FROM candidates
+            OFFSET 0
+        )
+        SELECT table_name, identifier, bbox_shift, centroid_distance, area_diff, hausdorff,
+               (bbox_shift > {float(box_tolerance)} OR {fine_test}) AS significant
+        FROM measured;
+    """
+
+
+def run_geometry_diff(conn, centroid_tolerance=CENTROID_TOLERANCE, area_tolerance=AREA_TOLERANCE,
+                      hausdorff_tolerance=None):
+    """
+    Compare all QGIS geometries with production and classify the differences.
+
+    Args:
+        conn: Database connection (the temporary table lives in its session)
+        centroid_tolerance: Centroid distance (m) above which a change is significant
+        area_tolerance: Area difference (m²) above which a change is significant
+        hausdorff_tolerance: If given, classify by Hausdorff distance (m) instead of centroid/area
+
+    Returns:
+        Dictionary with:
+            totals: {table: {'total', 'significant', 'precision'}} for tables with differences
+            overall: {'total', 'significant', 'precision'}
+            rows: every differing row, as dictionaries with ROW_COLUMNS keys, largest changes first
+            changes: the significant rows
+    """
+    cursor = conn.cursor()
+    tables = get_diff_tables(cursor)
+    empty = {'total': 0, 'significant': 0, 'precision': 0}
+    if not tables:
+        return {'totals': {}, 'overall': dict(empty), 'rows': [], 'changes': []}
+
+    cursor.execute(diff_query(tables, production_has_fingerprint(cursor),
+                              centroid_tolerance, area_tolerance, hausdorff_tolerance))
+
+    cursor.execute("""
+        SELECT table_name, GROUPING(table_name), COUNT(*), COUNT(*) FILTER (WHERE significant)
+        FROM geometry_diff
+        GROUP BY GROUPING SETS ((table_name), ())
+    """)
+    totals = {}
+    overall = dict(empty)
+    for table, is_overall, total, significant in cursor.fetchall():
+        counts = {'total': total, 'significant': significant, 'precision': total - significant}
+        if is_overall:
+            overall = counts
+        else:
+            totals[table] = counts
+
+    cursor.execute(f"""
+        SELECT {', '.join(ROW_COLUMNS)}
+        FROM geometry_diff
+        ORDER BY significant DESC, bbox_shift DESC, centroid_distance DESC
+    """)
+    rows = [dict(zip(ROW_COLUMNS, row)) for row in cursor.fetchall()]
+    return {
+        'totals': totals,
+        'overall': overall,
+        'rows': rows,
+        'changes': [row for row in rows if row['significant']]
+    }
@@ -5,6 +5,7 @@ Investigate geometry differences between QGIS tables and PRODUCTION.veniss_data
 import psycopg2
 import os
 from dotenv import load_dotenv
+from geometry_diff import run_geometry_diff, CENTROID_TOLERANCE, AREA_TOLERANCE
 
 load_dotenv('VeNiss_queries/sparql/buildings_automation/.env')
 
@@ -49,76 +50,46 @@ cursor.execute("""
 prod_geom = cursor.fetchone()
 print(f"\n{'PRODUCTION.veniss_data':<45} {prod_geom[1]:<8} {prod_geom[2]}")
 
+# 2-4 come from a single pass of the diff engine
+diff = run_geometry_diff(conn)
+
 # 2. Sample geometry comparison
 print("\n" + "=" * 100)
 print("2. Sample Geometry Comparison - What are the actual differences?")
 print("=" * 100)
 
-# Get a sample of different geometries
 sample_tables = ['qgis_certosa_buildings', 'qgis_sansecondo_buildings', 'qgis_santospirito_buildings']
 
 for table in sample_tables:
     print(f"\n📋 {table}")
     print("-" * 80)
     
-    # Check if table exists and has identifier column
-    cursor.execute("""
-        SELECT column_name FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = %s AND column_name = 'identifier'
-    """, (table,))
-    if not cursor.fetchone():
-        print("    No identifier column, skipping")
-        continue
-    
-    # Get SRID for this table
-    cursor.execute(f"SELECT Find_SRID('public', '{table}', 'geometry')")
-    table_srid = cursor.fetchone()[0]
-    
-    # Get sample differences with distance analysis
-    cursor.execute(f"""
-        SELECT 
-            q.identifier,
-            {table_srid} as qgis_srid,
-            3857 as prod_srid,
-            ST_Distance(
-                ST_Centroid(ST_Transform(q.geometry, 3857)),
-                ST_Centroid(p.geometry)
-            ) as centroid_distance_meters,
-            ST_Area(ST_Transform(q.geometry, 3857)) as qgis_area,
-            ST_Area(p.geometry) as prod_area,
-            ABS(ST_Area(ST_Transform(q.geometry, 3857)) - ST_Area(p.geometry)) as area_diff
-        FROM public.{table} q
-        JOIN PRODUCTION.veniss_data p ON q.identifier = p.identifier
-        WHERE ST_AsBinary(ST_Transform(ST_MakeValid(q.geometry), 3857)) != ST_AsBinary(p.geometry)
-        ORDER BY centroid_distance_meters DESC
-        LIMIT 10
-    """)
-    
-    results = cursor.fetchall()
+    results = [row for row in diff['rows'] if row['table_name'] == table]
+    results.sort(key=lambda row: row['centroid_distance'], reverse=True)
+    results = results[:10]
     if not results:
         print("    ✅ No differences found")
         continue
     
+    cursor.execute("SELECT Find_SRID('public', %s, 'geometry')", (table,))
+    table_srid = cursor.fetchone()[0]
+    
     print(f"    Found {len(results)} sample differences:")
     print(f"    {'Identifier':<25} {'QGIS SRID':<12} {'Centroid Δ (m)':<16} {'Area Δ (m²)':<15}")
     print("    " + "-" * 70)
     
     significant_diffs = 0
     for row in results:
-        identifier, qgis_srid, prod_srid, centroid_dist, qgis_area, prod_area, area_diff = row
-        
-        # Flag significant differences (> 0.1m or > 1 m² area diff)
-        is_significant = centroid_dist > 0.1 or area_diff > 1
-        if is_significant:
+        if row['significant']:
             significant_diffs += 1
             flag = "⚠️"
         else:
             flag = "  "
         
-        print(f"    {flag} {identifier:<23} {qgis_srid:<12} {centroid_dist:<16.6f} {area_diff:<15.2f}")
+        print(f"    {flag} {row['identifier']:<23} {table_srid:<12} {row['centroid_distance']:<16.6f} {row['area_diff']:<15.2f}")
     
     if significant_diffs > 0:
-        print(f"\n    ⚠️  {significant_diffs} significant differences (>0.1m or >1m² area)")
+        print(f"\n    ⚠️  {significant_diffs} significant differences (>{CENTROID_TOLERANCE}m or >{AREA_TOLERANCE}m² area)")
     else:
         print(f"\n    ℹ️  All differences appear to be precision/rounding only")
 
@@ -127,57 +98,14 @@ print("\n" + "=" * 100)
 print("3. Overall Statistics - How significant are the differences?")
 print("=" * 100)
 
-cursor.execute("""
-    SELECT table_name FROM information_schema.tables
-    WHERE table_schema = 'public' AND table_name LIKE 'qgis_%'
-    ORDER BY table_name
-""")
-qgis_tables = [row[0] for row in cursor.fetchall()]
-
-total_diff = 0
-significant_total = 0
-precision_only = 0
-
-for table in qgis_tables:
-    # Check if table has identifier column
-    cursor.execute("""
-        SELECT column_name FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = %s AND column_name = 'identifier'
-    """, (table,))
-    if not cursor.fetchone():
-        continue
-    
-    try:
-        cursor.execute(f"""
-            SELECT 
-                COUNT(*) as total_diff,
-                COUNT(*) FILTER (WHERE 
-                    ST_Distance(
-                        ST_Centroid(ST_Transform(q.geometry, 3857)),
-                        ST_Centroid(p.geometry)
-                    ) > 0.1
-                    OR ABS(ST_Area(ST_Transform(q.geometry, 3857)) - ST_Area(p.geometry)) > 1
-                ) as significant_diff
-            FROM public.{table} q
-            JOIN PRODUCTION.veniss_data p ON q.identifier = p.identifier
-            WHERE ST_AsBinary(ST_Transform(ST_MakeValid(q.geometry), 3857)) != ST_AsBinary(p.geometry)
-        """)
-        result = cursor.fetchone()
-        if result and result[0] > 0:
-            total_diff += result[0]
-            significant_total += result[1]
-            precision_only += (result[0] - result[1])
-    except Exception as e:
-        print(f"Error checking {table}: {e}")
-        continue
-
+overall = diff['overall']
 print(f"""
 📊 Summary:
-    Total geometry differences:       {total_diff}
-    Significant (>0.1m / >1m²):       {significant_total}
-    Precision/rounding only:          {precision_only}
+    Total geometry differences:       {overall['total']}
+    Significant (>{CENTROID_TOLERANCE}m / >{AREA_TOLERANCE}m²):       {overall['significant']}
+    Precision/rounding only:          {overall['precision']}
     
-{'⚠️  SIGNIFICANT CHANGES DETECTED - Historians likely made real edits' if significant_total > 0 else '✅ Most differences are just floating-point precision'}
+{'⚠️  SIGNIFICANT CHANGES DETECTED - Historians likely made real edits' if overall['significant'] > 0 else '✅ Most differences are just floating-point precision'}
 """)
 
 # 4. Breakdown by type of difference
@@ -185,46 +113,11 @@ print("\n" + "=" * 100)
 print("4. Categorized Breakdown")
 print("=" * 100)
 
-cursor.execute("""
-    SELECT table_name FROM information_schema.tables
-    WHERE table_schema = 'public' AND table_name LIKE 'qgis_%'
-    ORDER BY table_name
-""")
-qgis_tables = [row[0] for row in cursor.fetchall()]
-
 print(f"\n{'Table':<45} {'Total Δ':<10} {'Significant':<12} {'Precision'}")
 print("-" * 80)
 
-for table in qgis_tables:
-    cursor.execute("""
-        SELECT column_name FROM information_schema.columns
-        WHERE table_schema = 'public' AND table_name = %s AND column_name = 'identifier'
-    """, (table,))
-    if not cursor.fetchone():
-        continue
-    
-    try:
-        cursor.execute(f"""
-            SELECT 
-                COUNT(*) as total_diff,
-                COUNT(*) FILTER (WHERE 
-                    ST_Distance(
-                        ST_Centroid(ST_Transform(q.geometry, 3857)),
-                        ST_Centroid(p.geometry)
-                    ) > 0.1
-                    OR ABS(ST_Area(ST_Transform(q.geometry, 3857)) - ST_Area(p.geometry)) > 1
-                ) as significant_diff
-            FROM public.{table} q
-            JOIN PRODUCTION.veniss_data p ON q.identifier = p.identifier
-            WHERE ST_AsBinary(ST_Transform(ST_MakeValid(q.geometry), 3857)) != ST_AsBinary(p.geometry)
-        """)
-        result = cursor.fetchone()
-        if result and result[0] > 0:
-            total, sig = result
-            prec = total - sig
-            print(f"{table:<45} {total:<10} {sig:<12} {prec}")
-    except Exception as e:
-        continue
+for table, counts in sorted(diff['totals'].items()):
+    print(f"{table:<45} {counts['total']:<10} {counts['significant']:<12} {counts['precision']}")
 
 cursor.close()
 conn.close()
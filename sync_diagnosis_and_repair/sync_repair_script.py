@@ -3,9 +3,24 @@
 Sync Repair Script for VeNiss PostgreSQL Database
 Fixes synchronization issues identified in the diagnosis.
 
+The repairs are planned from a report written by comprehensive_sync_diagnosis.py
+(the most recent finished sync_diagnosis_report_* in the current directory
+unless --report is given; a report without its summary line is refused) and run in one transaction, one savepoint per table, so a
+failing table is skipped without undoing the others. A dry run executes the
+same statements and rolls the transaction back, so the preview shows exactly
+what a real run would change.
+
+A dry run therefore also takes the locks of a real run: the rows it changes
+stay locked until the final rollback, so concurrent QGIS edits of those rows
+wait for the whole run. Creating triggers takes an ACCESS EXCLUSIVE lock on
+the QGIS table, which blocks even reads, so fix 1 runs last, just before the
+commit or rollback. Every lock wait gives up after LOCK_TIMEOUT; the table
+whose step timed out is skipped like any other failing table.
+
 USAGE:
-    python sync_repair_script.py --dry-run    # Preview changes (safe)
+    python sync_repair_script.py --dry-run    # Preview changes (rolled back, but takes locks)
     python sync_repair_script.py              # Execute repairs
+    python sync_repair_script.py --report sync_diagnosis_report_20251126_010000.ndjson
 """
 import psycopg2
 import os
@@ -13,9 +28,27 @@ from dotenv import load_dotenv
 from datetime import datetime
 import argparse
 import re
+from contextlib import contextmanager
+from pathlib import Path
+from geometry_diff import run_geometry_diff
+from diagnosis_report import latest_reports, load_issues, read_summary
 
 load_dotenv('VeNiss_queries/sparql/buildings_automation/.env')
 
+# Feature type, z-level and INSERT procedure by QGIS table suffix (see sql/3_create_tables/1_veniss_data.pgsql)
+TABLE_KINDS = {
+    'buildings': ('Buildings', 1, 'INSERT_BLDG_feature'),
+    'islands': ('Island', 0, 'INSERT_IS_feature'),
+    'openspaces': ('Open Space', 1, 'INSERT_OS_feature'),
+    'open_spaces': ('Open Space', 1, 'INSERT_OS_feature'),
+}
+
+# Affected rows listed per statement
+SAMPLE_ROWS = 3
+
+# How long a repair statement waits for a lock held by someone else before its step is skipped
+LOCK_TIMEOUT = '5s'
+
 
 def connect_db():
     """Connect to PostgreSQL database"""
@@ -59,378 +92,365 @@ def parse_year_from_source(source_name):
     return (TODAY_START, TODAY_END)
 
 
-def fix_1_create_missing_triggers(conn, cursor, dry_run=True):
+def table_kind(table):
+    """Feature type, z-level and INSERT procedure of a QGIS table, from its suffix"""
+    for suffix, kind in TABLE_KINDS.items():
+        if table.endswith('_' + suffix):
+            return kind
+    return None
+
+
+def latest_report():
+    """Most recent finished sync diagnosis report in the current directory"""
+    reports = latest_reports(Path.cwd(), finished=True)
+    return reports[-1] if reports else None
+
+
+def build_repair_plan(report):
+    """
+    Turn a diagnosis report into the list of repairs to run.
+    
+    Args:
+        report: Issues dictionary written by comprehensive_sync_diagnosis.py
+    
+    Returns:
+        Dictionary with:
+            triggers: {table: INSERT procedure} for tables missing any veniss_data trigger
+            orphans: identifiers in PRODUCTION.veniss_data not found in any QGIS table
+            orphaned_feature_sources: identifiers in feature_sources not found in veniss_data
+            sources: source columns missing from PRODUCTION.sources_years
+            missing: {table: identifiers} missing from PRODUCTION.veniss_data
+            feature_source_tables: tables whose rows skipped the triggers, so their
+                feature_sources have to be rebuilt
+    """
+    plan = {
+        'triggers': {},
+        'orphans': sorted(set(report.get('orphaned_in_production', []))),
+        'orphaned_feature_sources': sorted(set(report.get('orphaned_feature_sources', []))),
+        'sources': sorted({issue['column'] for issue in report.get('source_name_mismatches', [])}),
+        'missing': {},
+        'feature_source_tables': []
+    }
+    
+    for issue in report.get('missing_triggers', []):
+        kind = table_kind(issue['table'])
+        if kind:
+            plan['triggers'][issue['table']] = kind[2]
+        else:
+            print(f"    ⚠️  Unknown feature type for {issue['table']}, no triggers planned")
+    
+    for issue in report.get('missing_from_production', []):
+        if table_kind(issue['table']):
+            plan['missing'][issue['table']] = issue['identifiers']
+        else:
+            print(f"    ⚠️  Unknown feature type for {issue['table']}, identifiers not planned")
+    
+    plan['feature_source_tables'] = sorted(set(plan['triggers']) | set(plan['missing']))
+    return plan
+
+
+@contextmanager
+def savepoint(cursor, label):
+    """Run a block of repairs for one table; on error undo only that block and carry on"""
+    cursor.execute("SAVEPOINT repair_step")
+    try:
+        yield
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT repair_step")
+        print(f"    ⚠️  {label}: rolled back ({str(e).strip()})")
+    else:
+        cursor.execute("RELEASE SAVEPOINT repair_step")
+
+
+def existing_tables(cursor, tables):
+    """The given QGIS tables that exist"""
+    cursor.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = 'public' AND table_name = ANY(%s)
+    """, (list(tables),))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def qgis_identifiers_sql(cursor):
+    """SELECT listing the identifiers of every QGIS table that has an identifier column"""
+    cursor.execute("""
+        SELECT table_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name LIKE 'qgis_%' AND column_name = 'identifier'
+        ORDER BY table_name
+    """)
+    selects = [f"SELECT identifier::text AS identifier FROM public.{row[0]}" for row in cursor.fetchall()]
+    return ' UNION ALL '.join(selects) or "SELECT NULL::text AS identifier WHERE false"
+
+
+def run_dml(cursor, query, params=None):
+    """
+    Execute an INSERT/UPDATE/DELETE ... RETURNING statement.
+    
+    Returns:
+        First column of every returned row
+    """
+    cursor.execute(query, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def report_rows(rows, action, dry_run, what='records', samples=SAMPLE_ROWS):
+    """
+    Print what one statement did (or, in a dry run, would do) with a few of the affected rows.
+    
+    Args:
+        rows: Values returned by run_dml
+        action: (verb, past participle), e.g. ('delete', 'Deleted')
+        dry_run: Whether the transaction will be rolled back
+    """
+    verb, done = action
+    if dry_run:
+        print(f"    [DRY RUN] Would {verb} {len(rows)} {what}")
+    else:
+        print(f"    ✅ {done} {len(rows)} {what}")
+    for value in rows[:samples]:
+        print(f"        - {value}")
+    if len(rows) > samples:
+        print(f"        ... and {len(rows) - samples} more")
+
+
+def fix_1_create_missing_triggers(conn, cursor, plan, dry_run=True):
     """Fix 1: Create missing triggers for tables"""
     print("\n" + "=" * 80)
-    print("FIX 1: Create missing triggers for QGIS tables")
+    print("FIX 1: Create missing triggers for QGIS tables (last: locks the tables)")
     print("=" * 80)
     
-    tables_needing_triggers = [
-        ('qgis_lazzarettonuovo_openspaces', 'INSERT_OS_feature'),
-        ('qgis_sangiorgioinalga_buildings', 'INSERT_BLDG_feature'),
-        ('qgis_sansecondo_openspaces', 'INSERT_OS_feature'),
-    ]
-    
     created_count = 0
+    present = existing_tables(cursor, plan['triggers'])
     
-    for table, insert_proc in tables_needing_triggers:
+    for table, insert_proc in sorted(plan['triggers'].items()):
         print(f"\n📋 Creating triggers for {table}...")
+        if table not in present:
+            print(f"    ⚠️  Table does not exist, skipping")
+            continue
         
-        if not dry_run:
-            # Drop existing triggers first (if any partial setup)
-            for trigger_name in ['insert_veniss_data', 'update_veniss_data', 'delete_veniss_data']:
-                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name} ON public.{table}")
-            
-            # Create INSERT trigger
+        with savepoint(cursor, table):
+            # Drop existing triggers first (if any partial setup), then create all three
             cursor.execute(f"""
+                DROP TRIGGER IF EXISTS insert_veniss_data ON public.{table};
+                DROP TRIGGER IF EXISTS update_veniss_data ON public.{table};
+                DROP TRIGGER IF EXISTS delete_veniss_data ON public.{table};
                 CREATE TRIGGER insert_veniss_data
                 AFTER INSERT ON public.{table}
-                FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.{insert_proc}()
-            """)
-            
-            # Create UPDATE trigger
-            cursor.execute(f"""
+                FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.{insert_proc}();
                 CREATE TRIGGER update_veniss_data
                 AFTER UPDATE ON public.{table}
-                FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.UPDATE_feature()
-            """)
-            
-            # Create DELETE trigger
-            cursor.execute(f"""
+                FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.UPDATE_feature();
                 CREATE TRIGGER delete_veniss_data
                 AFTER DELETE ON public.{table}
-                FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.DELETE_feature()
+                FOR EACH ROW EXECUTE PROCEDURE PRODUCTION.DELETE_feature();
             """)
-            
-            created_count += 3
-            print(f"    ✅ Created 3 triggers for {table}")
-        else:
-            print(f"    [DRY RUN] Would create 3 triggers for {table}")
             created_count += 3
+            print(f"    {'[DRY RUN] Would create' if dry_run else '✅ Created'} 3 triggers for {table}")
+    
+    if not plan['triggers']:
+        print("\n    ✅ No missing triggers in the report")
     
     return created_count
 
 
-def fix_2_remove_orphaned_records(conn, cursor, dry_run=True):
+def fix_2_remove_orphaned_records(conn, cursor, plan, dry_run=True):
     """Fix 2: Remove orphaned records from PRODUCTION tables"""
     print("\n" + "=" * 80)
     print("FIX 2: Remove orphaned records from PRODUCTION tables")
     print("=" * 80)
     
-    # Orphaned veniss_data records (with naming errors)
-    orphaned_veniss_data = [
-        'SSP_BLDG 11.2',      # Space instead of underscore
-        'SSP_BLDG_11.3a',     # Orphaned - original removed
-        'SSP_BUILDINGS_11.1', # Wrong prefix
-    ]
-    
+    orphans = plan['orphans']
     deleted_count = 0
     
-    print(f"\n📋 Removing {len(orphaned_veniss_data)} orphaned veniss_data records:")
-    for oid in orphaned_veniss_data:
-        print(f"        - {oid}")
-    
-    if not dry_run:
-        for oid in orphaned_veniss_data:
-            cursor.execute("DELETE FROM PRODUCTION.veniss_data WHERE identifier = %s", (oid,))
-            if cursor.rowcount > 0:
-                print(f"    ✅ Deleted from veniss_data: {oid}")
-                deleted_count += 1
-            else:
-                print(f"    ⚠️  Not found in veniss_data: {oid}")
-    else:
-        print(f"    [DRY RUN] Would delete {len(orphaned_veniss_data)} veniss_data records")
-        deleted_count = len(orphaned_veniss_data)
-    
-    # Orphaned feature_sources records
+    print(f"\n📋 Removing orphaned veniss_data records ({len(orphans)} in the report)...")
+    if orphans:
+        qgis_identifiers = qgis_identifiers_sql(cursor)
+        with savepoint(cursor, 'veniss_data'):
+            # Still orphaned: a QGIS table may have gained the identifier since the report
+            deleted = run_dml(cursor, f"""
+                DELETE FROM PRODUCTION.veniss_data p
+                WHERE p.identifier = ANY(%s)
+                AND NOT EXISTS (SELECT 1 FROM ({qgis_identifiers}) q WHERE q.identifier = p.identifier)
+                RETURNING p.identifier
+            """, (orphans,))
+            deleted_count += len(deleted)
+            report_rows(deleted, ('delete', 'Deleted'), dry_run, 'veniss_data records', samples=20)
+    
+    # Orphaned feature_sources records, including those left by the deletions above
     print(f"\n📋 Removing orphaned feature_sources records...")
+    candidates = sorted(set(plan['orphaned_feature_sources']) | set(orphans))
     
-    if not dry_run:
-        cursor.execute("""
+    with savepoint(cursor, 'feature_sources'):
+        deleted = run_dml(cursor, """
             DELETE FROM PRODUCTION.feature_sources 
-            WHERE NOT EXISTS (
+            WHERE identifier = ANY(%s)
+            AND NOT EXISTS (
                 SELECT 1 FROM PRODUCTION.veniss_data 
                 WHERE veniss_data.identifier = feature_sources.identifier
             )
-        """)
-        fs_deleted = cursor.rowcount
-        print(f"    ✅ Deleted {fs_deleted} orphaned feature_sources records")
-        deleted_count += fs_deleted
-    else:
-        cursor.execute("""
-            SELECT COUNT(*) FROM PRODUCTION.feature_sources 
-            WHERE NOT EXISTS (
-                SELECT 1 FROM PRODUCTION.veniss_data 
-                WHERE veniss_data.identifier = feature_sources.identifier
-            )
-        """)
-        fs_count = cursor.fetchone()[0]
-        print(f"    [DRY RUN] Would delete {fs_count} orphaned feature_sources records")
-        deleted_count += fs_count
+            RETURNING identifier || ' / ' || source
+        """, (candidates,))
+        deleted_count += len(deleted)
+        report_rows(deleted, ('delete', 'Deleted'), dry_run, 'orphaned feature_sources records')
     
     return deleted_count
 
 
-def fix_3_add_missing_sources(conn, cursor, dry_run=True):
+def fix_3_add_missing_sources(conn, cursor, plan, dry_run=True):
     """Fix 3: Add missing source entries to PRODUCTION.sources_years"""
     print("\n" + "=" * 80)
     print("FIX 3: Add missing sources to PRODUCTION.sources_years")
     print("=" * 80)
     
-    # Get all boolean columns from QGIS tables that are not in sources_years
-    cursor.execute("""
-        SELECT DISTINCT c.column_name 
-        FROM information_schema.columns c
-        WHERE c.table_schema = 'public' 
-        AND c.table_name LIKE 'qgis_%'
-        AND c.data_type = 'boolean'
-        AND NOT EXISTS (
-            SELECT 1 FROM PRODUCTION.sources_years sy 
-            WHERE sy.source = c.column_name
-        )
-        ORDER BY c.column_name
-    """)
-    missing_sources = [row[0] for row in cursor.fetchall()]
+    missing_sources = plan['sources']
+    years = [parse_year_from_source(source) for source in missing_sources]
     
-    print(f"\n📋 Found {len(missing_sources)} missing sources:")
-    for source in missing_sources:
-        start, end = parse_year_from_source(source)
-        print(f"        - {source}: {start}-{end}")
+    print(f"\n📋 Found {len(missing_sources)} missing sources")
     
     added_count = 0
     
-    if not dry_run:
-        for source in missing_sources:
-            start, end = parse_year_from_source(source)
-            cursor.execute("""
+    if missing_sources:
+        with savepoint(cursor, 'sources_years'):
+            added = run_dml(cursor, """
                 INSERT INTO PRODUCTION.sources_years (source, "start", "end")
-                VALUES (%s, %s, %s)
+                SELECT * FROM unnest(%s::text[], %s::int[], %s::int[])
                 ON CONFLICT (source) DO NOTHING
-            """, (source, start, end))
-            if cursor.rowcount > 0:
-                added_count += 1
-        print(f"    ✅ Added {added_count} new sources")
-    else:
-        print(f"    [DRY RUN] Would add {len(missing_sources)} sources")
-        added_count = len(missing_sources)
+                RETURNING source || ': ' || "start" || '-' || "end"
+            """, (missing_sources, [start for start, _ in years], [end for _, end in years]))
+            added_count = len(added)
+            report_rows(added, ('add', 'Added'), dry_run, 'sources', samples=len(added))
     
     return added_count
 
 
-def fix_4_sync_missing_identifiers(conn, cursor, dry_run=True):
+def fix_4_sync_missing_identifiers(conn, cursor, plan, dry_run=True):
     """Fix 4: Insert missing identifiers from QGIS tables to PRODUCTION.veniss_data"""
     print("\n" + "=" * 80)
     print("FIX 4: Sync missing identifiers to PRODUCTION.veniss_data")
     print("=" * 80)
     
-    tables_to_sync = [
-        ('qgis_sangiorgioinalga_buildings', 'Buildings', 1),
-        ('qgis_sansecondo_openspaces', 'Open Space', 1),
-        ('qgis_lazzarettonuovo_openspaces', 'Open Space', 1),
-    ]
-    
     total_synced = 0
+    present = existing_tables(cursor, plan['missing'])
     
-    for table, type_str, z_level in tables_to_sync:
+    for table, identifiers in sorted(plan['missing'].items()):
         print(f"\n📋 Processing {table}...")
         
-        # Check table exists
-        cursor.execute("""
-            SELECT EXISTS (
-                SELECT 1 FROM information_schema.tables 
-                WHERE table_schema = 'public' AND table_name = %s
-            )
-        """, (table,))
-        if not cursor.fetchone()[0]:
+        if table not in present:
             print(f"    ⚠️  Table does not exist, skipping")
             continue
         
-        # Get missing identifiers count
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM public.{table} q
-            WHERE NOT EXISTS (
-                SELECT 1 FROM PRODUCTION.veniss_data p 
-                WHERE p.identifier = q.identifier
-            )
-            AND q.identifier IS NOT NULL
-        """)
-        missing_count = cursor.fetchone()[0]
-        
-        if missing_count == 0:
-            print(f"    ✅ No missing identifiers")
-            continue
-        
-        print(f"    Found {missing_count} missing identifiers")
+        print(f"    Found {len(identifiers)} missing identifiers")
+        type_str, z_level, _ = table_kind(table)
         
-        if not dry_run:
-            cursor.execute(f"""
+        with savepoint(cursor, table):
+            inserted = run_dml(cursor, f"""
                 INSERT INTO PRODUCTION.veniss_data (identifier, t, z, geometry, name)
-                SELECT identifier, '{type_str}', {z_level}, ST_Transform(geometry, 3857), name
+                SELECT identifier, %s, %s, ST_Transform(geometry, 3857), name
                 FROM public.{table}
-                WHERE NOT EXISTS (
+                WHERE identifier::text = ANY(%s)
+                AND NOT EXISTS (
                     SELECT 1 FROM PRODUCTION.veniss_data 
                     WHERE veniss_data.identifier = {table}.identifier
                 )
-                AND identifier IS NOT NULL
-            """)
-            inserted = cursor.rowcount
-            total_synced += inserted
-            print(f"    ✅ Inserted {inserted} records")
-        else:
-            print(f"    [DRY RUN] Would insert {missing_count} records")
-            total_synced += missing_count
+                RETURNING identifier
+            """, (type_str, z_level, identifiers))
+            total_synced += len(inserted)
+            report_rows(inserted, ('insert', 'Inserted'), dry_run)
+    
+    if not plan['missing']:
+        print("\n    ✅ No missing identifiers in the report")
     
     return total_synced
 
 
 def fix_5_sync_geometry_updates(conn, cursor, dry_run=True):
-    """Fix 5: Sync geometry updates from QGIS to PRODUCTION for all tables"""
+    """Fix 5: Sync significant geometry changes from QGIS to PRODUCTION for all tables"""
     print("\n" + "=" * 80)
     print("FIX 5: Sync geometry updates from QGIS to PRODUCTION")
     print("=" * 80)
     
-    # Get all QGIS tables
-    cursor.execute("""
-        SELECT table_name FROM information_schema.tables
-        WHERE table_schema = 'public' AND table_name LIKE 'qgis_%'
-        ORDER BY table_name
-    """)
-    qgis_tables = [row[0] for row in cursor.fetchall()]
+    # One pass over all tables; precision-only differences are left alone
+    diff = None
+    with savepoint(cursor, 'geometry diff'):
+        diff = run_geometry_diff(conn)
+    if diff is None:
+        print("\n⚠️  Skipping due to geometry error")
+        return 0
+    
+    overall = diff['overall']
+    if overall['precision']:
+        print(f"\n    ℹ️  {overall['precision']} differences are precision/rounding only, not updated")
+    
+    outdated = {}
+    for row in diff['changes']:
+        outdated.setdefault(row['table_name'], []).append(row['identifier'])
     
     total_updated = 0
     
-    for table in qgis_tables:
-        # Check if table has identifier column
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = %s
-            AND column_name = 'identifier'
-        """, (table,))
-        if not cursor.fetchone():
-            continue
+    for table, identifiers in sorted(outdated.items()):
+        print(f"\n📋 {table}: {len(identifiers)} geometries need updating")
         
-        # Find records where geometry differs using binary comparison (safer)
-        # Use ST_AsBinary to avoid topology exceptions from ST_Equals
-        try:
-            cursor.execute(f"""
-                SELECT q.identifier 
+        with savepoint(cursor, table):
+            updated = run_dml(cursor, f"""
+                UPDATE PRODUCTION.veniss_data p
+                SET geometry = ST_Transform(ST_MakeValid(q.geometry), 3857)
                 FROM public.{table} q
-                JOIN PRODUCTION.veniss_data p ON q.identifier = p.identifier
-                WHERE ST_AsBinary(ST_Transform(ST_MakeValid(q.geometry), 3857)) != ST_AsBinary(p.geometry)
-                AND q.identifier IS NOT NULL
-            """)
-            outdated = cursor.fetchall()
-        except Exception as e:
-            print(f"\n⚠️  {table}: Skipping due to geometry error: {e}")
-            continue
-        
-        if not outdated:
-            continue
-        
-        print(f"\n📋 {table}: {len(outdated)} geometries need updating")
-        for row in outdated[:3]:
-            print(f"        - {row[0]}")
-        if len(outdated) > 3:
-            print(f"        ... and {len(outdated) - 3} more")
-        
-        if not dry_run:
-            try:
-                cursor.execute(f"""
-                    UPDATE PRODUCTION.veniss_data p
-                    SET geometry = ST_Transform(ST_MakeValid(q.geometry), 3857)
-                    FROM public.{table} q
-                    WHERE p.identifier = q.identifier
-                    AND ST_AsBinary(ST_Transform(ST_MakeValid(q.geometry), 3857)) != ST_AsBinary(p.geometry)
-                """)
-                updated = cursor.rowcount
-                total_updated += updated
-                print(f"    ✅ Updated {updated} geometries")
-            except Exception as e:
-                print(f"    ⚠️  Error updating {table}: {e}")
-        else:
-            total_updated += len(outdated)
+                WHERE p.identifier = q.identifier
+                AND q.identifier::text = ANY(%s)
+                RETURNING p.identifier
+            """, (identifiers,))
+            total_updated += len(updated)
+            report_rows(updated, ('update', 'Updated'), dry_run, 'geometries')
     
     if total_updated == 0:
         print("\n    ✅ All geometries are in sync")
-    elif dry_run:
-        print(f"\n    [DRY RUN] Would update {total_updated} geometries total")
     
     return total_updated
 
 
-def fix_6_sync_feature_sources(conn, cursor, dry_run=True):
+def fix_6_sync_feature_sources(conn, cursor, plan, dry_run=True):
     """Fix 6: Sync feature_sources from QGIS boolean columns"""
     print("\n" + "=" * 80)
     print("FIX 6: Sync feature_sources from QGIS boolean columns")
     print("=" * 80)
     
-    # Focus on tables that had no triggers (their feature_sources are missing)
-    tables_to_process = [
-        'qgis_sangiorgioinalga_buildings',
-        'qgis_sansecondo_openspaces',
-        'qgis_lazzarettonuovo_openspaces',
-    ]
+    # Boolean columns (sources) of all planned tables at once
+    cursor.execute("""
+        SELECT table_name, array_agg(column_name::text ORDER BY ordinal_position)
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = ANY(%s)
+        AND data_type = 'boolean'
+        GROUP BY table_name
+        ORDER BY table_name
+    """, (plan['feature_source_tables'],))
+    tables = cursor.fetchall()
     
     total_added = 0
     
-    for table in tables_to_process:
-        # Check table exists
-        cursor.execute("""
-            SELECT EXISTS (
-                SELECT 1 FROM information_schema.tables 
-                WHERE table_schema = 'public' AND table_name = %s
-            )
-        """, (table,))
-        if not cursor.fetchone()[0]:
-            continue
-        
-        # Get boolean columns (sources)
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = %s
-            AND data_type = 'boolean'
-        """, (table,))
-        bool_cols = [row[0] for row in cursor.fetchall()]
-        
-        if not bool_cols:
-            continue
-        
+    for table, bool_cols in tables:
         print(f"\n📋 Processing {table} ({len(bool_cols)} source columns)...")
         
-        for col in bool_cols:
-            # Count missing feature_sources entries
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM public.{table} t
-                WHERE t."{col}" = true
+        # One row per (feature, source column set to true), for all columns in one statement
+        columns = [col.replace('"', '""').replace('%', '%%') for col in bool_cols]
+        sources = ', '.join(f'(%s, t."{col}")' for col in columns)
+        
+        with savepoint(cursor, table):
+            added = run_dml(cursor, f"""
+                INSERT INTO PRODUCTION.feature_sources (identifier, source)
+                SELECT t.identifier, s.source
+                FROM public.{table} t
+                CROSS JOIN LATERAL (VALUES {sources}) s(source, present)
+                WHERE s.present
                 AND t.identifier IS NOT NULL
                 AND NOT EXISTS (
                     SELECT 1 FROM PRODUCTION.feature_sources fs
-                    WHERE fs.identifier = t.identifier AND fs.source = %s
+                    WHERE fs.identifier = t.identifier AND fs.source = s.source
                 )
-            """, (col,))
-            missing_count = cursor.fetchone()[0]
-            
-            if missing_count == 0:
-                continue
-            
-            if not dry_run:
-                cursor.execute(f"""
-                    INSERT INTO PRODUCTION.feature_sources (identifier, source)
-                    SELECT t.identifier, %s
-                    FROM public.{table} t
-                    WHERE t."{col}" = true
-                    AND t.identifier IS NOT NULL
-                    AND NOT EXISTS (
-                        SELECT 1 FROM PRODUCTION.feature_sources fs
-                        WHERE fs.identifier = t.identifier AND fs.source = %s
-                    )
-                """, (col, col))
-                added = cursor.rowcount
-                total_added += added
-                if added > 0:
-                    print(f"    ✅ Added {added} entries for source '{col}'")
-            else:
-                total_added += missing_count
+                RETURNING identifier || ' / ' || source
+            """, bool_cols)
+            total_added += len(added)
+            if added:
+                report_rows(added, ('add', 'Added'), dry_run, 'entries')
     
     if total_added == 0:
         print("\n    ✅ All feature_sources are in sync")
@@ -442,14 +462,30 @@ def fix_6_sync_feature_sources(conn, cursor, dry_run=True):
     return total_added
 
 
-def run_repairs(dry_run=True):
-    """Run all repairs"""
+def run_repairs(dry_run=True, report_path=None):
+    """
+    Run all repairs planned from a diagnosis report.
+    
+    Args:
+        dry_run: Run the repairs, then roll them back instead of committing
+        report_path: Diagnosis report to plan from (default: the most recent one)
+    """
     print("=" * 80)
     print("VeNiss PostgreSQL Sync Repair Script")
     print(f"Mode: {'DRY RUN (preview only)' if dry_run else 'EXECUTE REPAIRS'}")
     print(f"Generated: {datetime.now().isoformat()}")
     print("=" * 80)
     
+    report_path = Path(report_path) if report_path else latest_report()
+    if not report_path or not report_path.exists():
+        print("\n❌ No diagnosis report found - run comprehensive_sync_diagnosis.py first or pass --report")
+        return
+    if read_summary(report_path) is None:
+        print(f"\n❌ {report_path} has no summary line: its diagnosis did not finish, so the issues are incomplete")
+        return
+    plan = build_repair_plan(load_issues(report_path))
+    print(f"\n📄 Repair plan from: {report_path}")
+    
     if not dry_run:
         print("\n⚠️  WARNING: This will modify the database!")
         confirm = input("Type 'yes' to proceed: ")
@@ -463,26 +499,25 @@ def run_repairs(dry_run=True):
     results = {}
     
     try:
-        results['triggers_created'] = fix_1_create_missing_triggers(conn, cursor, dry_run)
-        results['orphans_removed'] = fix_2_remove_orphaned_records(conn, cursor, dry_run)
-        results['sources_added'] = fix_3_add_missing_sources(conn, cursor, dry_run)
-        results['identifiers_synced'] = fix_4_sync_missing_identifiers(conn, cursor, dry_run)
-        # Skip geometry sync - investigation showed all 307 differences are just floating-point precision
-        # results['geometries_updated'] = fix_5_sync_geometry_updates(conn, cursor, dry_run)
-        results['geometries_updated'] = 0
-        print("\n" + "=" * 80)
-        print("FIX 5: SKIPPED - Geometry sync not needed (all differences are precision-only)")
-        print("=" * 80)
-        results['feature_sources_added'] = fix_6_sync_feature_sources(conn, cursor, dry_run)
+        cursor.execute("SET LOCAL lock_timeout = %s", (LOCK_TIMEOUT,))
+        results['orphans_removed'] = fix_2_remove_orphaned_records(conn, cursor, plan, dry_run)
+        results['sources_added'] = fix_3_add_missing_sources(conn, cursor, plan, dry_run)
+        results['identifiers_synced'] = fix_4_sync_missing_identifiers(conn, cursor, plan, dry_run)
+        results['geometries_updated'] = fix_5_sync_geometry_updates(conn, cursor, dry_run)
+        results['feature_sources_added'] = fix_6_sync_feature_sources(conn, cursor, plan, dry_run)
+        # The trigger DDL locks the QGIS tables against reads until the transaction ends; keep that short
+        results['triggers_created'] = fix_1_create_missing_triggers(conn, cursor, plan, dry_run)
         
+        # A dry run has executed exactly the statements a real run would; undo them
         if not dry_run:
             conn.commit()
             print("\n" + "=" * 80)
             print("✅ ALL REPAIRS COMMITTED SUCCESSFULLY")
             print("=" * 80)
         else:
+            conn.rollback()
             print("\n" + "=" * 80)
-            print("DRY RUN COMPLETE - No changes made")
+            print("DRY RUN COMPLETE - All changes rolled back")
             print("Run without --dry-run to execute repairs")
             print("=" * 80)
         
@@ -509,7 +544,10 @@ def run_repairs(dry_run=True):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='VeNiss Sync Repair Script')
     parser.add_argument('--dry-run', action='store_true', 
-                        help='Preview changes without executing (safe)')
+                        help='Run the repairs and roll them back, showing what would change '
+                             '(takes the same locks as a real run until the rollback)')
+    parser.add_argument('--report',
+                        help='Diagnosis report to plan from (default: latest sync_diagnosis_report_*)')
     args = parser.parse_args()
     
-    run_repairs(dry_run=args.dry_run)
+    run_repairs(dry_run=args.dry_run, report_path=args.report)
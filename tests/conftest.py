@@ -0,0 +1,11 @@
+"""Make the script directories importable, as running the scripts from them does."""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+for directory in ('sparql', 'sync_diagnosis_and_repair'):
+    path = str(ROOT / directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,69 @@
+"""Cleanup worker pool and checkpoint journal."""
+
+import threading
+
+import pytest
+
+pytest.importorskip('tqdm')
+
+from cleanup_workers import CleanupCheckpoint, run_cleanup_pool, split_into_batches
+
+
+def test_split_into_batches_keeps_every_term():
+    terms = [f"t{i}" for i in range(12345)]
+    batches = split_into_batches(terms)
+    assert len(batches) == 10
+    assert [term for batch in batches for term in batch] == terms
+    assert split_into_batches(['a', 'b']) == [['a', 'b']]
+    assert split_into_batches([]) == []
+
+
+def test_checkpoint_replay_skips_completed_work(tmp_path):
+    path = tmp_path / 'run.checkpoint'
+    checkpoint = CleanupCheckpoint(path)
+    checkpoint.record_entities(['e1', 'e2'])
+    checkpoint.record_plan('e1', [['a'], ['b']])
+    checkpoint.record_batch('e1', 1)
+    checkpoint.record_plan('e2', [['c']])
+    checkpoint.record_entity('e2')
+    checkpoint.close()
+    # A line cut short by a crash is ignored
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"batch": "e1", "nu')
+
+    resumed = CleanupCheckpoint(path, resume=True)
+    assert resumed.entities == ['e1', 'e2']
+    assert resumed.plan_for('e1') == [['a'], ['b']]
+    assert resumed.is_batch_done('e1', 1) and not resumed.is_batch_done('e1', 2)
+    assert resumed.is_entity_done('e2') and resumed.plan_for('e2') is None
+    resumed.record_batch('e1', 2)
+    resumed.close()
+    assert CleanupCheckpoint(path, resume=True).is_batch_done('e1', 2)
+
+
+def test_pool_cleans_every_entity(tmp_path):
+    checkpoint = CleanupCheckpoint(tmp_path / 'run.checkpoint')
+    terms = {f"e{i}": [f"e{i}/t{j}" for j in range(7)] for i in range(5)}
+    stats = run_cleanup_pool(list(terms), terms.get, lambda uri, batch: 2 * len(batch), checkpoint,
+                             workers=2, batch_delay=0)
+    checkpoint.close()
+    assert stats == {'entities_done': 5, 'terms_removed': 35, 'triples_removed': 70, 'failed_batches': []}
+
+
+def test_pool_finishes_when_the_journal_fails(tmp_path):
+    class FailingCheckpoint(CleanupCheckpoint):
+        def record_batch(self, entity, num):
+            raise OSError('disk full')
+
+    checkpoint = FailingCheckpoint(tmp_path / 'run.checkpoint')
+    entities = [f"e{i}" for i in range(6)]
+    result = {}
+    # More entities than slots: a slot that is never released blocks the main loop
+    worker = threading.Thread(target=lambda: result.update(run_cleanup_pool(
+        entities, lambda uri: [f"{uri}/t"], lambda uri, batch: 1, checkpoint, workers=1, batch_delay=0)))
+    worker.start()
+    worker.join(timeout=10)
+    checkpoint.close()
+    assert not worker.is_alive()
+    assert result['entities_done'] == 0
+    assert len(result['failed_batches']) == len(entities)
@@ -0,0 +1,104 @@
+"""NDJSON diagnosis reports: writing, reading and diffing."""
+
+import json
+import os
+
+import pytest
+
+from diagnosis_report import (NdjsonReportWriter, comparison_problem, diff_reports, iter_report,
+                              latest_comparable_reports, latest_reports, load_issues, print_diff, read_summary)
+
+
+def write_report(path, issues, mode='full', finished=True):
+    """Write an NDJSON report with the given (category, record) issues."""
+    with NdjsonReportWriter(path) as report:
+        for category, record in issues:
+            report.write(category, record)
+        report.close(mode=mode, generated='2025-11-26T01:00:00')
+    if not finished:
+        # Drop the summary line, as an interrupted run leaves the report
+        lines = path.read_text().splitlines(keepends=True)
+        path.write_text(''.join(lines[:-1]))
+    return path
+
+
+MISSING = ('missing_from_production', {'table': 'qgis_sanmarco_buildings', 'identifiers': ['SM_1', 'SM_2']})
+ORPHAN = ('orphaned_in_production', {'identifier': 'XX_9'})
+TRIGGERS = ('missing_triggers', {'table': 'qgis_sanmarco_islands', 'missing': ['update_veniss_data'],
+                                 'existing': []})
+
+
+def test_writer_counts_issues_and_closes_with_a_summary(tmp_path):
+    path = write_report(tmp_path / 'sync_diagnosis_report_1.ndjson', [MISSING, ORPHAN, ORPHAN])
+    summary = read_summary(path)
+    assert summary['mode'] == 'full'
+    assert summary['counts']['orphaned_in_production'] == 2
+    assert list(iter_report(path)) == [MISSING, ORPHAN, ORPHAN]
+
+
+def test_interrupted_run_has_no_summary(tmp_path):
+    path = tmp_path / 'sync_diagnosis_report_1.ndjson'
+    with pytest.raises(RuntimeError):
+        with NdjsonReportWriter(path) as report:
+            report.write(*ORPHAN)
+            raise RuntimeError('interrupted')
+    assert read_summary(path) is None
+    assert list(iter_report(path)) == [ORPHAN]
+    # A line cut short is not a summary either
+    with open(path, 'a') as f:
+        f.write('{"category": "summ')
+    assert read_summary(path) is None
+
+
+def test_legacy_report_is_read_as_issues(tmp_path):
+    path = tmp_path / 'sync_diagnosis_report_1.json'
+    path.write_text(json.dumps({'orphaned_in_production': ['XX_9'], 'missing_triggers': [TRIGGERS[1]]}, indent=2))
+    assert read_summary(path) == {'mode': 'legacy'}
+    issues = load_issues(path)
+    assert issues['orphaned_in_production'] == ['XX_9']
+    assert issues['missing_triggers'] == [TRIGGERS[1]]
+    assert issues['missing_from_production'] == []
+
+
+def test_diff_reports_compares_fact_by_fact(tmp_path):
+    old = write_report(tmp_path / 'old.ndjson', [MISSING, ORPHAN])
+    new = write_report(tmp_path / 'new.ndjson', [
+        ('missing_from_production', {'table': 'qgis_sanmarco_buildings', 'identifiers': ['SM_2', 'SM_3', 'SM_3']}),
+        TRIGGERS,
+    ])
+    added, resolved = diff_reports(old, new)
+    assert added == {
+        'missing_from_production': [('qgis_sanmarco_buildings', 'SM_3')],
+        'missing_triggers': [('qgis_sanmarco_islands', 'update_veniss_data')],
+    }
+    assert resolved == {
+        'missing_from_production': [('qgis_sanmarco_buildings', 'SM_1')],
+        'orphaned_in_production': [('', 'XX_9')],
+    }
+    assert diff_reports(old, old) == ({}, {})
+
+
+def test_reports_of_different_coverage_are_not_compared(tmp_path, capsys):
+    full = write_report(tmp_path / 'full.ndjson', [MISSING])
+    partial = write_report(tmp_path / 'partial.ndjson', [], mode='since_last')
+    unfinished = write_report(tmp_path / 'unfinished.ndjson', [MISSING], finished=False)
+    assert 'do not cover the same identifiers' in comparison_problem(full, partial)
+    assert 'did not finish' in comparison_problem(full, unfinished)
+    assert comparison_problem(full, write_report(tmp_path / 'checksum.ndjson', [], mode='checksum')) is None
+    assert print_diff(full, partial) is False
+    assert 'Cannot compare reports' in capsys.readouterr().out
+
+
+def test_latest_reports_pick_finished_reports_of_the_same_coverage(tmp_path):
+    names = ['sync_diagnosis_report_20251126_010000.ndjson', 'sync_diagnosis_report_20251127_010000.ndjson',
+             'sync_diagnosis_report_20251128_010000.ndjson', 'sync_diagnosis_report_20251129_010000.ndjson']
+    write_report(tmp_path / names[0], [MISSING])
+    write_report(tmp_path / names[1], [], mode='since_last')
+    write_report(tmp_path / names[2], [ORPHAN])
+    write_report(tmp_path / names[3], [MISSING], finished=False)
+
+    assert latest_reports(tmp_path) == [tmp_path / names[3]]
+    assert latest_reports(tmp_path, count=2, finished=True) == [tmp_path / names[1], tmp_path / names[2]]
+    assert latest_comparable_reports(tmp_path) == (tmp_path / names[0], tmp_path / names[2])
+    os.remove(tmp_path / names[0])
+    assert latest_comparable_reports(tmp_path) is None
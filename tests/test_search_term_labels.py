@@ -0,0 +1,123 @@
+"""Client-side labels against the labels the search_term.rq queries produce."""
+
+from collections import Counter
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('dotenv')
+
+import search_term_labels
+
+
+def row(item, kind, value=None, lang=''):
+    """One binding of the components SELECT."""
+    binding = {'item': {'type': 'uri', 'value': item}, 'kind': {'type': 'literal', 'value': kind}}
+    if value is not None:
+        binding['value'] = {'type': 'literal', 'value': value}
+        binding['lang'] = {'type': 'literal', 'value': lang}
+    return binding
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Run fetch_components over fixture bindings instead of the endpoint."""
+    def fetch(entity, bindings):
+        monkeypatch.setattr(search_term_labels.sparql_client, 'select', lambda query, timeout=None: iter(bindings))
+        return search_term_labels.fetch_components('veniss_ontology:X', entity, '', page_size=len(bindings) + 1)
+    return fetch
+
+
+def labels(entity, items):
+    return Counter((item, label, lang) for item, label, lang in search_term_labels.build_labels(entity, items))
+
+
+P = 'https://veniss.net/resource/person/1'
+G = 'https://veniss.net/resource/group/1'
+E = 'https://veniss.net/resource/event/1'
+
+
+def test_person_one_term_per_name_and_date_combination(fetched):
+    items = fetched('person', [
+        row(P, 'item'),
+        row(P, 'given_name', 'Marco'),
+        row(P, 'family_name', 'Polo'),
+        row(P, 'patronymic', 'di Niccolò'),
+        row(P, 'birth_year', '1254'),
+        row(P, 'birth_year', '1255'),
+        row(P, 'death_year', '1324'),
+    ])
+    assert labels('person', items) == Counter({
+        (P, 'Polo, Marco di Niccolò 1254 - 1324', None): 1,
+        (P, 'Polo, Marco di Niccolò 1255 - 1324', None): 1,
+    })
+
+
+def test_person_death_without_birth_and_empty_alias(fetched):
+    items = fetched('person', [
+        row(P, 'item'),
+        row(P, 'given_name', 'Marco'),
+        row(P, 'alias', ''),
+        row(P, 'death_year', '1324'),
+    ])
+    # The alias is bound, so both the name and the label keep it even though it is empty;
+    # the death year is only reached through a birth
+    assert labels('person', items) == Counter({(P, ' (Marco) ', None): 1})
+
+
+def test_person_repeated_components_repeat_terms(fetched):
+    items = fetched('person', [
+        row(P, 'item'),
+        row(P, 'given_name', 'Marco', 'it'),
+        row(P, 'given_name', 'Marco', 'en'),
+    ])
+    assert labels('person', items) == Counter({(P, 'Marco', None): 2})
+
+
+def test_person_without_components(fetched):
+    assert labels('person', fetched('person', [row(P, 'item')])) == Counter({(P, '', None): 1})
+
+
+def test_group_samples_smallest_values(fetched):
+    items = fetched('group', [
+        row(G, 'item'),
+        row(G, 'appellation', 'Scuola '),
+        row(G, 'given_name', 'Grande'),
+        row(G, 'given_name', 'Piccola'),
+        row(G, 'formation_year', '1260'),
+        row(G, 'formation_year', '1250'),
+        row(G, 'dissolution_year', ''),
+    ])
+    assert labels('group', items) == Counter({(G, 'Scuola Grande 1250 ', None): 1})
+
+
+def test_event_one_term_per_label_and_typology_of_a_language(fetched):
+    items = fetched('event', [
+        row(E, 'item'),
+        row(E, 'label', 'Incendio', 'it'),
+        row(E, 'label', 'Fire', 'en'),
+        row(E, 'typology', 'disastro', 'it'),
+        row(E, 'typology', 'catastrofe', 'it'),
+        row(E, 'typology', 'evento', ''),
+        row(E, 'island', 'San Marco'),
+        row(E, 'year', '1574'),
+    ])
+    assert labels('event', items) == Counter({
+        (E, 'Incendio San Marco catastrofe 1574', 'it'): 1,
+        (E, 'Incendio San Marco disastro 1574', 'it'): 1,
+        (E, 'Fire San Marco 1574', 'en'): 1,
+    })
+
+
+def test_event_language_from_typology_without_label(fetched):
+    items = fetched('event', [
+        row(E, 'item'),
+        row(E, 'typology', 'fire', 'en'),
+        row(E, 'island', ''),
+    ])
+    assert labels('event', items) == Counter({(E, '  fire', 'en'): 1})
+
+
+def test_event_without_label_or_typology_has_no_label(fetched):
+    items = fetched('event', [row(E, 'item'), row(E, 'year', '1574')])
+    assert labels('event', items) == Counter({(E, None, None): 1})
@@ -0,0 +1,88 @@
+"""Query rewriting and incremental state of the search-term driver."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('dotenv')
+
+import search_terms
+from search_terms import (ENTITY_TYPES, delete_search_terms_query, in_graph, insert_search_terms_query, load_query,
+                          with_batch_limit, with_items)
+
+GRAPH = 'https://veniss.net/graph/search_terms/person'
+
+
+@pytest.mark.parametrize('entity', list(ENTITY_TYPES))
+def test_every_query_supports_the_rewrites(entity):
+    query = load_query(entity)
+    limited = with_batch_limit(query, 200)
+    assert 'LIMIT 200' in limited and '# LIMIT' not in limited
+    restricted = with_items(query, ['https://veniss.net/resource/x/1', 'https://veniss.net/resource/x/2'])
+    assert 'VALUES ?item { <https://veniss.net/resource/x/1> <https://veniss.net/resource/x/2> }' in restricted
+    graphed = in_graph(query, GRAPH)
+    # Written to and checked in the graph
+    assert graphed.count(f'GRAPH <{GRAPH}>') == 2
+
+
+def test_rewrites_reject_unexpected_queries():
+    with pytest.raises(ValueError):
+        with_batch_limit('SELECT * WHERE { ?s ?p ?o }', 10)
+    with pytest.raises(ValueError):
+        with_items('SELECT * WHERE { ?s ?p ?o }', ['https://veniss.net/a'])
+    with pytest.raises(ValueError):
+        in_graph('SELECT * WHERE { ?s ?p ?o }', GRAPH)
+
+
+@pytest.mark.parametrize('item', ['https://veniss.net/a> } ; DROP ALL ; #', 'https://veniss.net/a b'])
+def test_entity_uris_are_validated(item):
+    with pytest.raises(ValueError):
+        with_items(load_query('person'), [item])
+    with pytest.raises(ValueError):
+        delete_search_terms_query([item])
+
+
+def test_insert_without_label_mints_the_search_term_only():
+    query = insert_search_terms_query([('https://veniss.net/e/1', 'Fire', 'en'), ('https://veniss.net/e/2', None, None)],
+                                      GRAPH)
+    assert query.count('crm:P2_has_type veniss_types:search_term') == 2
+    assert query.count('rdfs:label') == 1 and '"Fire"@en' in query
+    assert f'GRAPH <{GRAPH}>' in query
+
+
+def test_incremental_watermark_is_the_run_start_minus_the_overlap(monkeypatch):
+    # Events imported after the run with an older timestamp must still be after the next watermark
+    monkeypatch.setattr(search_terms, 'modified_entities', lambda entity, since, timeout=None: [])
+    started = datetime.now(timezone.utc)
+    stats = search_terms.run_incremental('person', '2025-01-01T00:00:00Z', 100)
+    assert stats['refreshed'] == 0
+    expected = started - search_terms.WATERMARK_OVERLAP
+    assert abs(search_terms._parse_time(stats['watermark']) - expected) < timedelta(seconds=2)
+
+
+def test_state_round_trip(tmp_path):
+    path = tmp_path / 'logs' / 'state.json'
+    assert search_terms.load_state(path) == {}
+    search_terms.save_state({'person': '2025-01-01T00:00:00Z'}, path)
+    assert search_terms.load_state(path) == {'person': '2025-01-01T00:00:00Z'}
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    """Update requests sent to the endpoint."""
+    sent = []
+    monkeypatch.setattr(search_terms.sparql_client, 'update', lambda query, timeout=None: sent.append(query))
+    return sent
+
+
+@pytest.mark.parametrize('remaining, force, swapped', [(0, False, True), (3, False, False), (3, True, True)])
+def test_rebuild_swaps_only_a_complete_staging_graph(updates, remaining, force, swapped):
+    def generate(entity, batch_size, timeout, graph=None):
+        assert graph == f'{GRAPH}/staging'
+        return {'batches': 1, 'processed': 10, 'remaining': remaining}
+
+    stats = search_terms.run_rebuild('person', GRAPH, 100, generate=generate, force=force)
+    assert stats['swapped'] is swapped
+    assert updates[0] == f'DROP SILENT GRAPH <{GRAPH}/staging>'
+    assert any(query.startswith('MOVE') for query in updates) is swapped
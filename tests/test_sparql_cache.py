@@ -0,0 +1,84 @@
+"""TTL, LRU eviction and invalidation of the SPARQL result cache."""
+
+import pytest
+
+import sparql_cache
+from sparql_cache import DEFAULT_GRAPH, SparqlCache, normalize_query, read_graphs, write_graphs
+
+ENDPOINT = 'https://veniss.net/sparql'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() of the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(sparql_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_normalized_queries_share_an_entry():
+    cache = SparqlCache()
+    cache.put(ENDPOINT, 'SELECT ?s\nWHERE { ?s ?p ?o }', [1])
+    assert cache.get(ENDPOINT, '# listing\n  SELECT ?s WHERE {\n ?s ?p ?o\n}') == [1]
+    assert cache.get('https://other/sparql', 'SELECT ?s WHERE { ?s ?p ?o }') is None
+    assert normalize_query('  a\n# c\n\tb ') == 'a b'
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SparqlCache(ttl=60)
+    cache.put(ENDPOINT, 'q', 'v')
+    clock[0] += 60
+    assert cache.get(ENDPOINT, 'q') == 'v'
+    clock[0] += 1
+    assert cache.get(ENDPOINT, 'q') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SparqlCache(max_entries=2)
+    cache.put(ENDPOINT, 'a', 1)
+    cache.put(ENDPOINT, 'b', 2)
+    cache.get(ENDPOINT, 'a')
+    cache.put(ENDPOINT, 'c', 3)
+    assert cache.get(ENDPOINT, 'b') is None
+    assert cache.get(ENDPOINT, 'a') == 1 and cache.get(ENDPOINT, 'c') == 3
+
+
+def test_disk_level_survives_the_process_and_is_bounded(tmp_path, clock):
+    path = tmp_path / 'cache.sqlite'
+    first = SparqlCache(path, max_entries=2)
+    for i, query in enumerate('abc'):
+        clock[0] += 1
+        first.put(ENDPOINT, query, [i])
+
+    second = SparqlCache(path, ttl=10, max_entries=2)
+    assert second.get(ENDPOINT, 'a') is None
+    assert second.get(ENDPOINT, 'c') == [2]
+    clock[0] += 20
+    assert second.get(ENDPOINT, 'b') is None
+
+
+def test_updates_invalidate_the_graphs_they_write(tmp_path):
+    cache = SparqlCache(tmp_path / 'cache.sqlite')
+    cache.put(ENDPOINT, 'SELECT * { GRAPH <https://g/a> { ?s ?p ?o } }', 'a')
+    cache.put(ENDPOINT, 'SELECT * FROM <https://g/b> { ?s ?p ?o }', 'b')
+    cache.put(ENDPOINT, 'SELECT * { ?s ?p ?o }', 'default')
+
+    cache.invalidate_update('INSERT DATA { GRAPH <https://g/a> { <x> <y> <z> } }')
+    assert cache.get(ENDPOINT, 'SELECT * { GRAPH <https://g/a> { ?s ?p ?o } }') is None
+    # The default graph is the union of all graphs, so its entries go as well
+    assert cache.get(ENDPOINT, 'SELECT * { ?s ?p ?o }') is None
+    assert cache.get(ENDPOINT, 'SELECT * FROM <https://g/b> { ?s ?p ?o }') == 'b'
+
+
+def test_graph_tags():
+    assert read_graphs('SELECT * { ?s ?p ?o }') == {DEFAULT_GRAPH}
+    assert read_graphs('SELECT * FROM NAMED <https://g/a> { GRAPH <https://g/b> {} }') == {'https://g/a', 'https://g/b'}
+    assert write_graphs('MOVE SILENT GRAPH <https://g/s> TO GRAPH <https://g/l>') == {'https://g/s', 'https://g/l'}
+    assert write_graphs('DELETE DATA { <x> <y> <z> }') == {DEFAULT_GRAPH}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SparqlCache(enabled=False)
+    cache.put(ENDPOINT, 'q', 1)
+    assert cache.get(ENDPOINT, 'q') is None
@@ -0,0 +1,102 @@
+"""Streaming parsers of SPARQL SELECT results."""
+
+import json
+
+import pytest
+
+from sparql_results import (CSV_RESULTS, JSON_RESULTS, TSV_RESULTS, XSD, iter_bindings, iter_json_bindings,
+                            iter_values, parse_term)
+
+
+class FakeResponse:
+    """Streamed response delivering its body in fixed-size byte chunks."""
+
+    def __init__(self, body, content_type):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.headers = {'Content-Type': content_type} if content_type else {}
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+BINDINGS = [
+    {'s': {'type': 'uri', 'value': 'https://veniss.net/person/1'},
+     'label': {'type': 'literal', 'value': 'Niccolò "il Vecchio"', 'xml:lang': 'it'}},
+    {'s': {'type': 'uri', 'value': 'https://veniss.net/person/2'}},
+    {'s': {'type': 'bnode', 'value': 'b0'},
+     'n': {'type': 'literal', 'value': '42', 'datatype': XSD + 'integer'}},
+]
+
+JSON_BODY = json.dumps({'head': {'vars': ['s', 'label', 'n']}, 'results': {'bindings': BINDINGS}}, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64 * 1024])
+def test_json_bindings_survive_any_chunking(chunk_size):
+    # Small chunks split the "bindings" key, the elements and multi-byte characters
+    response = FakeResponse(JSON_BODY, f'{JSON_RESULTS}; charset=utf-8')
+    assert list(iter_bindings(response, chunk_size)) == BINDINGS
+
+
+def test_json_is_assumed_without_content_type():
+    assert list(iter_bindings(FakeResponse(JSON_BODY, None), 5)) == BINDINGS
+
+
+def test_json_without_bindings_yields_nothing():
+    assert list(iter_json_bindings(['{"head": {"vars": []}, "boolean": true}'])) == []
+    assert list(iter_json_bindings(['{"head": {"vars": []}, "results": {"bindings": [ ]}}'])) == []
+
+
+def test_truncated_json_raises():
+    truncated = JSON_BODY[:JSON_BODY.index('person/2')]
+    with pytest.raises(ValueError):
+        list(iter_json_bindings([truncated]))
+    with pytest.raises(ValueError):
+        list(iter_json_bindings([JSON_BODY[:JSON_BODY.rindex(']')]]))
+
+
+@pytest.mark.parametrize('term, parsed', [
+    ('', None),
+    ('<https://veniss.net/a>', {'type': 'uri', 'value': 'https://veniss.net/a'}),
+    ('_:b1', {'type': 'bnode', 'value': 'b1'}),
+    ('"plain"', {'type': 'literal', 'value': 'plain'}),
+    ('"Ca\' d\'Oro"@it', {'type': 'literal', 'value': "Ca' d'Oro", 'xml:lang': 'it'}),
+    ('"a\\tb\\n\\"c\\" \\u00e8"', {'type': 'literal', 'value': 'a\tb\n"c" è'}),
+    ('"1500"^^<http://www.w3.org/2001/XMLSchema#gYear>',
+     {'type': 'literal', 'value': '1500', 'datatype': XSD + 'gYear'}),
+    ('12', {'type': 'literal', 'value': '12', 'datatype': XSD + 'integer'}),
+    ('-1.5', {'type': 'literal', 'value': '-1.5', 'datatype': XSD + 'decimal'}),
+    ('1e3', {'type': 'literal', 'value': '1e3', 'datatype': XSD + 'double'}),
+    ('true', {'type': 'literal', 'value': 'true', 'datatype': XSD + 'boolean'}),
+])
+def test_parse_tsv_term(term, parsed):
+    assert parse_term(term) == parsed
+
+
+def test_tsv_bindings_leave_unbound_variables_out():
+    body = ('?s\t?label\t?n\r\n'
+            '<https://veniss.net/person/1>\t"Niccolò \\"il Vecchio\\""@it\t\r\n'
+            '<https://veniss.net/person/2>\t\t\r\n'
+            '_:b0\t\t42\r\n')
+    response = FakeResponse(body, TSV_RESULTS)
+    assert list(iter_bindings(response, 4)) == BINDINGS
+
+
+def test_csv_bindings_guess_term_types():
+    body = 's,label\r\nhttps://veniss.net/a,"Rialto, ponte"\r\n_:b0,\r\n'
+    assert list(iter_bindings(FakeResponse(body, CSV_RESULTS), 3)) == [
+        {'s': {'type': 'uri', 'value': 'https://veniss.net/a'},
+         'label': {'type': 'literal', 'value': 'Rialto, ponte'}},
+        {'s': {'type': 'bnode', 'value': 'b0'}},
+    ]
+
+
+def test_iter_values_skips_unbound():
+    response = FakeResponse(JSON_BODY, JSON_RESULTS)
+    assert list(iter_values(response, 'label')) == ['Niccolò "il Vecchio"']
+
+
+def test_declared_charset_is_used():
+    body = '?label\n"Città"\n'.encode('latin-1')
+    response = FakeResponse(body, f'{TSV_RESULTS}; charset=ISO-8859-1')
+    assert list(iter_values(response, 'label')) == ['Città']
@@ -0,0 +1,90 @@
+"""Parameter binding of the SPARQL templates."""
+
+import pytest
+
+import sparql_templates
+from sparql_templates import IRI, Literal, SparqlTemplate, binding_term, iri, literal, prefixes, term, values_block
+
+
+def test_literal_escapes_quotes_backslashes_and_line_breaks():
+    assert literal('Ca\' "d\'Oro"\\\n\t') == '"Ca\' \\"d\'Oro\\"\\\\\\n\\t"'
+    assert literal('ponte', lang='it') == '"ponte"@it'
+    assert literal('1500', datatype='http://www.w3.org/2001/XMLSchema#gYear') == \
+        '"1500"^^<http://www.w3.org/2001/XMLSchema#gYear>'
+
+
+@pytest.mark.parametrize('value', ['https://veniss.net/a b', 'https://veniss.net/a>', 'x"y', 'a{b}'])
+def test_iri_rejects_characters_that_break_the_query(value):
+    with pytest.raises(ValueError):
+        iri(value)
+
+
+def test_literal_rejects_malformed_language_tag():
+    with pytest.raises(ValueError):
+        literal('x', lang='it" . <a> <b> <c')
+
+
+@pytest.mark.parametrize('value, expected', [
+    (IRI('https://veniss.net/a'), '<https://veniss.net/a>'),
+    (Literal('Rialto', lang='it'), '"Rialto"@it'),
+    ('plain', '"plain"'),
+    (True, 'true'),
+    (3, '3'),
+    (2.5, '2.5'),
+    ([IRI('https://veniss.net/a'), 'b'], '<https://veniss.net/a> "b"'),
+])
+def test_term(value, expected):
+    assert term(value) == expected
+
+
+def test_term_rejects_unsupported_types():
+    with pytest.raises(TypeError):
+        term(None)
+
+
+def test_binding_term_keeps_language_and_datatype():
+    assert binding_term({'type': 'uri', 'value': 'https://veniss.net/a'}) == '<https://veniss.net/a>'
+    assert binding_term({'type': 'literal', 'value': 'x', 'xml:lang': 'en'}) == '"x"@en'
+    assert binding_term({'type': 'typed-literal', 'value': '1', 'datatype': 'http://www.w3.org/2001/XMLSchema#int'}) \
+        == '"1"^^<http://www.w3.org/2001/XMLSchema#int>'
+    assert binding_term({'type': 'bnode', 'value': 'b0'}) is None
+
+
+def test_values_block():
+    assert values_block('item', [IRI('https://veniss.net/a'), IRI('https://veniss.net/b')]) == \
+        'VALUES ?item { <https://veniss.net/a> <https://veniss.net/b> }'
+
+
+def test_prefixes_in_requested_order():
+    namespaces = {'crm': 'http://www.cidoc-crm.org/cidoc-crm/', 'rdfs': 'http://www.w3.org/2000/01/rdf-schema#'}
+    assert prefixes(namespaces, 'rdfs') == 'PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n'
+    assert prefixes(namespaces).splitlines() == [
+        'PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>',
+        'PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>',
+    ]
+
+
+def test_render_binds_every_occurrence_and_counts_renders():
+    template = SparqlTemplate('SELECT * WHERE { {{s}} ?p {{label}} . FILTER(?x != {{s}}) }', 'test')
+    assert template.parameters == {'s', 'label'}
+    query = template.render(s=IRI('https://veniss.net/a'), label='a "b"')
+    assert query == 'SELECT * WHERE { <https://veniss.net/a> ?p "a \\"b\\"" . FILTER(?x != <https://veniss.net/a>) }'
+    assert template.renders == 1 and template.render_seconds >= 0
+
+
+def test_render_requires_every_parameter():
+    with pytest.raises(KeyError):
+        SparqlTemplate('{{a}} {{b}}').render(a=1)
+
+
+def test_load_reads_a_template_once():
+    template = sparql_templates.load('entity_search_terms')
+    assert sparql_templates.load('entity_search_terms') is template
+    assert template.parameters == {'entity'}
+    query = sparql_templates.load('search_term_triples').render(
+        entity=IRI('https://veniss.net/event/1'),
+        search_terms=[IRI('https://veniss.net/event/1/search_term/a'), IRI('https://veniss.net/event/1/search_term/b')])
+    assert query.count('VALUES ?searchTerm { <https://veniss.net/event/1/search_term/a> '
+                       '<https://veniss.net/event/1/search_term/b> }') == 2
+    assert '{{' not in query
+    assert 'entity_search_terms' in sparql_templates.render_stats()
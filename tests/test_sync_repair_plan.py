@@ -0,0 +1,54 @@
+"""Repair planning of sync_repair_script.py (no database needed)."""
+
+import pytest
+
+pytest.importorskip('psycopg2')
+pytest.importorskip('dotenv')
+
+from sync_repair_script import build_repair_plan, parse_year_from_source, table_kind
+
+
+@pytest.mark.parametrize('source, years', [
+    ('today', (2000, 40000)),
+    ('Today', (2000, 40000)),
+    ('catasto_1808', (1808, 1808)),
+    ('catasto_1867-1913', (1867, 1913)),
+    ('aerofoto_1943-45', (1943, 1945)),
+    ('de_barbari', (2000, 40000)),
+])
+def test_parse_year_from_source(source, years):
+    assert parse_year_from_source(source) == years
+
+
+def test_table_kind_from_suffix():
+    assert table_kind('qgis_sanmarco_buildings') == ('Buildings', 1, 'INSERT_BLDG_feature')
+    assert table_kind('qgis_sanmarco_open_spaces') == ('Open Space', 1, 'INSERT_OS_feature')
+    assert table_kind('qgis_sanmarco_bridges') is None
+
+
+def test_build_repair_plan(capsys):
+    plan = build_repair_plan({
+        'orphaned_in_production': ['B_2', 'B_1', 'B_2'],
+        'orphaned_feature_sources': ['F_1'],
+        'source_name_mismatches': [{'table': 'qgis_sanmarco_buildings', 'column': '1808'},
+                                   {'table': 'qgis_sanmarco_islands', 'column': '1808'}],
+        'missing_triggers': [{'table': 'qgis_sanmarco_islands', 'missing': ['update_veniss_data']},
+                             {'table': 'qgis_sanmarco_bridges', 'missing': ['insert_veniss_data']}],
+        'missing_from_production': [{'table': 'qgis_sanmarco_buildings', 'identifiers': ['SM_1']},
+                                    {'table': 'qgis_sanmarco_bridges', 'identifiers': ['BR_1']}],
+    })
+    assert plan == {
+        'triggers': {'qgis_sanmarco_islands': 'INSERT_IS_feature'},
+        'orphans': ['B_1', 'B_2'],
+        'orphaned_feature_sources': ['F_1'],
+        'sources': ['1808'],
+        'missing': {'qgis_sanmarco_buildings': ['SM_1']},
+        'feature_source_tables': ['qgis_sanmarco_buildings', 'qgis_sanmarco_islands'],
+    }
+    # Tables of an unknown feature type are reported, not repaired
+    assert capsys.readouterr().out.count('qgis_sanmarco_bridges') == 2
+
+
+def test_empty_report_plans_nothing():
+    assert build_repair_plan({}) == {'triggers': {}, 'orphans': [], 'orphaned_feature_sources': [], 'sources': [],
+                                     'missing': {}, 'feature_source_tables': []}
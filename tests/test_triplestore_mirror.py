@@ -0,0 +1,47 @@
+"""Local SQLite mirror of the triplestore facts."""
+
+import triplestore_mirror
+from triplestore_mirror import FACTS, TriplestoreMirror
+
+
+def test_sync_writes_only_the_differences(tmp_path):
+    mirror = TriplestoreMirror(tmp_path / 'mirror.sqlite')
+    assert mirror.sync_fact('search_terms', [('https://veniss.net/p/1',), ('https://veniss.net/p/2',)]) == \
+        {'rows': 2, 'added': 2, 'removed': 0}
+    assert mirror.sync_fact('search_terms', [('https://veniss.net/p/2',), ('https://veniss.net/p/3',)]) == \
+        {'rows': 2, 'added': 1, 'removed': 1}
+    assert mirror.has_search_term('https://veniss.net/p/3')
+    assert not mirror.has_search_term('https://veniss.net/p/1')
+
+
+def test_rows_with_unbound_columns_compare_equal(tmp_path):
+    mirror = TriplestoreMirror(tmp_path / 'mirror.sqlite')
+    rows = [('SM_1_2D', None), ('SM_1_2D', 'Palazzo')]
+    mirror.sync_fact('repr_labels', rows)
+    assert mirror.sync_fact('repr_labels', rows) == {'rows': 2, 'added': 0, 'removed': 0}
+    assert mirror.repr_labels('SM_') == {'SM_1_2D'}
+    assert mirror.repr_labels_with_buildings('SM_') == {'SM_1_2D': ['Palazzo']}
+
+
+def test_facts_are_fresh_within_max_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(triplestore_mirror.time, 'time', lambda: now[0])
+    mirror = TriplestoreMirror(tmp_path / 'mirror.sqlite', max_age=60)
+    assert not mirror.is_fresh('search_terms')
+    mirror.sync_fact('search_terms', [])
+    now[0] += 60
+    assert mirror.is_fresh('search_terms')
+    now[0] += 1
+    assert not mirror.is_fresh('search_terms')
+
+
+def test_sync_runs_every_fact_query(tmp_path):
+    mirror = TriplestoreMirror(tmp_path / 'mirror.sqlite')
+    results = {
+        FACTS['islands']['query']: [{'label': {'value': 'sanmarco'}, 'uri': {'value': 'https://veniss.net/i/1'}}],
+    }
+    stats = mirror.sync(lambda query: iter(results.get(query, [])))
+    assert set(stats) == set(FACTS)
+    assert mirror.island_uri('sanmarco') == 'https://veniss.net/i/1'
+    # Facts synced recently are skipped
+    assert mirror.sync(lambda query: iter([]), max_age=3600) == {}